@@ -15,8 +15,11 @@ Usage:
 """
 
 import os
+import sys
 import argparse
-import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from mermaid_batch import available, mermaid_job, render_batch
 
 class FigureGenerator:
     """Reproducible figure generator for academic report"""
@@ -24,6 +27,39 @@ class FigureGenerator:
     def __init__(self):
         self.output_dir = "../img"
         os.makedirs(self.output_dir, exist_ok=True)
+        # When set, diagrams are queued here and rendered together by flush()
+        self.queue = None
+    
+    def _render(self, label, mmd_file, png_file, width, height):
+        """Render one diagram now, or queue it when batching"""
+        job = mermaid_job(mmd_file, [png_file], {'width': width, 'height': height, 'scale': 2}, config=None)
+        job['label'] = label
+        if self.queue is not None:
+            self.queue.append(job)
+            return True
+        return self._render_jobs([job])[0]
+    
+    def _render_jobs(self, jobs):
+        """Render jobs in one browser session; returns one success flag per job"""
+        if not available():
+            print("❌ Mermaid CLI not found. Install with: npm install -g @mermaid-js/mermaid-cli")
+            for job in jobs:
+                print(f"📝 Manual generation: Copy {job['input']} to https://mermaid.live")
+            return [False] * len(jobs)
+        results = []
+        for job, result in zip(jobs, render_batch(jobs)):
+            if result['error'] is None:
+                print(f"✅ {job['label']} generated: {job['outputs'][0]}")
+            else:
+                print(f"❌ Mermaid rendering failed: {result['error']}")
+                print(f"📝 Manual generation: Copy {job['input']} to https://mermaid.live")
+            results.append(result['error'] is None)
+        return results
+    
+    def flush(self):
+        """Render every queued diagram in a single browser session"""
+        jobs, self.queue = self.queue or [], None
+        return self._render_jobs(jobs) if jobs else []
     
     def generate_figure_1_architecture(self):
         """
@@ -117,20 +153,7 @@ class FigureGenerator:
         
         # Generate PNG
         png_file = f"{self.output_dir}/system-architecture-overview.png"
-        
-        try:
-            cmd = ['mmdc', '-i', mmd_file, '-o', png_file, '--width', '1200', '--height', '900', '--scale', '2']
-            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-            print(f"✅ Figure 1 generated: {png_file}")
-            return True
-        except subprocess.CalledProcessError as e:
-            print(f"❌ Mermaid CLI failed: {e}")
-            print(f"📝 Manual generation: Copy {mmd_file} to https://mermaid.live")
-            return False
-        except FileNotFoundError:
-            print("❌ Mermaid CLI not found. Install with: npm install -g @mermaid-js/mermaid-cli")
-            print(f"📝 Manual generation: Copy {mmd_file} to https://mermaid.live")
-            return False
+        return self._render("Figure 1", mmd_file, png_file, 1200, 900)
     
     def generate_figure_2_usecase(self):
         """
@@ -158,20 +181,7 @@ class FigureGenerator:
         
         # Generate PNG
         png_file = f"{self.output_dir}/customer-usecase-diagram.png"
-        
-        try:
-            cmd = ['mmdc', '-i', mmd_file, '-o', png_file, '--width', '1400', '--height', '1000', '--scale', '2']
-            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-            print(f"✅ Figure 2 generated: {png_file}")
-            return True
-        except subprocess.CalledProcessError as e:
-            print(f"❌ Mermaid CLI failed: {e}")
-            print(f"📝 Manual generation: Copy {mmd_file} to https://mermaid.live")
-            return False
-        except FileNotFoundError:
-            print("❌ Mermaid CLI not found. Install with: npm install -g @mermaid-js/mermaid-cli")
-            print(f"📝 Manual generation: Copy {mmd_file} to https://mermaid.live")
-            return False
+        return self._render("Figure 2", mmd_file, png_file, 1400, 1000)
     
     def generate_figure_3_class(self):
         """Figure 3: Class Diagram - TO BE IMPLEMENTED"""  
@@ -180,9 +190,11 @@ class FigureGenerator:
     
     def generate_all_figures(self):
         """Generate all figures"""
-        results = []
-        results.append(self.generate_figure_1_architecture())
-        results.append(self.generate_figure_2_usecase())
+        # Queue every diagram, then pay the browser startup once
+        self.queue = []
+        self.generate_figure_1_architecture()
+        self.generate_figure_2_usecase()
+        results = self.flush()
         results.append(self.generate_figure_3_class())
         
         success_count = sum(results)
@@ -6,25 +6,22 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from matplotlib.patches import FancyBboxPatch
 import numpy as np
+import os
+import sys
 
-def create_stick_figure(ax, x, y, size=0.08, name="Actor"):
-    """Draw a proper UML stick figure at position (x, y)"""
-    # Head
-    head = plt.Circle((x, y + size*0.7), size*0.2, color='black', fill=False, linewidth=2)
-    ax.add_patch(head)
-    
-    # Body (vertical line)
-    ax.plot([x, x], [y + size*0.5, y - size*0.1], 'k-', linewidth=2)
-    
-    # Arms (horizontal line)
-    ax.plot([x - size*0.3, x + size*0.3], [y + size*0.2, y + size*0.2], 'k-', linewidth=2)
-    
-    # Legs
-    ax.plot([x, x - size*0.2], [y - size*0.1, y - size*0.5], 'k-', linewidth=2)
-    ax.plot([x, x + size*0.2], [y - size*0.1, y - size*0.5], 'k-', linewidth=2)
-    
-    # Name below
-    ax.text(x, y - size*0.8, name, ha='center', va='center', fontsize=10, weight='bold')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from stick_figure import draw_stick_figures
+
+# This script's stick figure, in fractions of `size` from the anchor point
+STICK_FIGURE = {'head_y': 0.7, 'head_r': 0.2, 'neck_y': 0.5, 'hip_y': -0.1,
+                'arm_y': 0.2, 'arm_w': 0.3, 'foot_dx': 0.2, 'foot_y': -0.5}
+
+def create_stick_figures(ax, actors, size=0.08):
+    """Draw proper UML stick figures at (x, y, name), all of them as one artist"""
+    draw_stick_figures(ax, [(x, y) for x, y, _ in actors], size, linewidth=2, proportions=STICK_FIGURE)
+    for x, y, name in actors:
+        # Name below
+        ax.text(x, y - size*0.8, name, ha='center', va='center', fontsize=10, weight='bold')
 
 def create_use_case(ax, x, y, width, height, text):
     """Draw a UML use case (ellipse) with text"""
@@ -47,8 +44,7 @@ def create_customer_usecase():
     fig, ax = plt.subplots(figsize=(16, 12))
     
     # Actors on the left
-    create_stick_figure(ax, 1, 8, name="Customer")
-    create_stick_figure(ax, 1, 4, name="Visitor")
+    create_stick_figures(ax, [(1, 8, "Customer"), (1, 4, "Visitor")])
     
     # System boundary
     draw_system_boundary(ax, 8, 6, 12, 10, "Car Rental Platform")
@@ -122,7 +118,7 @@ def create_agency_usecase():
     fig, ax = plt.subplots(figsize=(14, 10))
     
     # Actor on the left
-    create_stick_figure(ax, 1, 6, name="Agency")
+    create_stick_figures(ax, [(1, 6, "Agency")])
     
     # System boundary
     draw_system_boundary(ax, 7.5, 6, 11, 8, "Agency Management System")
@@ -179,7 +175,7 @@ def create_admin_usecase():
     fig, ax = plt.subplots(figsize=(14, 10))
     
     # Actor on the left
-    create_stick_figure(ax, 1, 6, name="Administrator")
+    create_stick_figures(ax, [(1, 6, "Administrator")])
     
     # System boundary
     draw_system_boundary(ax, 7.5, 6, 11, 8, "Platform Administration")
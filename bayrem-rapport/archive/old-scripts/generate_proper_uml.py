@@ -7,26 +7,23 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from matplotlib.patches import Ellipse, FancyBboxPatch
 import numpy as np
+import os
+import sys
 
-def create_stick_figure(ax, x, y, name, size=0.3):
-    """Draw a proper UML stick figure actor"""
-    
-    # Head (circle)
-    head = plt.Circle((x, y + size*0.7), size*0.15, fill=False, color='black', linewidth=2)
-    ax.add_patch(head)
-    
-    # Body (vertical line)
-    ax.plot([x, x], [y + size*0.55, y + size*0.2], 'k-', linewidth=2)
-    
-    # Arms (horizontal line)
-    ax.plot([x - size*0.2, x + size*0.2], [y + size*0.45, y + size*0.45], 'k-', linewidth=2)
-    
-    # Legs (diagonal lines)
-    ax.plot([x, x - size*0.15], [y + size*0.2, y], 'k-', linewidth=2)
-    ax.plot([x, x + size*0.15], [y + size*0.2, y], 'k-', linewidth=2)
-    
-    # Name label
-    ax.text(x, y - size*0.3, name, ha='center', va='center', fontsize=10, fontweight='bold')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from connectors import draw_connectors
+from stick_figure import draw_stick_figures
+
+# This script's stick figure, in fractions of `size` from the anchor point
+STICK_FIGURE = {'head_y': 0.7, 'head_r': 0.15, 'neck_y': 0.55, 'hip_y': 0.2,
+                'arm_y': 0.45, 'arm_w': 0.2, 'foot_dx': 0.15, 'foot_y': 0}
+
+def create_stick_figures(ax, actors, size=0.3):
+    """Draw proper UML stick figure actors at (x, y, name), all of them as one artist"""
+    draw_stick_figures(ax, [(x, y) for x, y, _ in actors], size, linewidth=2, proportions=STICK_FIGURE)
+    for x, y, name in actors:
+        # Name label
+        ax.text(x, y - size*0.3, name, ha='center', va='center', fontsize=10, fontweight='bold')
 
 def create_use_case(ax, x, y, width, height, text, fontsize=9):
     """Draw a proper UML use case ellipse"""
@@ -55,6 +52,13 @@ def draw_system_boundary(ax, x, y, width, height, title):
     ax.text(x, y + height/2 + 0.3, title, ha='center', va='bottom', 
             fontsize=12, fontweight='bold')
 
+def draw_associations(ax, actor, use_cases, offset):
+    """Connect an actor to its use cases: curves for long links, elbows for short ones"""
+    ends = np.array(use_cases, dtype=float) - [offset, 0]
+    curve = np.where(ends[:, 1] > actor[1], 0.2, -0.2)
+    draw_connectors(ax, np.broadcast_to(actor, ends.shape), ends, style='auto', curve=curve,
+                    colors='k', linewidths=1, alpha=0.8)
+
 def generate_customer_usecase_proper():
     """Generate proper UML Customer Use Case Diagram"""
     
@@ -74,8 +78,7 @@ def generate_customer_usecase_proper():
     draw_system_boundary(ax, 7, 4.5, 10, 7, 'Car Rental Platform')
     
     # Left side actors
-    create_stick_figure(ax, 0.5, 6, 'Customer')
-    create_stick_figure(ax, 0.5, 2.5, 'Visitor')
+    create_stick_figures(ax, [(0.5, 6, 'Customer'), (0.5, 2.5, 'Visitor')])
     
     # Use cases inside system boundary - organized in groups
     use_cases = [
@@ -108,22 +111,6 @@ def generate_customer_usecase_proper():
     for x, y, w, h, text in use_cases:
         create_use_case(ax, x, y, w, h, text)
     
-    # Draw associations with proper curved/angled lines
-    def draw_smooth_line(ax, x1, y1, x2, y2, curve_factor=0.3):
-        """Draw a smooth curved line between two points"""
-        if abs(x2 - x1) > 2:  # Use curves for longer distances
-            mid_x = (x1 + x2) / 2
-            mid_y = (y1 + y2) / 2 + curve_factor
-            
-            # Create smooth curve using quadratic bezier
-            t = np.linspace(0, 1, 50)
-            curve_x = (1-t)**2 * x1 + 2*(1-t)*t * mid_x + t**2 * x2
-            curve_y = (1-t)**2 * y1 + 2*(1-t)*t * mid_y + t**2 * y2
-            ax.plot(curve_x, curve_y, 'k-', linewidth=1, alpha=0.8)
-        else:  # Use angled lines for shorter distances
-            mid_x = x1 + (x2 - x1) * 0.7
-            ax.plot([x1, mid_x, x2], [y1, y1, y2], 'k-', linewidth=1, alpha=0.8)
-    
     customer_connections = [
         (4, 7.5), (4, 6.5), (7, 7.5), (7, 6.5), (10, 7.5), (10, 6.5),
         (4, 5), (7, 5), (10, 5), (4, 3.5), (7, 3.5), 
@@ -132,15 +119,9 @@ def generate_customer_usecase_proper():
     
     visitor_connections = [(4, 7.5), (7, 7.5), (7, 3.5), (4, 2)]
     
-    # Customer lines with smooth routing
-    for uc_x, uc_y in customer_connections:
-        draw_smooth_line(ax, 0.8, 6, uc_x - 0.9, uc_y, 
-                        curve_factor=0.2 if uc_y > 6 else -0.2)
-    
-    # Visitor lines with smooth routing
-    for uc_x, uc_y in visitor_connections:
-        draw_smooth_line(ax, 0.8, 2.5, uc_x - 0.9, uc_y,
-                        curve_factor=0.2 if uc_y > 2.5 else -0.2)
+    # Customer and visitor associations, all in one LineCollection
+    draw_associations(ax, (0.8, 6), customer_connections, offset=0.9)
+    draw_associations(ax, (0.8, 2.5), visitor_connections, offset=0.9)
     
     # Include relationships (dashed lines with <<include>>)
     include_relations = [
@@ -177,7 +158,7 @@ def generate_agency_usecase_proper():
     draw_system_boundary(ax, 6, 4, 8, 6, 'Agency Management System')
     
     # Left side actor
-    create_stick_figure(ax, 0.5, 4, 'Agency')
+    create_stick_figures(ax, [(0.5, 4, 'Agency')])
     
     # Use cases organized in logical groups
     use_cases = [
@@ -209,27 +190,9 @@ def generate_agency_usecase_proper():
     for x, y, w, h, text in use_cases:
         create_use_case(ax, x, y, w, h, text)
     
-    # Draw associations with smooth lines
-    def draw_smooth_line(ax, x1, y1, x2, y2, curve_factor=0.3):
-        """Draw a smooth curved line between two points"""
-        if abs(x2 - x1) > 2:  # Use curves for longer distances
-            mid_x = (x1 + x2) / 2
-            mid_y = (y1 + y2) / 2 + curve_factor
-            
-            # Create smooth curve using quadratic bezier
-            t = np.linspace(0, 1, 50)
-            curve_x = (1-t)**2 * x1 + 2*(1-t)*t * mid_x + t**2 * x2
-            curve_y = (1-t)**2 * y1 + 2*(1-t)*t * mid_y + t**2 * y2
-            ax.plot(curve_x, curve_y, 'k-', linewidth=1, alpha=0.8)
-        else:  # Use angled lines for shorter distances
-            mid_x = x1 + (x2 - x1) * 0.7
-            ax.plot([x1, mid_x, x2], [y1, y1, y2], 'k-', linewidth=1, alpha=0.8)
-    
     agency_connections = [uc[:2] for uc in use_cases]
     
-    for uc_x, uc_y in agency_connections:
-        draw_smooth_line(ax, 0.8, 4, uc_x - 0.7, uc_y, 
-                        curve_factor=0.2 if uc_y > 4 else -0.2)
+    draw_associations(ax, (0.8, 4), agency_connections, offset=0.7)
     
     plt.tight_layout()
     return fig
@@ -253,7 +216,7 @@ def generate_admin_usecase_proper():
     draw_system_boundary(ax, 6, 4, 8, 6, 'Platform Administration')
     
     # Left side actor
-    create_stick_figure(ax, 0.5, 4, 'Administrator')
+    create_stick_figures(ax, [(0.5, 4, 'Administrator')])
     
     # Use cases
     use_cases = [
@@ -282,27 +245,9 @@ def generate_admin_usecase_proper():
     for x, y, w, h, text in use_cases:
         create_use_case(ax, x, y, w, h, text)
     
-    # Draw associations with smooth lines
-    def draw_smooth_line(ax, x1, y1, x2, y2, curve_factor=0.3):
-        """Draw a smooth curved line between two points"""
-        if abs(x2 - x1) > 2:  # Use curves for longer distances
-            mid_x = (x1 + x2) / 2
-            mid_y = (y1 + y2) / 2 + curve_factor
-            
-            # Create smooth curve using quadratic bezier
-            t = np.linspace(0, 1, 50)
-            curve_x = (1-t)**2 * x1 + 2*(1-t)*t * mid_x + t**2 * x2
-            curve_y = (1-t)**2 * y1 + 2*(1-t)*t * mid_y + t**2 * y2
-            ax.plot(curve_x, curve_y, 'k-', linewidth=1, alpha=0.8)
-        else:  # Use angled lines for shorter distances
-            mid_x = x1 + (x2 - x1) * 0.7
-            ax.plot([x1, mid_x, x2], [y1, y1, y2], 'k-', linewidth=1, alpha=0.8)
-    
     admin_connections = [uc[:2] for uc in use_cases]
     
-    for uc_x, uc_y in admin_connections:
-        draw_smooth_line(ax, 0.8, 4, uc_x - 0.8, uc_y,
-                        curve_factor=0.2 if uc_y > 4 else -0.2)
+    draw_associations(ax, (0.8, 4), admin_connections, offset=0.8)
     
     plt.tight_layout()
     return fig
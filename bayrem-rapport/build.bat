@@ -3,19 +3,10 @@ echo ========================================
 echo Building MyLoc PFE Report...
 echo ========================================
 
-:: First pass - generate aux files
-pdflatex -interaction=nonstopmode main.tex
-
-:: Run biber for bibliography
-biber main
-
-:: Second pass - resolve references
-pdflatex -interaction=nonstopmode main.tex
-
-:: Third pass - finalize
-pdflatex -interaction=nonstopmode main.tex
+:: Runs only the LaTeX/biber passes the document needs (see scripts\latex_build.py)
+python scripts\latex_build.py %*
+if errorlevel 1 exit /b 1
 
 echo ========================================
-echo Build complete! Check main.pdf
+echo Build complete! Check output\main.pdf
 echo ========================================
-pause
@@ -3,50 +3,49 @@
 
 echo "🎯 Generating Organized Use Case Diagrams with Mermaid..."
 
-# Function to generate diagram
-generate_diagram() {
-    local figure_dir=$1
-    local mmd_file=$2
-    local output_file=$3
-    local main_output=$4
-    
-    echo "📋 Processing $figure_dir..."
-    
-    cd "figures/$figure_dir"
-    
-    # Check if mmdc is available
-    if command -v mmdc &> /dev/null; then
-        # Generate with high quality settings
-        mmdc -i "$mmd_file" -o "$output_file" \
-             --width 1600 --height 1200 \
-             --scale 2 \
-             --backgroundColor white \
-             --configFile ../../mermaid-config.json 2>/dev/null || \
-        mmdc -i "$mmd_file" -o "$output_file" \
-             --width 1600 --height 1200 \
-             --scale 2 \
-             --backgroundColor white
-        
-        if [ $? -eq 0 ]; then
-            echo "✅ Generated: $output_file"
-            # Copy to main img directory
-            cp "$output_file" "../../img/$main_output"
-            echo "✅ Updated: img/$main_output"
-        else
-            echo "❌ Failed to generate $output_file"
-        fi
-    else
-        echo "⚠️ Mermaid CLI not found. Install with: npm install -g @mermaid-js/mermaid-cli"
-        echo "📝 Manual generation needed for: $mmd_file"
-    fi
-    
-    cd ../..
-}
-
-# Generate all diagrams
-generate_diagram "figure-2.1-customer-usecase" "customer-usecase.mmd" "customer-usecase-diagram.png" "customer-usecase-diagram.png"
-generate_diagram "figure-2.2-agency-usecase" "agency-usecase.mmd" "agency-usecase-diagram.png" "agency-usecase-diagram.png"  
-generate_diagram "figure-2.3-admin-usecase" "admin-usecase.mmd" "admin-usecase-diagram.png" "admin-usecase-diagram.png"
+# Run from the project root so the figure paths below resolve
+cd "$(dirname "$0")/.."
+
+# Pick a Python interpreter for the batch renderer
+PYTHON=$(command -v python3 || command -v python)
+
+# Diagrams to render: figure directory, source, output, copy in img/
+DIAGRAMS=(
+    "figure-2.1-customer-usecase customer-usecase.mmd customer-usecase-diagram.png customer-usecase-diagram.png"
+    "figure-2.2-agency-usecase agency-usecase.mmd agency-usecase-diagram.png agency-usecase-diagram.png"
+    "figure-2.3-admin-usecase admin-usecase.mmd admin-usecase-diagram.png admin-usecase-diagram.png"
+)
+
+# Render all diagrams in one headless browser session, with high quality
+# settings (unchanged diagrams are restored from the figure cache)
+pairs=()
+for diagram in "${DIAGRAMS[@]}"; do
+    read -r figure_dir mmd_file output_file main_output <<< "$diagram"
+    echo "📋 Queued $figure_dir"
+    pairs+=("figures/$figure_dir/$mmd_file:figures/$figure_dir/$output_file")
+done
+
+"$PYTHON" scripts/mermaid_batch.py \
+     --width 1600 --height 1200 \
+     --scale 2 \
+     --backgroundColor white \
+     --config scripts/mermaid-config.json \
+     "${pairs[@]}"
+
+if [ $? -eq 0 ]; then
+    # Link into the main img directory (a new file, never written in place)
+    for diagram in "${DIAGRAMS[@]}"; do
+        read -r figure_dir mmd_file output_file main_output <<< "$diagram"
+        ln -f "figures/$figure_dir/$output_file" "img/$main_output" 2>/dev/null \
+            || { rm -f "img/$main_output"; cp "figures/$figure_dir/$output_file" "img/$main_output"; }
+        # tpl/new_commands.tex prefers a PDF next to the PNG; one from usecase.json would be stale now
+        rm -f "img/${main_output%.png}.pdf"
+        echo "✅ Updated: img/$main_output"
+    done
+else
+    echo "❌ Some diagrams failed to generate; img/ left unchanged"
+    echo "📝 Manual generation may be needed for the diagrams listed above"
+fi
 
 echo ""
 echo "🎉 All organized use case diagrams completed!"
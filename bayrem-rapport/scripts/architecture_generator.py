@@ -5,9 +5,21 @@ This is the only script needed for Figure 1: System Architecture Overview
 Usage: python architecture_generator.py
 Output: ../img/system-architecture-overview.png
 
-The script generates a clean Mermaid diagram and compiles it to PNG
+The script generates a clean Mermaid diagram and compiles it to PNG.
+Unchanged diagrams are restored from the figure cache instead of calling mmdc.
 """
 
+import os
+import sys
+
+from figure_cache import run_cached
+from mermaid_batch import mermaid_job, render_batch
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MMD_PATH = os.path.join(SCRIPT_DIR, '..', 'archive', 'architecture-clean.mmd')
+PNG_PATH = os.path.join(SCRIPT_DIR, '..', 'img', 'system-architecture-overview.png')
+RENDER_PARAMS = {'width': 1200, 'height': 900, 'scale': 2}
+
 def generate_clean_architecture():
     """Generate the final clean architecture diagram"""
     
@@ -63,30 +75,33 @@ def generate_clean_architecture():
     class E database
     class F,G,H infra"""
     
-    import os
-    
     # Save Mermaid file
-    with open('../archive/architecture-clean.mmd', 'w') as f:
+    with open(MMD_PATH, 'w') as f:
         f.write(mermaid_code)
     
     # Generate PNG using mermaid CLI
-    os.makedirs('../img', exist_ok=True)
+    os.makedirs(os.path.dirname(PNG_PATH), exist_ok=True)
     
     # Command to run
-    cmd = 'mmdc -i ../archive/architecture-clean.mmd -o ../img/system-architecture-overview.png --width 1200 --height 900 --scale 2'
+    cmd = (f'mmdc -i {MMD_PATH} -o {PNG_PATH} '
+           f'--width {RENDER_PARAMS["width"]} --height {RENDER_PARAMS["height"]} '
+           f'--scale {RENDER_PARAMS["scale"]}')
     
     print("Generated files:")
     print("- Mermaid source: ../archive/architecture-clean.mmd")
     print("- PNG diagram: ../img/system-architecture-overview.png")
     print(f"\nTo regenerate, run: {cmd}")
     
-    # Run the command
-    result = os.system(cmd)
-    if result == 0:
+    # Render through the batch renderer (falls back to plain mmdc)
+    result = render_batch([mermaid_job(MMD_PATH, [PNG_PATH], RENDER_PARAMS, config=None)])[0]
+    if result['error'] is None:
         print("✅ PNG generated successfully!")
+        return True
     else:
-        print("❌ PNG generation failed")
+        print(f"❌ PNG generation failed: {result['error']}")
         print("Try running the command manually or use mermaid.live")
+        return False
 
 if __name__ == "__main__":
-    generate_clean_architecture()
\ No newline at end of file
+    status = run_cached([__file__], [MMD_PATH, PNG_PATH], generate_clean_architecture, RENDER_PARAMS)
+    sys.exit(1 if status == 'failed' else 0)
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""
+Asset Store
+Keeps each distinct image once and reports the ones the report never uses
+
+Figure outputs are copied around: generate_all_mermaid.sh and the use case
+renderer put the same PNG in figures/*/ and img/, and
+figures/figure-1.1-system-architecture/ holds eight variants of one diagram.
+This scans the images under img/, figures/ and assets/ by SHA-256 and:
+- with --dedup, stores each distinct content once in the figure cache's
+  object store (.cache/objects/, where run_cached() keeps rendered outputs
+  too) and hard-links every copy to it, so identical files take the space of
+  one and a cache entry for the same bytes needs no new object
+- reports the assets that no \\includegraphics or \\techlogo of any .tex
+  file can embed, telling apart copies of a referenced file from truly
+  unused images (the SVG logos are logo_cache.py's sources, never unused)
+
+Stored objects are checked against their digest before they are linked, and
+every renderer detaches its outputs before writing (figure_cache.detach), so
+an in-place write cannot change the other copies.
+
+Usage:
+    python asset_store.py            # Report duplicates and unreferenced assets
+    python asset_store.py --dedup    # Store each image once, hard-link the copies
+    python asset_store.py --check    # Exit 1 when an asset is unreferenced
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import figure_index
+from figure_cache import PROJECT_ROOT, file_digest, object_path, project_path
+from figure_export import link_or_copy
+
+ASSET_DIRS = [os.path.join(PROJECT_ROOT, name) for name in ('img', 'figures', 'assets')]
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.pdf', '.svg', '.eps')
+
+
+def find_assets(dirs=None):
+    """Every image file under the asset directories, sorted"""
+    found = []
+    for directory in dirs or ASSET_DIRS:
+        for root, subdirs, files in os.walk(directory):
+            subdirs[:] = sorted(d for d in subdirs
+                                if not d.startswith('.') and d not in ('node_modules', '__pycache__'))
+            found.extend(os.path.join(root, name) for name in sorted(files)
+                         if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+    return found
+
+
+def group_by_content(paths):
+    """{digest: [paths]} for the given files"""
+    groups = {}
+    for path in paths:
+        groups.setdefault(file_digest(path), []).append(path)
+    return groups
+
+
+def disk_usage(paths):
+    """Bytes the files take, counting hard-linked files once"""
+    inodes = {}
+    for path in paths:
+        stat = os.stat(path)
+        inodes[(stat.st_dev, stat.st_ino)] = stat.st_size
+    return sum(inodes.values())
+
+
+def _store_object(path, digest):
+    """Make sure the store holds `digest`, taken from `path`; returns the object path"""
+    target = object_path(digest)
+    if os.path.exists(target) and file_digest(target) == digest:
+        return target
+    # Missing or damaged: a new inode, the files linked to a damaged one keep theirs
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f'{target}.tmp-{os.getpid()}'
+    try:
+        os.link(path, tmp)
+    except OSError:
+        shutil.copyfile(path, tmp)
+    os.replace(tmp, target)
+    return target
+
+
+def dedup(groups):
+    """Hard-link every file to its stored object; returns the number of files relinked"""
+    relinked = 0
+    for digest, paths in groups.items():
+        stored = _store_object(paths[0], digest)
+        # With the cache on another file system the copies still share one inode
+        anchor = stored if os.stat(stored).st_dev == os.stat(paths[0]).st_dev else paths[0]
+        for path in paths:
+            if not os.path.samefile(anchor, path):
+                link_or_copy(anchor, path)
+                relinked += 1
+    return relinked
+
+
+def unreferenced(groups, referenced=None):
+    """
+    Assets no .tex file refers to.
+
+    Returns (path, copy_of) pairs: copy_of is a referenced file with the same
+    content, or None when the image is not used at all.
+    """
+    if referenced is None:
+        referenced = figure_index.referenced_files()
+    unused = []
+    for paths in groups.values():
+        used = [path for path in paths if path in referenced]
+        unused.extend((path, used[0] if used else None) for path in paths if path not in used)
+    return sorted(unused)
+
+
+def print_report(groups, unused):
+    paths = [path for group in groups.values() for path in group]
+    copies = {digest: group for digest, group in groups.items() if len(group) > 1}
+    if copies:
+        print("📑 Identical files:")
+        for group in copies.values():
+            print(f"   {os.path.getsize(group[0]) / 1024:.0f} KB × {len(group)}: "
+                  + ", ".join(project_path(path) for path in group))
+
+    orphans = [path for path, copy_of in unused if copy_of is None]
+    if orphans:
+        print(f"\n🗑️  Not referenced by any .tex file ({sum(os.path.getsize(p) for p in orphans) / 1024:.0f} KB):")
+        for path in orphans:
+            print(f"   {project_path(path)} ({os.path.getsize(path) / 1024:.0f} KB)")
+    duplicates = [(path, copy_of) for path, copy_of in unused if copy_of is not None]
+    if duplicates:
+        print("\n🔗 Unreferenced copies of referenced files:")
+        for path, copy_of in duplicates:
+            print(f"   {project_path(path)} = {project_path(copy_of)}")
+
+    unique = sum(os.path.getsize(group[0]) for group in groups.values())
+    print("")
+    print(f"📊 {len(paths)} assets, {len(groups)} distinct: {disk_usage(paths) / 1024 / 1024:.1f} MB on disk, "
+          f"{unique / 1024 / 1024:.1f} MB once deduplicated; {len(orphans)} unreferenced")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Deduplicate images and find unreferenced ones')
+    parser.add_argument('--dedup', action='store_true', help='Store each image once and hard-link the copies')
+    parser.add_argument('--check', action='store_true', help='Exit with 1 when an asset is unreferenced')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    groups = group_by_content(find_assets())
+    unused = unreferenced(groups)
+    print_report(groups, unused)
+    if args.dedup:
+        before = disk_usage([path for group in groups.values() for path in group])
+        relinked = dedup(groups)
+        after = disk_usage([path for group in groups.values() for path in group])
+        print(f"🔗 Relinked {relinked} file(s) to the asset store, "
+              f"{(before - after) / 1024:.0f} KB freed in the project tree")
+    print(f"⏱️  Done in {time.perf_counter() - started:.2f}s")
+    return 1 if args.check and any(copy_of is None for _, copy_of in unused) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,483 @@
+"""
+Parallel Figure Build Driver
+One entry point for every figure in the report
+
+Finds every figure job in the project and runs them on a bounded process
+pool sized to the machine's cores:
+- Mermaid:    figures/**/*.mmd   -> PNG next to the source (mmdc)
+- PlantUML:   figures/**/*.puml  -> PNG next to the source (plantuml)
+- matplotlib: figures/*/usecase.json (usecase_diagram.py), other
+              figures/*/generate_final.py and scripts/architecture_generator.py
+
+Every job goes through the figure cache, and cache hits are resolved in the
+driver itself so unchanged figures never start a worker. The remaining
+Mermaid diagrams are rendered together in one browser session
+(mermaid_batch.py) instead of one mmdc process each. With --mermaid-renderer
+native, flowcharts and xycharts are drawn in-process by mermaid_native.py;
+diagrams outside its subset are reported as skipped. Without Node the
+default only draws the diagrams that have no PNG yet that way: the existing
+ones are mmdc renders, which a native drawing would replace.
+
+The matplotlib renderers (use case diagrams, native Mermaid) also write a
+PDF next to each PNG by default, which the report then embeds instead of the
+raster (see figure_export.py); --formats png turns that off.
+
+When figure_daemon.py is running and only a few matplotlib jobs are pending,
+they are drawn by its warm process instead of starting new workers.
+
+The SVG logos of assets/logos/ are converted first (logo_cache.py), so the
+diagrams and \\techlogo find them ready in build/logos/.
+
+Afterwards png_optimize.py re-encodes the PNG files the jobs built or
+restored losslessly (exact palettes, best zlib settings); hand-made images
+and skipped jobs are left alone, and --no-optimize skips the stage.
+
+Usage:
+    python build_figures.py              # Build everything
+    python build_figures.py --list       # Show the discovered jobs
+    python build_figures.py --jobs 4     # Limit the pool size
+    python build_figures.py --kind mermaid
+    python build_figures.py --mermaid-renderer native
+    python build_figures.py --formats png,pdf,svg
+    python build_figures.py --no-optimize
+"""
+
+import argparse
+import ast
+import glob
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import architecture_generator
+import build_report
+import figure_daemon
+import logo_cache
+import mermaid_batch
+import png_optimize
+from figure_cache import CACHE_DIR, PROJECT_ROOT, figure_key, project_path, restore, run_cached
+from figure_export import drop_stale_vectors, format_params, parse_formats, with_formats
+
+FIGURES_DIR = os.path.join(PROJECT_ROOT, 'figures')
+USECASE_RENDERER = os.path.join(PROJECT_ROOT, 'scripts', 'usecase_diagram.py')
+
+PLANTUML_PARAMS = {'format': 'png'}
+
+# Mermaid sources whose PNG name differs from the .mmd name
+MERMAID_OUTPUTS = {
+    'figure-2.1-customer-usecase/customer-usecase.mmd': 'customer-usecase-diagram.png',
+    'figure-2.2-agency-usecase/agency-usecase.mmd': 'agency-usecase-diagram.png',
+    'figure-2.3-admin-usecase/admin-usecase.mmd': 'admin-usecase-diagram.png',
+}
+
+# "%% Save as: img/velocity-chart.png" in a .mmd adds an extra copy target
+SAVE_AS_PATTERN = re.compile(r'^%%\s*Save as:\s*(\S+)', re.MULTILINE)
+
+KINDS = ('mermaid', 'plantuml', 'matplotlib')
+
+# Files a job may produce that \includegraphics can pick up
+GRAPHIC_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.pdf', '.svg')
+
+# 'auto' uses the browser when mermaid-cli is installed, else the native renderer
+# unless a diagram's PNG is an up-to-date render that native never produced
+MERMAID_RENDERERS = ('auto', 'browser', 'native')
+
+# .mmd files the native renderer has drawn, so 'auto' keeps redrawing them
+NATIVE_INDEX = os.path.join(CACHE_DIR, 'mermaid-native.json')
+
+# Up to this many pending jobs go to a running figure daemon (editing); bigger
+# builds are faster spread over the process pool
+DAEMON_MAX_JOBS = 4
+
+
+def _mermaid_job(mmd_path, renderer='browser', formats=None):
+    rel_path = os.path.relpath(mmd_path, FIGURES_DIR).replace(os.sep, '/')
+    stem = os.path.splitext(os.path.basename(mmd_path))[0]
+    output = os.path.join(os.path.dirname(mmd_path), MERMAID_OUTPUTS.get(rel_path, f'{stem}.png'))
+
+    with open(mmd_path, encoding='utf-8') as f:
+        copies = [os.path.join(PROJECT_ROOT, p) for p in SAVE_AS_PATTERN.findall(f.read())]
+
+    # Same settings as generate_all_mermaid.sh, so both share cache entries
+    spec = mermaid_batch.mermaid_job(mmd_path, [output] + copies)
+    params = spec['params']
+    if renderer == 'native':
+        # Native output differs from the browser's, so it gets its own key
+        params = {**params, 'renderer': 'native', **format_params(formats)}
+        spec = {**spec, 'outputs': with_formats(spec['outputs'], formats)}
+    return {
+        'name': project_path(mmd_path),
+        'kind': 'mermaid',
+        'tool': None,
+        'sources': mermaid_batch.cache_sources(spec),
+        'params': params,
+        'outputs': spec['outputs'],
+        'produces': spec['outputs'],
+        'spec': spec,
+        'renderer': renderer,
+    }
+
+
+def _plantuml_job(puml_path):
+    stem = os.path.splitext(puml_path)[0]
+    return {
+        'name': project_path(puml_path),
+        'kind': 'plantuml',
+        'tool': 'plantuml',
+        'sources': [puml_path],
+        'params': PLANTUML_PARAMS,
+        'outputs': [f'{stem}.png'],
+        'produces': [f'{stem}.png'],
+        'command': ['plantuml', '-tpng', puml_path],
+        'cwd': os.path.dirname(puml_path),
+    }
+
+
+def python_outputs(script_path):
+    """
+    Read the image paths a generator writes from its module-level *_PATH constants.
+
+    Only `os.path.join/dirname/abspath` over string literals, `__file__` and
+    earlier constants are evaluated; the script itself is never imported.
+    """
+    with open(script_path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), script_path)
+    env = {'__file__': os.path.abspath(script_path)}
+    functions = {'join': os.path.join, 'dirname': os.path.dirname, 'abspath': os.path.abspath}
+
+    def evaluate(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name):
+            return env[node.id]
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in functions:
+            return functions[node.func.attr](*[evaluate(arg) for arg in node.args])
+        raise ValueError('not a static path')
+
+    outputs = []
+    for node in tree.body:
+        if not (isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)):
+            continue
+        try:
+            env[node.targets[0].id] = value = evaluate(node.value)
+        except (KeyError, TypeError, ValueError):
+            continue
+        if node.targets[0].id.endswith('_PATH') and value.lower().endswith(GRAPHIC_EXTENSIONS):
+            outputs.append(os.path.normpath(value))
+    return outputs
+
+
+def _python_job(script_path, params=None, needs_mermaid=False):
+    # The generator caches its own outputs with run_cached(), so the driver
+    # only needs the same key to resolve hits without starting Python
+    return {
+        'name': project_path(script_path),
+        'kind': 'matplotlib',
+        'tool': None,
+        'sources': [script_path],
+        'params': params or {},
+        'outputs': None,
+        'produces': python_outputs(script_path),
+        'command': [sys.executable, script_path],
+        'cwd': os.path.dirname(script_path),
+        'needs_mermaid': needs_mermaid,
+    }
+
+
+def module_constant(script_path, name):
+    """Value of a module-level literal constant, read without importing the script"""
+    with open(script_path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), script_path)
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name) and node.targets[0].id == name):
+            return ast.literal_eval(node.value)
+    raise KeyError(f'{project_path(script_path)} has no {name}')
+
+
+def _usecase_job(spec_path, formats=None):
+    # Same sources, outputs and params as usecase_diagram.main(), without importing matplotlib here
+    with open(spec_path, encoding='utf-8') as f:
+        spec = json.load(f)
+    formats = spec.get('formats', formats)
+    outputs = [os.path.normpath(os.path.join(os.path.dirname(spec_path), p)) for p in spec.get('outputs', [])]
+    outputs = with_formats(outputs, formats)
+    return {
+        'name': project_path(spec_path),
+        'kind': 'matplotlib',
+        'tool': None,
+        # usecase_diagram.cache_sources(), from its RENDERER_MODULES
+        'sources': [spec_path] + [os.path.join(os.path.dirname(USECASE_RENDERER), name)
+                                  for name in module_constant(USECASE_RENDERER, 'RENDERER_MODULES')],
+        'params': format_params(formats),
+        'outputs': outputs,
+        'produces': outputs,
+        'command': [sys.executable, USECASE_RENDERER, spec_path],
+        'cwd': os.path.dirname(spec_path),
+        'renderer': 'usecase',
+        'spec': spec_path,
+    }
+
+
+def outputs_stale(sources, outputs):
+    """True when an output is missing or older than one of the sources"""
+    try:
+        newest = max(os.stat(source).st_mtime_ns for source in sources)
+        return any(os.stat(output).st_mtime_ns < newest for output in outputs)
+    except FileNotFoundError:
+        return True
+
+
+def native_renders():
+    """Project paths of the .mmd files the native renderer has drawn"""
+    try:
+        with open(NATIVE_INDEX) as f:
+            return set(json.load(f))
+    except (OSError, ValueError):
+        return set()
+
+
+def remember_native(jobs, results):
+    """Add the Mermaid jobs just drawn or restored natively to NATIVE_INDEX"""
+    done = {result['name'] for result in results if result['status'] in ('built', 'cached')}
+    drawn = {job['name'] for job in jobs if job.get('renderer') == 'native' and job['name'] in done}
+    known = native_renders()
+    if drawn <= known:
+        return
+    os.makedirs(os.path.dirname(NATIVE_INDEX), exist_ok=True)
+    tmp = f'{NATIVE_INDEX}.tmp-{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump(sorted(known | drawn), f, indent=2)
+    os.replace(tmp, NATIVE_INDEX)
+
+
+def resolve_mermaid_renderer(renderer='auto', mmd_path=None):
+    """
+    Pick 'browser' or 'native' for a Mermaid job.
+
+    Without mermaid-cli, 'auto' keeps 'browser' (reported as skipped) only
+    for a diagram whose PNG is at least as new as its sources and was not
+    drawn by the native renderer, i.e. an up-to-date mmdc render; a diagram
+    native drew before, or whose source changed since, is drawn natively.
+    --mermaid-renderer native redraws them all.
+    """
+    if renderer != 'auto':
+        return renderer
+    if mermaid_batch.available():
+        return 'browser'
+    if mmd_path is None:
+        return 'native'
+    job = _mermaid_job(mmd_path)
+    if job['name'] in native_renders() or outputs_stale(job['sources'], job['outputs']):
+        return 'native'
+    return 'browser'
+
+
+def discover_jobs(kinds=KINDS, mermaid_renderer='auto', formats=None):
+    """Return every figure job in the project, in a stable order"""
+    formats = parse_formats(formats)
+    jobs = []
+    if 'mermaid' in kinds:
+        for path in sorted(glob.glob(os.path.join(FIGURES_DIR, '**', '*.mmd'), recursive=True)):
+            jobs.append(_mermaid_job(path, resolve_mermaid_renderer(mermaid_renderer, path), formats))
+    if 'plantuml' in kinds:
+        for path in sorted(glob.glob(os.path.join(FIGURES_DIR, '**', '*.puml'), recursive=True)):
+            jobs.append(_plantuml_job(path))
+    if 'matplotlib' in kinds:
+        for path in sorted(glob.glob(os.path.join(FIGURES_DIR, '*', 'usecase.json'))):
+            jobs.append(_usecase_job(path, formats))
+        for path in sorted(glob.glob(os.path.join(FIGURES_DIR, '*', 'generate_final.py'))):
+            jobs.append(_python_job(path))
+        # Writes a .mmd and renders it with mermaid-cli
+        jobs.append(_python_job(os.path.abspath(architecture_generator.__file__),
+                                architecture_generator.RENDER_PARAMS, needs_mermaid=True))
+    return jobs
+
+
+def run_job(job):
+    """Run one figure job in a worker process and report how it went"""
+    started = time.perf_counter()
+    result = {'name': job['name'], 'kind': job['kind'], 'status': 'built', 'error': None}
+
+    if job['tool'] and shutil.which(job['tool']) is None:
+        result.update(status='skipped', error=f"{job['tool']} not found on PATH")
+        result['seconds'] = time.perf_counter() - started
+        return result
+    if job.get('needs_mermaid') and not mermaid_batch.available():
+        result.update(status='skipped', error='neither @mermaid-js/mermaid-cli (for node) nor mmdc found')
+        result['seconds'] = time.perf_counter() - started
+        return result
+
+    def render():
+        if job.get('renderer') == 'native':
+            return render_native()
+        if job.get('renderer') == 'usecase':
+            import usecase_diagram
+            usecase_diagram.render_file(job['spec'], job['outputs'])
+            return True
+        proc = build_report.run(job['command'], cwd=job['cwd'], capture_output=True, text=True)
+        result['max_rss_kb'] = proc.max_rss_kb
+        if proc.returncode != 0:
+            result.update(status='failed', error=(proc.stderr or proc.stdout).strip()[-2000:])
+            return False
+        return True
+
+    def render_native():
+        import mermaid_native
+        spec = job['spec']
+        try:
+            mermaid_native.render_file(spec['input'], spec['outputs'], spec['params'], spec['config'])
+        except mermaid_native.UnsupportedDiagram as e:
+            # An output older than its source is out of date, not merely left alone
+            pngs = [path for path in spec['outputs'] if path.endswith('.png')]
+            stale = all(os.path.exists(path) for path in pngs) and outputs_stale(job['sources'], pngs)
+            result.update(status='failed' if stale else 'skipped', error=f'native renderer: {e}'
+                          + ('; the PNG is older than its source and mermaid-cli is not installed' if stale else ''))
+            return False
+        return True
+
+    try:
+        if job['outputs'] is None:
+            render()
+        else:
+            status = run_cached(job['sources'], job['outputs'], render, job['params'])
+            if result['status'] != 'skipped':
+                result['status'] = status
+    except Exception as e:
+        result.update(status='failed', error=f'{type(e).__name__}: {e}')
+    if job.get('renderer') in ('usecase', 'native'):
+        # Pool workers end with os._exit(), which skips text_metrics' atexit hook
+        import text_metrics
+        text_metrics.flush()
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def run_mermaid_batch(jobs):
+    """Render a list of Mermaid jobs in one browser session (worker process)"""
+    if not mermaid_batch.available():
+        return [{'name': job['name'], 'kind': 'mermaid', 'status': 'skipped', 'seconds': 0.0,
+                 'error': 'neither @mermaid-js/mermaid-cli (for node) nor mmdc found'} for job in jobs]
+    rendered = mermaid_batch.render_cached([job['spec'] for job in jobs])
+    return [{'name': job['name'], 'kind': 'mermaid', 'status': r['status'],
+             'seconds': r['seconds'], 'error': r['error']} for job, r in zip(jobs, rendered)]
+
+
+def _report(result):
+    icon = {'built': '✅', 'failed': '❌', 'skipped': '⚠️ '}.get(result['status'], '•')
+    print(f"{icon} {result['name']} ({result['seconds']:.1f}s)")
+
+
+def build_figures(jobs, max_workers=None):
+    """Build the given jobs, resolving cache hits up front; returns results"""
+    results = []
+    pending = []
+    for job in jobs:
+        started = time.perf_counter()
+        if restore(figure_key(job['sources'], job['params'])) is not None:
+            results.append({'name': job['name'], 'kind': job['kind'], 'status': 'cached',
+                            'error': None, 'seconds': time.perf_counter() - started})
+        else:
+            pending.append(job)
+
+    if pending:
+        mermaid = [job for job in pending if job.get('renderer') == 'browser']
+        others = [job for job in pending if job.get('renderer') != 'browser']
+        if len(others) <= DAEMON_MAX_JOBS and figure_daemon.status() is not None:
+            for job in [job for job in others if job.get('renderer') in figure_daemon.RENDERERS]:
+                result = figure_daemon.render(job)
+                if result is not None:
+                    _report(result)
+                    results.append(result)
+                    others.remove(job)
+        tasks = len(others) + (1 if mermaid else 0)
+        if tasks:
+            workers = min(max_workers or os.cpu_count() or 1, tasks)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(run_job, job) for job in others]
+                if mermaid:
+                    futures.append(pool.submit(run_mermaid_batch, mermaid))
+                for future in as_completed(futures):
+                    batch = future.result()
+                    for result in batch if isinstance(batch, list) else [batch]:
+                        _report(result)
+                        results.append(result)
+
+    order = {job['name']: i for i, job in enumerate(jobs)}
+    results.sort(key=lambda r: order[r['name']])
+    remember_native(jobs, results)
+    done = {result['name'] for result in results if result['status'] in ('built', 'cached')}
+    for job in jobs:
+        if job['name'] in done:
+            drop_stale_vectors(job.get('produces') or [])
+    for result in results:
+        build_report.record(result['name'], result['kind'], result['seconds'], status=result['status'],
+                            max_rss_kb=result.get('max_rss_kb'))
+    return results
+
+
+def built_pngs(jobs, results):
+    """The PNG files written or restored by the jobs that were built or cached"""
+    done = {result['name'] for result in results if result['status'] in ('built', 'cached')}
+    return sorted({os.path.abspath(path) for job in jobs if job['name'] in done
+                   for path in job.get('produces') or []
+                   if path.lower().endswith('.png') and os.path.exists(path)})
+
+
+def print_summary(results):
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    print("")
+    print("📊 Figures: " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    for result in results:
+        if result['status'] in ('failed', 'skipped'):
+            print(f"   {result['status']}: {result['name']}")
+            if result['error']:
+                for line in result['error'].splitlines()[-5:]:
+                    print(f"      {line}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build every figure in parallel')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--kind', action='append', choices=KINDS, help='Only build this kind of job (repeatable)')
+    parser.add_argument('--mermaid-renderer', choices=MERMAID_RENDERERS, default='auto',
+                        help='Render Mermaid with mermaid-cli (browser) or matplotlib (native)')
+    parser.add_argument('--formats', default=None,
+                        help='Comma-separated output formats of matplotlib figures: png, pdf, svg '
+                             '(default: $FIGURE_FORMATS or png,pdf)')
+    parser.add_argument('--no-optimize', action='store_true', help='Leave the PNG files as the renderers wrote them')
+    parser.add_argument('--list', action='store_true', help='List the discovered jobs and exit')
+    args = parser.parse_args(argv)
+
+    jobs = discover_jobs(args.kind or KINDS, args.mermaid_renderer, args.formats)
+    if args.list:
+        for job in jobs:
+            print(f"{job['kind']:<11} {job['name']}")
+        return 0
+
+    report = build_report.start(' '.join(['build_figures.py', *(sys.argv[1:] if argv is None else argv)]))
+    print(f"🎯 Building {len(jobs)} figures...")
+    started = time.perf_counter()
+    if logo_cache.converter() is not None:
+        with build_report.stage('convert logos', 'figures'):
+            logo_cache.prepare(max_workers=args.jobs)
+    results = build_figures(jobs, args.jobs)
+    print_summary(results)
+    pngs = built_pngs(jobs, results)
+    if pngs and not args.no_optimize:
+        with build_report.stage('optimize PNG files', 'figures'):
+            png_optimize.optimize_pngs(pngs, max_workers=args.jobs)
+    failed = any(r['status'] == 'failed' for r in results)
+    report.finish(not failed)
+    print(f"⏱️  Done in {time.perf_counter() - started:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
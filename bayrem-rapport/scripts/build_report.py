@@ -0,0 +1,250 @@
+"""
+Build Report
+Times every build stage and records peak memory use
+
+The build scripts wrap their work in stages (figure jobs, Mermaid diagrams,
+the preamble format, each pdflatex pass, biber/bibtex, copying the PDF).
+External tools are started through run(), which reads the child's peak RSS
+from wait4() so every stage knows how much memory its processes needed.
+
+At the end of a build the stages are written to build/build-report.json and a
+one-line summary is appended to .cache/build-history.jsonl (outside build/,
+so clean.sh does not wipe the history).
+
+Usage:
+    python build_report.py              # Summary of the last build
+    python build_report.py --history 10 # Totals of the last 10 builds
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from figure_cache import CACHE_DIR, PROJECT_ROOT
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_PATH = os.path.join(PROJECT_ROOT, 'build', 'build-report.json')
+HISTORY_PATH = os.path.join(CACHE_DIR, 'build-history.jsonl')
+
+# "Output written on main.pdf (45 pages, 436241 bytes)." in the LaTeX log
+OUTPUT_PATTERN = re.compile(r'Output written on .*?\((\d+) pages?, (\d+) bytes\)')
+
+_active = None
+
+
+def _rss_kb(value):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return value // 1024 if sys.platform == 'darwin' else value
+
+
+class BuildReport:
+    """Stages of one build, in the order they finished"""
+
+    def __init__(self, command):
+        self.command = command
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.started = time.perf_counter()
+        self.stages = []
+        self.open_stages = []
+
+    def add(self, name, kind, seconds, **info):
+        self.stages.append({'name': name, 'kind': kind, 'seconds': round(seconds, 3), **info})
+
+    def summary(self):
+        """Seconds per stage kind, slowest first"""
+        totals = {}
+        for entry in self.stages:
+            totals[entry['kind']] = totals.get(entry['kind'], 0.0) + entry['seconds']
+        return dict(sorted(((k, round(v, 3)) for k, v in totals.items()), key=lambda item: -item[1]))
+
+    def finish(self, ok, pdf=None, log=None):
+        """Write build/build-report.json and append to the history; returns the report dict"""
+        rss = [s['max_rss_kb'] for s in self.stages if s.get('max_rss_kb')]
+        if resource is not None:
+            rss.append(_rss_kb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+        report = {
+            'command': self.command,
+            'started_at': self.started_at,
+            'ok': ok,
+            'total_seconds': round(time.perf_counter() - self.started, 3),
+            'peak_rss_kb': max(rss, default=None),
+            'by_kind': self.summary(),
+            'latex_passes': sum(1 for s in self.stages if s['kind'] == 'latex'),
+            'pdf': None,
+            'stages': self.stages,
+        }
+        if pdf and os.path.exists(pdf):
+            report['pdf'] = {'path': os.path.relpath(pdf, PROJECT_ROOT), 'bytes': os.path.getsize(pdf),
+                             'pages': pdf_pages(log)}
+
+        os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+        tmp = f'{REPORT_PATH}.tmp-{os.getpid()}'
+        with open(tmp, 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp, REPORT_PATH)
+
+        history = {k: report[k] for k in ('started_at', 'command', 'ok', 'total_seconds', 'peak_rss_kb',
+                                          'by_kind', 'latex_passes')}
+        os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
+        with open(HISTORY_PATH, 'a') as f:
+            f.write(json.dumps(history) + '\n')
+        return report
+
+
+def start(command):
+    """Begin recording a build; stage() and record() are no-ops until this is called"""
+    global _active
+    _active = BuildReport(command)
+    return _active
+
+
+@contextmanager
+def stage(name, kind, **info):
+    """Time a block of work; yields the stage dict so callers can add details"""
+    entry = {'name': name, 'kind': kind, **info}
+    if _active is None:
+        yield entry
+        return
+    _active.open_stages.append(entry)
+    started = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        _active.open_stages.remove(entry)
+        _active.add(seconds=time.perf_counter() - started, **entry)
+
+
+def record(name, kind, seconds, **info):
+    """Add a stage that was timed elsewhere (e.g. in a worker process)"""
+    if _active is not None:
+        _active.add(name, kind, seconds, **info)
+
+
+def run(command, input=None, capture_output=False, **kwargs):
+    """
+    subprocess.run() that also measures the child's peak RSS.
+
+    The returned CompletedProcess has a `max_rss_kb` attribute (None where
+    wait4() is not available), which is also added to the innermost open stage.
+    """
+    if not hasattr(os, 'wait4'):
+        proc = subprocess.run(command, input=input, capture_output=capture_output, **kwargs)
+        proc.max_rss_kb = None
+        return proc
+
+    if capture_output:
+        kwargs['stdout'] = kwargs['stderr'] = subprocess.PIPE
+    if input is not None:
+        kwargs['stdin'] = subprocess.PIPE
+    proc = subprocess.Popen(command, **kwargs)
+
+    output = {}
+
+    def drain(name, stream):
+        output[name] = stream.read()
+        stream.close()
+
+    readers = [threading.Thread(target=drain, args=(name, stream))
+               for name, stream in (('stdout', proc.stdout), ('stderr', proc.stderr)) if stream]
+    for reader in readers:
+        reader.start()
+    if input is not None:
+        try:
+            proc.stdin.write(input)
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+    for reader in readers:
+        reader.join()
+
+    # wait4 instead of wait so the kernel hands back this child's resource usage
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    completed = subprocess.CompletedProcess(command, proc.returncode, output.get('stdout'), output.get('stderr'))
+    completed.max_rss_kb = _rss_kb(usage.ru_maxrss)
+    if _active is not None and _active.open_stages:
+        entry = _active.open_stages[-1]
+        entry['max_rss_kb'] = max(entry.get('max_rss_kb') or 0, completed.max_rss_kb)
+    return completed
+
+
+def pdf_pages(log):
+    """Page count from the LaTeX log, so pdfinfo is not needed"""
+    try:
+        with open(log, encoding='utf-8', errors='replace') as f:
+            matches = OUTPUT_PATTERN.findall(f.read())
+    except (OSError, TypeError):
+        return None
+    return int(matches[-1][0]) if matches else None
+
+
+def load_history(limit=None):
+    try:
+        with open(HISTORY_PATH) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+    return entries[-limit:] if limit else entries
+
+
+def print_report(report, previous=None):
+    status = '✅' if report['ok'] else '❌'
+    delta = ''
+    if previous:
+        change = report['total_seconds'] - previous['total_seconds']
+        delta = f" ({'+' if change >= 0 else ''}{change:.1f}s vs previous build)"
+    rss = f", peak RSS {report['peak_rss_kb'] / 1024:.0f} MB" if report['peak_rss_kb'] else ''
+    print(f"📊 Build report {status} {report['total_seconds']:.1f}s{delta}{rss}")
+    for kind, seconds in report['by_kind'].items():
+        count = sum(1 for s in report['stages'] if s['kind'] == kind)
+        print(f"   - {kind:<12} {seconds:7.2f}s  ({count} stage{'s' if count != 1 else ''})")
+    slowest = sorted(report['stages'], key=lambda s: -s['seconds'])[:5]
+    if slowest:
+        print("   Slowest stages:")
+        for entry in slowest:
+            rss = f", {entry['max_rss_kb'] / 1024:.0f} MB" if entry.get('max_rss_kb') else ''
+            print(f"     {entry['seconds']:7.2f}s  {entry['name']}{rss}")
+    if report['pdf']:
+        pages = report['pdf']['pages'] or 'Unknown'
+        print(f"   - Pages: {pages}")
+        print(f"   - Size: {report['pdf']['bytes'] / 1024:.0f} KB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Show build timing and memory reports')
+    parser.add_argument('--history', type=int, metavar='N', help='Show the totals of the last N builds')
+    args = parser.parse_args(argv)
+
+    if args.history:
+        for entry in load_history(args.history):
+            status = '✅' if entry['ok'] else '❌'
+            rss = f"{entry['peak_rss_kb'] / 1024:5.0f} MB" if entry['peak_rss_kb'] else '    ? MB'
+            print(f"{entry['started_at']}  {status} {entry['total_seconds']:7.1f}s  "
+                  f"{entry['latex_passes']} pass(es)  {rss}  {entry['command']}")
+        return 0
+
+    try:
+        with open(REPORT_PATH) as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        print(f"⚠️  No build report yet ({os.path.relpath(REPORT_PATH, PROJECT_ROOT)})")
+        return 1
+    history = load_history(2)
+    previous = history[0] if len(history) == 2 and history[1]['started_at'] == report['started_at'] else None
+    print_report(report, previous)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Watch Mode
+Rebuilds the affected figures and the PDF whenever a source file is saved
+
+Watches sections/, tpl/, figures/, scripts/, main.tex, global_config.tex and
+biblio.bib with inotify (through ctypes, no extra package; other systems fall
+back to polling mtimes). A burst of saves is collected until the tree has been
+quiet for a short moment, then one rebuild runs:
+- figure jobs whose sources changed (.mmd, .puml, generator scripts,
+  mermaid-config.json) are rebuilt through the figure cache
+- after a .tex change, figures the document now uses but that do not exist
+  yet are built as well
+- LaTeX runs through latex_build.py, which only does the passes needed
+
+With --chapter, LaTeX runs as a draft build of those chapters only
+(output/main-draft.pdf), see latex_build.py.
+
+Figures are drawn by a figure_daemon.py process that keeps matplotlib loaded
+(started here and stopped on exit unless it was already running);
+--no-daemon renders them in fresh worker processes instead.
+
+Usage:
+    python build_watch.py               # Build once, then watch
+    python build_watch.py --debounce 1  # Wait longer for save bursts
+    python build_watch.py --chapter chap_03
+    python build_watch.py --no-daemon
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import shutil
+import struct
+import sys
+import time
+
+import build_figures
+import figure_daemon
+import figure_index
+import latex_build
+from figure_cache import PROJECT_ROOT, project_path
+
+WATCH_DIRS = ['sections', 'tpl', 'figures', 'scripts']
+WATCH_FILES = ['main.tex', 'global_config.tex', 'biblio.bib']
+
+# Only these trigger a rebuild; rendered .png/.pdf and editor swap files do not
+SOURCE_EXTENSIONS = ('.tex', '.cls', '.sty', '.bib', '.mmd', '.puml', '.py', '.json', '.mjs')
+LATEX_EXTENSIONS = ('.tex', '.cls', '.sty', '.bib')
+IGNORED_DIRS = ('__pycache__', '.cache', 'node_modules')
+
+DEBOUNCE_SECONDS = 0.3
+POLL_SECONDS = 0.5
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_source(path):
+    """True for files whose change can affect a figure or the PDF"""
+    parts = project_path(path).split('/')
+    if any(part in IGNORED_DIRS or part.startswith('.') for part in parts):
+        return False
+    return path.endswith(SOURCE_EXTENSIONS)
+
+
+def _watched_dirs():
+    dirs = [PROJECT_ROOT]
+    for name in WATCH_DIRS:
+        for root, subdirs, _ in os.walk(os.path.join(PROJECT_ROOT, name)):
+            subdirs[:] = [d for d in subdirs if d not in IGNORED_DIRS and not d.startswith('.')]
+            dirs.append(root)
+    return dirs
+
+
+def _wanted(path):
+    rel_path = project_path(path)
+    if os.path.dirname(rel_path) == '':
+        return rel_path in WATCH_FILES
+    return is_source(path)
+
+
+class InotifyWatcher:
+    """Recursive inotify watch over the project sources (Linux only)"""
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs = {}
+        for path in _watched_dirs():
+            self.add(path)
+
+    def add(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.dirs[wd] = path
+
+    def wait(self, timeout=None):
+        """Return the set of changed source paths, or an empty set on timeout"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if wd not in self.dirs:
+                continue
+            path = os.path.join(self.dirs[wd], name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and os.path.basename(path) not in IGNORED_DIRS:
+                    for root, _, _ in os.walk(path):
+                        self.add(root)
+            elif _wanted(path):
+                changed.add(path)
+        return changed
+
+
+class PollingWatcher:
+    """Fallback that compares mtimes, for systems without inotify"""
+
+    def __init__(self):
+        self.mtimes = self.scan()
+
+    def scan(self):
+        mtimes = {}
+        for directory in _watched_dirs():
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if os.path.isfile(path) and _wanted(path):
+                    mtimes[path] = os.stat(path).st_mtime_ns
+        return mtimes
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            time.sleep(POLL_SECONDS if timeout is None else min(POLL_SECONDS, timeout))
+            mtimes = self.scan()
+            changed = {p for p in set(mtimes) | set(self.mtimes) if mtimes.get(p) != self.mtimes.get(p)}
+            self.mtimes = mtimes
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+
+def make_watcher():
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher()
+
+
+def wait_for_changes(watcher, debounce=DEBOUNCE_SECONDS):
+    """Block until a source changes, then collect the rest of the burst"""
+    changed = set()
+    while not changed:
+        changed = watcher.wait()
+    while True:
+        more = watcher.wait(debounce)
+        if not more:
+            return changed
+        changed |= more
+
+
+def affected_jobs(jobs, changed):
+    """Figure jobs that read one of the changed files"""
+    changed = {os.path.normpath(p) for p in changed}
+    return [job for job in jobs if any(os.path.normpath(s) in changed for s in job['sources'])]
+
+
+def rebuild(changed, mermaid_renderer='auto', first=False, chapters=None):
+    """Run one incremental rebuild; returns True when the PDF is up to date"""
+    started = time.perf_counter()
+    jobs = build_figures.discover_jobs(mermaid_renderer=mermaid_renderer)
+    entries = figure_index.index_figures(jobs)
+    needed = affected_jobs(jobs, changed)
+
+    tex_changed = first or any(p.endswith(LATEX_EXTENSIONS) for p in changed)
+    if tex_changed:
+        for job in figure_index.used_jobs([e for e in entries if not e['exists']]):
+            if job not in needed:
+                needed.append(job)
+
+    used = {e['path'] for e in entries}
+    figures_changed = False
+    if needed:
+        print(f"🎨 Rebuilding {len(needed)} figure(s)...")
+        for result in build_figures.build_figures(needed):
+            if result['status'] == 'failed':
+                print(f"❌ {result['name']}")
+        figures_changed = any(os.path.normpath(p) in used for job in needed for p in job['produces'])
+
+    if tex_changed or figures_changed:
+        if chapters:
+            result = latex_build.build_draft(chapters, verbose=False)
+        else:
+            result = latex_build.build(verbose=False)
+        if not result['ok']:
+            print(f"❌ Compilation failed, see {project_path(os.path.dirname(result['pdf']))}/main.log")
+            for error in result['errors'][:5]:
+                print(f"   {error}")
+            return False
+        target = latex_build.publish(result['pdf'], name='main-draft.pdf' if chapters else None)
+        print(f"✅ {project_path(target)} updated ({result['passes']} pass(es)) in {time.perf_counter() - started:.1f}s")
+    else:
+        print(f"✅ Figures up to date in {time.perf_counter() - started:.1f}s")
+    return True
+
+
+def watch(debounce=DEBOUNCE_SECONDS, mermaid_renderer='auto', chapters=None, daemon=True):
+    if shutil.which(latex_build.LATEX_COMMAND[0]) is None:
+        print(f"❌ Error: {latex_build.LATEX_COMMAND[0]} not found on PATH")
+        return 1
+    watcher = make_watcher()
+    kind = 'inotify' if isinstance(watcher, InotifyWatcher) else 'polling'
+    own_daemon = daemon and figure_daemon.supported() and figure_daemon.status() is None
+    if own_daemon and not figure_daemon.start():
+        print("⚠️  Figure daemon unavailable, figures render in worker processes")
+        own_daemon = False
+    print(f"👀 Watching {', '.join(WATCH_DIRS + WATCH_FILES)} ({kind}), Ctrl+C to stop")
+    rebuild(set(), mermaid_renderer, first=True, chapters=chapters)
+    try:
+        while True:
+            changed = wait_for_changes(watcher, debounce)
+            print("")
+            print("✏️  Changed: " + ", ".join(sorted(project_path(p) for p in changed)))
+            rebuild(changed, mermaid_renderer, chapters=chapters)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+    finally:
+        if own_daemon:
+            figure_daemon.stop()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rebuild figures and the PDF when sources change')
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE_SECONDS,
+                        help='Seconds of quiet before a burst of saves triggers a rebuild')
+    parser.add_argument('--mermaid-renderer', choices=build_figures.MERMAID_RENDERERS, default='auto')
+    parser.add_argument('--chapter', action='append', help='Only compile this chapter, e.g. chap_03 (repeatable)')
+    parser.add_argument('--no-daemon', action='store_true', help='Do not keep a warm figure daemon running')
+    args = parser.parse_args(argv)
+
+    chapters = None
+    if args.chapter:
+        try:
+            chapters = latex_build.resolve_chapters(args.chapter, os.path.join(PROJECT_ROOT, 'main.tex'))
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return 1
+    return watch(args.debounce, args.mermaid_renderer, chapters, daemon=not args.no_daemon)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Diagram Connectors
+Draws every connector of a diagram as one LineCollection
+
+Edges are given as arrays of start and end points. Each routing style is
+evaluated for all of its edges in one NumPy broadcast, so a diagram with
+hundreds of actor-use case links still adds a single artist:
+- straight: start -> end
+- elbow:    horizontal, vertical, horizontal, turning at `elbow_at` of the way
+- curved:   quadratic Bezier through the midpoint lifted by `curve`
+- auto:     curved when the edge spans more than `curve_min_dx`, else elbow
+
+Usage:
+    from connectors import draw_connectors
+    draw_connectors(ax, starts, ends, style='curved', curve=0.2, color='k', linewidth=1)
+"""
+
+import numpy as np
+from matplotlib.collections import LineCollection
+
+STYLES = ('straight', 'elbow', 'curved', 'auto')
+
+CURVE_SAMPLES = 50
+CURVE_MIN_DX = 2
+
+
+def _straight(starts, ends):
+    return np.stack([starts, ends], axis=1)
+
+
+def _elbow(starts, ends, elbow_at):
+    turn_x = starts[:, 0] + (ends[:, 0] - starts[:, 0]) * elbow_at
+    return np.stack([starts,
+                     np.column_stack([turn_x, starts[:, 1]]),
+                     np.column_stack([turn_x, ends[:, 1]]),
+                     ends], axis=1)
+
+
+def _curved(starts, ends, curve, samples):
+    control = (starts + ends) / 2
+    control[:, 1] += curve
+    t = np.linspace(0, 1, samples)[None, :, None]
+    return ((1 - t) ** 2 * starts[:, None, :]
+            + 2 * (1 - t) * t * control[:, None, :]
+            + t ** 2 * ends[:, None, :])
+
+
+def connector_paths(starts, ends, style='straight', curve=0.3, elbow_at=0.7,
+                    samples=CURVE_SAMPLES, curve_min_dx=CURVE_MIN_DX):
+    """
+    Vertices of every connector, in edge order.
+
+    `style` and `curve` are either one value for all edges or one per edge.
+    Returns a list of (k, 2) arrays; edges of the same style share k.
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    count = len(starts)
+    styles = np.broadcast_to(np.asarray(style, dtype=object), (count,))
+    curve = np.broadcast_to(np.asarray(curve, dtype=float), (count,))
+
+    unknown = set(styles) - set(STYLES)
+    if unknown:
+        raise ValueError(f"unknown connector style(s): {', '.join(sorted(map(str, unknown)))}")
+    long_edge = np.abs(ends[:, 0] - starts[:, 0]) > curve_min_dx
+    styles = np.where(styles == 'auto', np.where(long_edge, 'curved', 'elbow'), styles)
+
+    paths = [None] * count
+    for name in ('straight', 'elbow', 'curved'):
+        index = np.flatnonzero(styles == name)
+        if not len(index):
+            continue
+        if name == 'straight':
+            vertices = _straight(starts[index], ends[index])
+        elif name == 'elbow':
+            vertices = _elbow(starts[index], ends[index], elbow_at)
+        else:
+            vertices = _curved(starts[index], ends[index], curve[index], samples)
+        for i, path in zip(index, vertices):
+            paths[i] = path
+    return paths
+
+
+def connector_collection(starts, ends, style='straight', curve=0.3, elbow_at=0.7, **line_kwargs):
+    """A LineCollection with every connector; keyword arguments go to LineCollection"""
+    return LineCollection(connector_paths(starts, ends, style, curve, elbow_at), **line_kwargs)
+
+
+def draw_connectors(ax, starts, ends, style='straight', curve=0.3, elbow_at=0.7, **line_kwargs):
+    """Add all connectors to `ax` as one artist and return it"""
+    collection = connector_collection(starts, ends, style, curve, elbow_at, **line_kwargs)
+    ax.add_collection(collection)
+    return collection
@@ -3,11 +3,15 @@ Create stick figure assets for UML diagrams
 """
 
 import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 import os
 
-def create_stick_figure_asset(name, color='black', size=100):
-    """Create a stick figure PNG asset"""
+from figure_export import save_figure
+from stick_figure import draw_stick_figures
+
+ICONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets', 'icons')
+
+def create_stick_figure_assets(names, color='black'):
+    """Create stick figure PNG assets that share a colour from a single drawing"""
     
     fig, ax = plt.subplots(1, 1, figsize=(2, 2))
     ax.set_xlim(-1, 1)
@@ -15,27 +19,20 @@ def create_stick_figure_asset(name, color='black', size=100):
     ax.set_aspect('equal')
     ax.axis('off')
     
-    # Head (circle)
-    head = plt.Circle((0, 0.5), 0.2, fill=False, color=color, linewidth=3)
-    ax.add_patch(head)
-    
-    # Body (vertical line)
-    ax.plot([0, 0], [0.3, -0.3], color=color, linewidth=3)
+    # Head, body, arms and legs as one artist
+    draw_stick_figures(ax, [(0, 0)], color=color, linewidth=3)
     
-    # Arms (horizontal line)
-    ax.plot([-0.3, 0.3], [0.1, 0.1], color=color, linewidth=3)
-    
-    # Legs (diagonal lines)
-    ax.plot([0, -0.2], [-0.3, -0.7], color=color, linewidth=3)
-    ax.plot([0, 0.2], [-0.3, -0.7], color=color, linewidth=3)
-    
-    # Save as transparent PNG
-    os.makedirs('../assets/icons', exist_ok=True)
+    # Save as transparent PNG, identical assets are hard links to one render
     fig.patch.set_alpha(0)  # Make background transparent
-    fig.savefig(f'../assets/icons/{name}.png', dpi=300, bbox_inches='tight', 
-               transparent=True, pad_inches=0)
+    save_figure(fig, [os.path.join(ICONS_DIR, f'{name}.png') for name in names],
+                dpi=300, bbox_inches='tight', transparent=True, pad_inches=0)
     plt.close(fig)
-    print(f"✅ Created stick figure: {name}.png")
+    for name in names:
+        print(f"✅ Created stick figure: {name}.png")
+
+def create_stick_figure_asset(name, color='black'):
+    """Create a stick figure PNG asset"""
+    create_stick_figure_assets([name], color)
 
 def create_all_actors():
     """Create all actor stick figures"""
@@ -48,8 +45,11 @@ def create_all_actors():
         ('system', 'black')
     ]
     
+    by_color = {}
     for name, color in actors:
-        create_stick_figure_asset(name, color)
+        by_color.setdefault(color, []).append(name)
+    for color, names in by_color.items():
+        create_stick_figure_assets(names, color)
 
 if __name__ == "__main__":
     print("🎨 Creating UML Actor Assets...")
@@ -8,6 +8,8 @@ import matplotlib.patches as patches
 import numpy as np
 import os
 
+from figure_export import save_figure
+
 def create_logo_placeholder(size=64):
     """Create a simple placeholder logo"""
     fig, ax = plt.subplots(1, 1, figsize=(1, 1))
@@ -24,8 +26,8 @@ def create_logo_placeholder(size=64):
     
     # Save
     os.makedirs('../assets', exist_ok=True)
-    fig.savefig(f'../assets/logo-placeholder.png', dpi=size, 
-                bbox_inches='tight', facecolor='white', 
+    save_figure(fig, ['../assets/logo-placeholder.png'], dpi=size,
+                bbox_inches='tight', facecolor='white',
                 edgecolor='none', pad_inches=0, transparent=True)
     plt.close()
 
@@ -0,0 +1,297 @@
+"""
+Content-Addressed Figure Cache
+Skips re-rendering figures whose inputs have not changed
+
+Every figure is keyed by the SHA-256 of its generator source, its .mmd/.puml
+input, scripts/mermaid-config.json (for Mermaid jobs) and the render
+parameters (width, height, scale, dpi). Rendered outputs are stored once by
+content hash under .cache/objects/ and each key records which outputs it
+produced. On a hit the stored files are copied back into place instead of
+starting matplotlib or mmdc again. Outputs are made deterministic before
+they are stored (figure_export.make_deterministic), so re-rendering
+unchanged inputs stores the very same bytes. An object is checked against
+its digest before it is restored, so one changed in place (through a hard
+link) is dropped instead of copied back.
+
+Usage:
+    python figure_cache.py --source diagram.mmd --source mermaid-config.json \\
+        --output diagram.png --param width=1600 -- mmdc -i diagram.mmd -o diagram.png
+    python figure_cache.py --stats
+    python figure_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from figure_export import make_deterministic
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get('FIGURE_CACHE_DIR', os.path.join(PROJECT_ROOT, '.cache'))
+MERMAID_CONFIG = os.path.join(PROJECT_ROOT, 'scripts', 'mermaid-config.json')
+
+# Bump when the key layout changes so old entries are ignored
+CACHE_VERSION = 1
+
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def project_path(path):
+    """Return a path relative to the project root, with forward slashes"""
+    return os.path.relpath(os.path.abspath(path), PROJECT_ROOT).replace(os.sep, '/')
+
+
+def figure_key(sources, params=None):
+    """Compute the cache key for a figure from its inputs and render parameters"""
+    digest = hashlib.sha256(f'figure-cache-v{CACHE_VERSION}\n'.encode())
+    for source in sources:
+        digest.update(f'{project_path(source)}:{file_digest(source)}\n'.encode())
+    # Stringify values so shell (--param width=1600) and Python callers agree
+    params = {name: str(value) for name, value in (params or {}).items()}
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, 'figures', key[:2], f'{key}.json')
+
+
+def object_path(digest):
+    """Return where the content with the given digest lives in the store"""
+    return os.path.join(CACHE_DIR, 'objects', digest[:2], digest)
+
+
+def _copy_atomic(src, dst):
+    """Copy src over dst without ever leaving a half-written dst behind"""
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    tmp = f'{dst}.tmp-{os.getpid()}'
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def detach(paths):
+    """
+    Give each path that shares its inode with other files a copy of its own.
+
+    Called before a render: tools like mmdc and PlantUML write their outputs
+    in place, which would also change every hard link to them (figure
+    targets linked by save_figure(), files linked to the asset store).
+    """
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if stat.st_nlink > 1:
+            _copy_atomic(path, path)
+            # An unchanged re-render keeps the file as is, mtime included
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def lookup(key):
+    """Return the {output: digest} manifest stored for a key, or None on a miss"""
+    try:
+        with open(_entry_path(key)) as f:
+            outputs = json.load(f)['outputs']
+    except (OSError, ValueError, KeyError):
+        return None
+    if not all(os.path.exists(object_path(d)) for d in outputs.values()):
+        return None
+    return outputs
+
+
+def _intact(digest):
+    """True when the stored object still holds `digest`; a damaged one is removed"""
+    path = object_path(digest)
+    try:
+        if file_digest(path) == digest:
+            return True
+    except OSError:
+        return False
+    # Changed in place, e.g. written through a hard link (asset_store.py --dedup)
+    os.remove(path)
+    return False
+
+
+def restore(key):
+    """
+    Copy the outputs stored for a key back into place; returns them or None.
+
+    Objects are checked against their digest before they are copied; when
+    one no longer matches, the entry is dropped and the figure counts as a
+    miss, so it is rendered again instead of restoring the wrong bytes.
+    """
+    outputs = lookup(key)
+    if outputs is None:
+        return None
+    targets = {os.path.join(PROJECT_ROOT, rel_path): digest for rel_path, digest in sorted(outputs.items())}
+    # Leave identical files untouched so their mtime does not change
+    stale = {target: digest for target, digest in targets.items()
+             if not (os.path.exists(target) and file_digest(target) == digest)}
+    if not all(_intact(digest) for digest in set(stale.values())):
+        try:
+            os.remove(_entry_path(key))
+        except OSError:
+            pass
+        return None
+    for target, digest in stale.items():
+        _copy_atomic(object_path(digest), target)
+    return list(targets)
+
+
+def store(key, outputs):
+    """Record freshly rendered outputs under a key"""
+    manifest = {}
+    for output in outputs:
+        make_deterministic(output)
+        digest = file_digest(output)
+        if not os.path.exists(object_path(digest)):
+            _copy_atomic(output, object_path(digest))
+        manifest[project_path(output)] = digest
+
+    entry = _entry_path(key)
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    tmp = f'{entry}.tmp-{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump({'outputs': manifest}, f, indent=2, sort_keys=True)
+    os.replace(tmp, entry)
+
+
+def replace_outputs(replaced):
+    """
+    Point cache entries at the current content of files rewritten in place.
+
+    `replaced` maps output paths to the digest they had before; every entry
+    that recorded that digest for the path now records the new file, so the
+    next restore keeps it instead of bringing the old bytes back. For
+    rewrites that keep what the figure shows (png_optimize.py).
+    """
+    replaced = {project_path(path): (old, path) for path, old in replaced.items()}
+    if not replaced:
+        return 0
+    new_digests = {}
+    updated = 0
+    for root, _, files in os.walk(os.path.join(CACHE_DIR, 'figures')):
+        for name in files:
+            entry = os.path.join(root, name)
+            try:
+                with open(entry) as f:
+                    outputs = json.load(f)['outputs']
+            except (OSError, ValueError, KeyError):
+                continue
+            changed = False
+            for rel_path, (old, path) in replaced.items():
+                if outputs.get(rel_path) != old:
+                    continue
+                if rel_path not in new_digests:
+                    new_digests[rel_path] = file_digest(path)
+                    if not os.path.exists(object_path(new_digests[rel_path])):
+                        _copy_atomic(path, object_path(new_digests[rel_path]))
+                outputs[rel_path] = new_digests[rel_path]
+                changed = True
+            if changed:
+                tmp = f'{entry}.tmp-{os.getpid()}'
+                with open(tmp, 'w') as f:
+                    json.dump({'outputs': outputs}, f, indent=2, sort_keys=True)
+                os.replace(tmp, entry)
+                updated += 1
+    return updated
+
+
+def run_cached(sources, outputs, render, params=None):
+    """
+    Restore a figure from the cache, or render it and store the result.
+
+    `render` is called with no arguments and should return False (or raise)
+    on failure; outputs are only stored when every one of them exists.
+    Returns 'cached', 'built' or 'failed'.
+    """
+    key = figure_key(sources, params)
+    restored = restore(key)
+    if restored is not None:
+        for path in restored:
+            print(f"♻️  Cached: {project_path(path)}")
+        return 'cached'
+
+    detach(outputs)
+    if render() is False:
+        return 'failed'
+    missing = [p for p in outputs if not os.path.exists(p)]
+    if missing:
+        print(f"⚠️  Not caching, missing outputs: {', '.join(missing)}")
+        return 'failed'
+    store(key, outputs)
+    return 'built'
+
+
+def cache_stats():
+    """Return (entries, objects, bytes) currently held in the cache"""
+    entries = objects = size = 0
+    for kind in ('figures', 'objects'):
+        for root, _, files in os.walk(os.path.join(CACHE_DIR, kind)):
+            for name in files:
+                if kind == 'figures':
+                    entries += 1
+                else:
+                    objects += 1
+                    size += os.path.getsize(os.path.join(root, name))
+    return entries, objects, size
+
+
+def parse_params(pairs):
+    """Turn ['width=1600', 'scale=2'] into {'width': '1600', 'scale': '2'}"""
+    params = {}
+    for pair in pairs:
+        name, sep, value = pair.partition('=')
+        if not sep:
+            raise ValueError(f"Parameter must be name=value: {pair}")
+        params[name] = value
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a figure command through the content-addressed cache')
+    parser.add_argument('--source', action='append', default=[], help='Input file that affects the figure (repeatable)')
+    parser.add_argument('--output', action='append', default=[], help='File produced by the command (repeatable)')
+    parser.add_argument('--param', action='append', default=[], help='Render parameter as name=value (repeatable)')
+    parser.add_argument('--stats', action='store_true', help='Show cache size and exit')
+    parser.add_argument('--clear', action='store_true', help='Delete the cache and exit')
+    parser.add_argument('command', nargs=argparse.REMAINDER, help='Render command, after --')
+    args = parser.parse_args(argv)
+
+    if args.clear:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        print(f"🗑️  Cleared figure cache: {CACHE_DIR}")
+        return 0
+    if args.stats:
+        entries, objects, size = cache_stats()
+        print(f"📦 {entries} figures, {objects} stored files, {size / 1024 / 1024:.1f} MB in {CACHE_DIR}")
+        return 0
+
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    if not args.source or not args.output or not command:
+        parser.error('--source, --output and a command after -- are required')
+
+    status = {'returncode': 0}
+
+    def render():
+        status['returncode'] = subprocess.run(command).returncode
+        return status['returncode'] == 0
+
+    run_cached(args.source, args.output, render, parse_params(args.param))
+    return status['returncode']
+
+
+if __name__ == "__main__":
+    sys.exit(main())
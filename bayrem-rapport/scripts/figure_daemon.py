@@ -0,0 +1,292 @@
+"""
+Figure Daemon
+Keeps matplotlib warm between figure renders
+
+Starting Python, importing matplotlib and numpy and loading the font cache
+takes about a second, more than drawing most figures. The daemon pays that
+once, then renders jobs sent over a Unix socket (.cache/figure-daemon.sock)
+with build_figures.run_job() on the Agg backend, so a regeneration while
+editing only costs the draw itself.
+
+build_figures.py hands use case and native Mermaid jobs to a running daemon
+when only a few are pending (the build_watch.py case, which starts the
+daemon); full builds keep using the process pool. When a script in scripts/
+changes, the daemon restarts itself before its next render so it never draws
+with stale code, and it exits after 30 minutes without requests.
+
+It also draws quick use case previews (usecase_diagram.preview()), whose
+chrome comes from the layer cache, so an edit-and-look loop stays well under
+a second.
+
+Each connection carries one JSON request ({"op": "ping"}, {"op": "render",
+"job": {...}}, {"op": "preview", "spec": ..., "output": ...} or {"op":
+"stop"}) and one JSON reply.
+
+Usage:
+    python figure_daemon.py start
+    python figure_daemon.py status
+    python figure_daemon.py render ../figures/figure-2.1-customer-usecase/usecase.json
+    python figure_daemon.py preview ../figures/figure-2.1-customer-usecase/usecase.json /tmp/preview.png
+    python figure_daemon.py stop
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from figure_cache import CACHE_DIR, project_path
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SOCKET_PATH = os.environ.get('FIGURE_DAEMON_SOCKET', os.path.join(CACHE_DIR, 'figure-daemon.sock'))
+LOG_PATH = os.path.join(CACHE_DIR, 'figure-daemon.log')
+
+# Job renderers that draw in-process; tool jobs (mmdc, plantuml) gain nothing
+RENDERERS = ('usecase', 'native')
+
+IDLE_TIMEOUT = 30 * 60
+START_TIMEOUT = 20
+PING_TIMEOUT = 2
+RENDER_TIMEOUT = 300
+
+
+def supported():
+    return hasattr(socket, 'AF_UNIX')
+
+
+def request(message, timeout=RENDER_TIMEOUT, socket_path=SOCKET_PATH):
+    """Send one request to the daemon; returns its reply, or None when none is listening"""
+    if not supported() or not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(socket_path)
+            conn.sendall(json.dumps(message).encode())
+            conn.shutdown(socket.SHUT_WR)
+            data = b''.join(iter(lambda: conn.recv(1 << 16), b''))
+        return json.loads(data)
+    except (OSError, ValueError):
+        return None
+
+
+def status():
+    """The daemon's {'pid', 'uptime', 'rendered'}, or None when it is not running"""
+    return request({'op': 'ping'}, timeout=PING_TIMEOUT)
+
+
+def _wait_until_running(timeout=START_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if status() is not None:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def start(timeout=START_TIMEOUT):
+    """Start the daemon in the background unless one is running; True once it answers"""
+    if not supported():
+        return False
+    if status() is not None:
+        return True
+    os.makedirs(os.path.dirname(os.path.abspath(SOCKET_PATH)), exist_ok=True)
+    with open(LOG_PATH, 'a') as log:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve'], cwd=SCRIPT_DIR,
+                         stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                         start_new_session=True)
+    return _wait_until_running(timeout)
+
+
+def stop():
+    """Ask the daemon to exit; returns its pid, or None when it was not running"""
+    reply = request({'op': 'stop'}, timeout=PING_TIMEOUT)
+    return reply.get('stopped') if reply else None
+
+
+def render(job):
+    """Render a build_figures job in the daemon; returns the result, or None to render locally"""
+    for _ in range(2):
+        reply = request({'op': 'render', 'job': job})
+        if reply is None:
+            return None
+        if 'result' in reply:
+            return reply['result']
+        # The daemon saw new code and is restarting
+        if not _wait_until_running():
+            return None
+    return None
+
+
+def preview(spec_path, output, dpi=None):
+    """Write a use case preview in the daemon; returns the path, or None to draw locally"""
+    for _ in range(2):
+        reply = request({'op': 'preview', 'spec': os.path.abspath(spec_path),
+                         'output': os.path.abspath(output), 'dpi': dpi})
+        if reply is None:
+            return None
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        if 'output' in reply:
+            return reply['output']
+        if not _wait_until_running():
+            return None
+    return None
+
+
+def _code_state():
+    """mtime of every script the daemon may have imported"""
+    return {name: os.stat(os.path.join(SCRIPT_DIR, name)).st_mtime_ns
+            for name in os.listdir(SCRIPT_DIR) if name.endswith('.py')}
+
+
+def _preload():
+    import matplotlib
+    matplotlib.use('Agg')
+
+    import build_figures
+    import mermaid_native  # noqa: F401
+    import text_metrics
+    import usecase_diagram
+
+    # Resolving the fonts loads matplotlib's font cache
+    for weight in ('normal', 'bold'):
+        text_metrics.font_file(weight=weight)
+    return build_figures, text_metrics, usecase_diagram
+
+
+def _reply(conn, message):
+    try:
+        conn.sendall(json.dumps(message).encode())
+    except OSError:
+        pass
+
+
+def serve(socket_path=SOCKET_PATH, idle_timeout=IDLE_TIMEOUT):
+    """Run the daemon in the foreground until stopped or idle"""
+    started = time.time()
+    build_figures, text_metrics, usecase_diagram = _preload()
+    code = _code_state()
+
+    if os.path.exists(socket_path):
+        if request({'op': 'ping'}, PING_TIMEOUT, socket_path) is not None:
+            print(f"⚠️  A figure daemon already listens on {socket_path}", flush=True)
+            return 1
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(16)
+    server.settimeout(idle_timeout)
+    print(f"🚀 Figure daemon {os.getpid()} ready in {time.time() - started:.1f}s on {socket_path}", flush=True)
+
+    rendered = 0
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                print(f"💤 Idle for {idle_timeout}s, exiting", flush=True)
+                return 0
+            with conn:
+                conn.settimeout(PING_TIMEOUT)
+                try:
+                    message = json.loads(b''.join(iter(lambda: conn.recv(1 << 16), b'')))
+                except (OSError, ValueError):
+                    continue
+                op = message.get('op')
+                if op in ('render', 'preview') and _code_state() != code:
+                    # Free the socket first so clients wait for the new process
+                    server.close()
+                    os.unlink(socket_path)
+                    _reply(conn, {'restart': True})
+                    conn.close()
+                    text_metrics.flush()
+                    print("🔄 Scripts changed, restarting", flush=True)
+                    os.execv(sys.executable, [sys.executable, os.path.abspath(__file__), 'serve'])
+                if op == 'render':
+                    result = build_figures.run_job(message['job'])
+                    text_metrics.flush()
+                    rendered += 1
+                    print(f"{result['status']:<8} {result['name']} ({result['seconds']:.2f}s)", flush=True)
+                    _reply(conn, {'result': result})
+                elif op == 'preview':
+                    try:
+                        output = usecase_diagram.preview_file(message['spec'], message['output'],
+                                                              message.get('dpi') or usecase_diagram.PREVIEW_DPI)
+                    except Exception as e:
+                        _reply(conn, {'error': f'{type(e).__name__}: {e}'})
+                    else:
+                        text_metrics.flush()
+                        _reply(conn, {'output': output})
+                elif op == 'stop':
+                    _reply(conn, {'stopped': os.getpid()})
+                    return 0
+                else:
+                    _reply(conn, {'pid': os.getpid(), 'uptime': time.time() - started, 'rendered': rendered})
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Keep a warm matplotlib process for figure renders')
+    parser.add_argument('command', choices=('start', 'stop', 'status', 'serve', 'render', 'preview'))
+    parser.add_argument('specs', nargs='*', help='usecase.json or .mmd files (render), spec and PNG (preview)')
+    args = parser.parse_args(argv)
+
+    if not supported():
+        print("❌ Unix sockets are not available on this system")
+        return 1
+    if args.command == 'serve':
+        return serve()
+    if args.command == 'start':
+        started = time.perf_counter()
+        if not start():
+            print(f"❌ Figure daemon did not start, see {project_path(LOG_PATH)}")
+            return 1
+        print(f"🚀 Figure daemon {status()['pid']} ready ({time.perf_counter() - started:.1f}s)")
+        return 0
+    if args.command == 'stop':
+        pid = stop()
+        print(f"🛑 Stopped figure daemon {pid}" if pid else "💤 No figure daemon running")
+        return 0
+    if args.command == 'status':
+        info = status()
+        if info is None:
+            print("💤 No figure daemon running")
+            return 1
+        print(f"🟢 Figure daemon {info['pid']}: up {info['uptime'] / 60:.0f} min, {info['rendered']} renders")
+        return 0
+
+    if args.command == 'preview':
+        if len(args.specs) != 2:
+            print("Usage: python figure_daemon.py preview usecase.json preview.png")
+            return 2
+        started = time.perf_counter()
+        output = preview(*args.specs) if start() else None
+        if output is None:
+            import usecase_diagram
+            output = usecase_diagram.preview_file(*args.specs)
+        print(f"👀 Preview: {output} ({time.perf_counter() - started:.2f}s)")
+        return 0
+
+    import build_figures
+    if not args.specs:
+        print("Usage: python figure_daemon.py render usecase.json|diagram.mmd [...]")
+        return 2
+    if not start():
+        print(f"⚠️  Figure daemon unavailable, rendering locally (see {project_path(LOG_PATH)})")
+    wanted = {project_path(path) for path in args.specs}
+    jobs = [job for job in build_figures.discover_jobs(('mermaid', 'matplotlib'), 'native')
+            if job['name'] in wanted]
+    results = build_figures.build_figures(jobs)
+    build_figures.print_summary(results)
+    return 1 if any(r['status'] == 'failed' for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
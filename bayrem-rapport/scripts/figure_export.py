@@ -0,0 +1,231 @@
+"""
+Figure Export
+Writes one rendered figure to PNG and vector files
+
+The matplotlib generators render each figure once and save it to every
+output path. With vector formats enabled, each .png output also gets a .pdf
+(and optionally .svg) sibling. pdflatex embeds the PDF as is, so the text
+stays text and nothing has to be recompressed, and tpl/new_commands.tex makes
+\\includegraphics{img/x.png} pick img/x.pdf whenever it exists. The PNG is
+still written for the README, the slides and the Mermaid browser fallback.
+Producers that write only the PNG call drop_stale_vectors(), so an older
+PDF next to it is not embedded in its place.
+
+save_figure() draws each figure once per format and resolution: the tight
+bounding box is computed a single time, the first target of each (format,
+dpi) is rendered and every other identical target is hard-linked to it
+(copied across file systems) instead of rasterising the figure again.
+
+Outputs are deterministic: the same figure always gives the same bytes, so
+the content-hash caches hit and pdflatex, git and the watcher see no change
+after a rebuild. save_figure() leaves out creation dates and software
+versions, uses a fixed salt for SVG ids, and keeps an existing file (and its
+mtime) when the new one is identical. make_deterministic() does the same
+for files written by other tools (mmdc, PlantUML): it drops time and
+software chunks from PNG files and pins dates and /ID in PDF files, without
+changing their length; figure_cache.store() applies it to every output.
+
+Formats come from --formats on build_figures.py, a usecase.json "formats"
+entry or the FIGURE_FORMATS environment variable (default: png,pdf).
+
+Usage:
+    from figure_export import with_formats, save_figure
+    outputs = with_formats(['img/diagram.png'], ['png', 'pdf', 'svg'])
+    save_figure(fig, outputs, dpi=300, bbox_inches='tight')
+    save_figure(fig, ['big.png', ('preview.png', 96)], dpi=300)   # per-target dpi
+"""
+
+import filecmp
+import hashlib
+import os
+import re
+import shutil
+import struct
+
+FORMATS = ('png', 'pdf', 'svg')
+VECTOR_FORMATS = ('pdf', 'svg')
+DEFAULT_FORMATS = ('png', 'pdf')
+
+# Embed TrueType fonts instead of Type 3 so PDF text stays searchable and small;
+# without a salt, SVG clip path ids are random
+VECTOR_RC = {'pdf.fonttype': 42, 'svg.fonttype': 'none', 'svg.hashsalt': 'figure-export'}
+
+# None drops the key: dates change every run, versions from machine to machine
+FIXED_METADATA = {
+    'png': {'Software': None},
+    'pdf': {'Creator': None, 'Producer': None, 'CreationDate': None},
+    'svg': {'Creator': None, 'Date': None},
+}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_TEXT_CHUNKS = (b'tEXt', b'zTXt', b'iTXt')
+# Text keys written by matplotlib, ImageMagick and browsers
+VOLATILE_PNG_KEYS = {b'Software', b'Creation Time', b'Timestamp', b'date:create', b'date:modify',
+                     b'date:timestamp', b'create-date', b'modify-date'}
+PDF_DATE_PATTERN = re.compile(rb'/(?:CreationDate|ModDate)\s*\((D:[^)]*)\)')
+PDF_ID_PATTERN = re.compile(rb'/ID\s*\[\s*<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>\s*\]')
+PDF_FIXED_DATE = b'D:19800101000000'
+
+
+def parse_formats(formats=None):
+    """Normalise 'png,pdf' or ['png', 'pdf'] to a tuple; None uses FIGURE_FORMATS"""
+    if formats is None:
+        formats = os.environ.get('FIGURE_FORMATS') or ','.join(DEFAULT_FORMATS)
+    if isinstance(formats, str):
+        formats = formats.split(',')
+    formats = tuple(dict.fromkeys(f.strip().lower().lstrip('.') for f in formats if f.strip()))
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"unknown figure format(s): {', '.join(sorted(unknown))}, "
+                         f"expected {', '.join(FORMATS)}")
+    return formats
+
+
+def with_formats(outputs, formats=None):
+    """Outputs plus a vector sibling of every .png output for each requested vector format"""
+    formats = parse_formats(formats)
+    result = []
+    for output in outputs:
+        result.append(output)
+        stem, ext = os.path.splitext(output)
+        if ext.lower() == '.png':
+            result.extend(f'{stem}.{fmt}' for fmt in VECTOR_FORMATS if fmt in formats)
+    return list(dict.fromkeys(result))
+
+
+def format_params(formats=None):
+    """Cache parameters for a format selection (PNG only keeps the old keys)"""
+    formats = parse_formats(formats)
+    vector = [fmt for fmt in VECTOR_FORMATS if fmt in formats]
+    return {'formats': ','.join(vector)} if vector else {}
+
+
+def link_or_copy(source, target):
+    """Make `target` a hard link to `source`, or a copy when linking is not possible"""
+    if os.path.exists(target) and os.path.samefile(source, target):
+        return target
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    tmp = f'{target}.tmp-{os.getpid()}'
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+    return target
+
+
+def drop_stale_vectors(outputs):
+    """
+    Delete the x.pdf next to each x.png of `outputs` that has no .pdf output.
+
+    For producers that only write rasters (mmdc, PlantUML, --formats png):
+    tpl/new_commands.tex embeds x.pdf whenever it exists, so a PDF left by an
+    earlier vector render would show the old drawing. Returns the deleted paths.
+    """
+    outputs = {os.path.abspath(path) for path in outputs}
+    dropped = []
+    for path in sorted(outputs):
+        stem, ext = os.path.splitext(path)
+        vector = f'{stem}.pdf'
+        if ext.lower() == '.png' and vector not in outputs and os.path.exists(vector):
+            os.remove(vector)
+            dropped.append(vector)
+    return dropped
+
+
+def _deterministic_png(data):
+    chunks = []
+    position = len(PNG_SIGNATURE)
+    while position + 8 <= len(data):
+        length, kind = struct.unpack('>I4s', data[position:position + 8])
+        end = position + 12 + length
+        keyword = data[position + 8:end - 4].split(b'\0', 1)[0]
+        if kind != b'tIME' and not (kind in PNG_TEXT_CHUNKS and keyword in VOLATILE_PNG_KEYS):
+            chunks.append(data[position:end])
+        position = end
+    return PNG_SIGNATURE + b''.join(chunks) + data[position:]
+
+
+def _fixed_date(match):
+    value = match.group(1)
+    fixed = PDF_FIXED_DATE[:len(value)] + re.sub(rb'[0-9]', b'0', value[len(PDF_FIXED_DATE):])
+    return match.group(0).replace(value, fixed)
+
+
+def _deterministic_pdf(data):
+    # Same-length substitutions keep the xref offsets valid
+    data = PDF_DATE_PATTERN.sub(_fixed_date, data)
+    ids = PDF_ID_PATTERN.search(data)
+    if ids:
+        blank = data[:ids.start()] + data[ids.end():]
+        digest = hashlib.sha256(blank).hexdigest().upper().encode()
+        fixed = ids.group(0)
+        for value in ids.groups():
+            fixed = fixed.replace(value, (digest * 2)[:len(value)], 1)
+        data = data[:ids.start()] + fixed + data[ids.end():]
+    return data
+
+
+def make_deterministic(path):
+    """Strip dates, software versions and random ids from a PNG or PDF in place; True if it changed"""
+    fmt = os.path.splitext(path)[1].lower().lstrip('.')
+    if fmt not in ('png', 'pdf'):
+        return False
+    with open(path, 'rb') as f:
+        data = f.read()
+    if fmt == 'png':
+        fixed = _deterministic_png(data) if data.startswith(PNG_SIGNATURE) else data
+    else:
+        fixed = _deterministic_pdf(data)
+    if fixed == data:
+        return False
+    tmp = f'{path}.tmp-{os.getpid()}'
+    with open(tmp, 'wb') as f:
+        f.write(fixed)
+    os.replace(tmp, path)
+    return True
+
+
+def _tight_bbox(fig, pad_inches=None):
+    """The bbox_inches='tight' area of `fig`, computed once for every format"""
+    from matplotlib import rcParams
+
+    fig.draw_without_rendering()
+    pad = rcParams['savefig.pad_inches'] if pad_inches in (None, 'layout') else pad_inches
+    return fig.get_tightbbox().padded(pad)
+
+
+def save_figure(fig, outputs, dpi=None, **savefig_kwargs):
+    """
+    Save `fig` to every output, rendering it once per format and dpi.
+
+    Outputs are paths or (path, dpi) pairs, the format is taken from the
+    extension. Returns the paths written.
+    """
+    from matplotlib import rc_context
+
+    groups = {}
+    for output in outputs:
+        path, path_dpi = output if isinstance(output, (list, tuple)) else (output, dpi)
+        fmt = os.path.splitext(path)[1].lower().lstrip('.')
+        groups.setdefault((fmt, path_dpi), []).append(path)
+
+    if savefig_kwargs.get('bbox_inches') == 'tight' and len(groups) > 1:
+        savefig_kwargs['bbox_inches'] = _tight_bbox(fig, savefig_kwargs.pop('pad_inches', None))
+
+    metadata = savefig_kwargs.pop('metadata', None) or {}
+    written = []
+    with rc_context(VECTOR_RC):
+        for (fmt, group_dpi), paths in groups.items():
+            first = paths[0]
+            os.makedirs(os.path.dirname(os.path.abspath(first)), exist_ok=True)
+            # A new file, never written through an old hard link
+            tmp = f'{first}.tmp-{os.getpid()}'
+            fig.savefig(tmp, format=fmt, dpi=group_dpi,
+                        metadata={**FIXED_METADATA.get(fmt, {}), **metadata}, **savefig_kwargs)
+            if os.path.exists(first) and filecmp.cmp(tmp, first, shallow=False):
+                os.remove(tmp)
+            else:
+                os.replace(tmp, first)
+            written.extend(link_or_copy(first, path) for path in paths)
+    return written
@@ -0,0 +1,265 @@
+"""
+Figure Index
+Maps every \\includegraphics in the report to the job that produces it
+
+Walks main.tex and every file it pulls in with \\input/\\include, collects the
+\\includegraphics calls and resolves each path the way pdflatex does (relative
+to the project root, then each \\graphicspath entry, trying the default
+extensions when none is given, and preferring the .pdf next to a .png as
+tpl/new_commands.tex does). Each resolved file is matched against the
+outputs of the jobs found by build_figures.py, which gives:
+- produced:  a figure job writes this file
+- static:    the file exists but nothing generates it (screenshots, logos)
+- missing:   the file does not exist and nothing generates it
+
+Figures are grouped by the top-level file main.tex includes (the chapter), so
+one chapter's figures can be rebuilt without touching the others.
+
+Usage:
+    python figure_index.py                       # Report every graphic
+    python figure_index.py --chapter chap_02     # Only one chapter
+    python figure_index.py --build               # Build the figures the report uses
+    python figure_index.py --build --chapter chap_01
+    python figure_index.py --check               # Exit 1 if a graphic is missing
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+import build_figures
+import build_report
+import logo_cache
+from figure_cache import PROJECT_ROOT, project_path
+
+MAIN_TEX = os.path.join(PROJECT_ROOT, 'main.tex')
+
+TOKEN_PATTERN = re.compile(
+    r'\\(?:'
+    r'(?:input|include)\s*\{(?P<file>[^}]+)\}'
+    r'|includegraphics\s*(?:\[(?P<options>[^\]]*)\])?\s*\{(?P<graphic>[^}]+)\}'
+    r'|graphicspath\s*\{(?P<dirs>(?:\s*\{[^}]*\})+)\s*\}'
+    r'|techlogo\s*(?:\[[^\]]*\])?\s*\{(?P<logo>[^}]+)\}'
+    r')'
+)
+COMMENT_PATTERN = re.compile(r'(?<!\\)%.*')
+
+# pdflatex's default search order for \includegraphics without an extension
+DEFAULT_EXTENSIONS = ('.png', '.pdf', '.jpg', '.mps', '.jpeg', '.jbig2', '.jb2',
+                      '.PNG', '.PDF', '.JPG', '.JPEG', '.JBIG2', '.JB2')
+
+
+def _tex_file(name):
+    path = os.path.normpath(os.path.join(PROJECT_ROOT, name))
+    return path if os.path.splitext(path)[1] else f'{path}.tex'
+
+
+def scan_tex(main=MAIN_TEX):
+    """
+    Collect the graphics used by the document.
+
+    Returns (graphics, graphicspath): graphics is a list of
+    {'graphic', 'options', 'file', 'line', 'chapter'} dicts in document order.
+    A \\techlogo{docker} counts as build/logos/docker-logo.pdf, with 'logo'
+    set to its SVG; arguments holding a macro parameter (#1) are skipped.
+    """
+    graphics = []
+    graphicspath = []
+    seen = set()
+
+    def walk(path, chapter):
+        if path in seen or not os.path.exists(path):
+            return
+        seen.add(path)
+        with open(path, encoding='utf-8', errors='replace') as f:
+            lines = f.readlines()
+        for number, line in enumerate(lines, 1):
+            for match in TOKEN_PATTERN.finditer(COMMENT_PATTERN.sub('', line)):
+                if match.group('file'):
+                    child = _tex_file(match.group('file').strip())
+                    walk(child, chapter or project_path(child))
+                elif match.group('graphic') or match.group('logo'):
+                    graphic = (match.group('graphic') or match.group('logo')).strip()
+                    # Inside a \newcommand body, e.g. \techlogo's own \includegraphics
+                    if '#' in graphic:
+                        continue
+                    entry = {'graphic': graphic, 'options': match.group('options') or '',
+                             'file': project_path(path), 'line': number, 'chapter': chapter or project_path(path)}
+                    if match.group('logo'):
+                        svg = os.path.join(logo_cache.LOGO_DIR, f'{graphic}-logo.svg')
+                        entry.update(graphic=project_path(logo_cache.output_path(svg)), logo=svg)
+                    graphics.append(entry)
+                else:
+                    graphicspath[:] = re.findall(r'\{([^}]*)\}', match.group('dirs'))
+
+    walk(os.path.abspath(main), None)
+    return graphics, graphicspath
+
+
+def _candidates(graphic, graphicspath, logo=None):
+    """Files pdflatex would try for one \\includegraphics argument, in order"""
+    if logo:
+        # \techlogo embeds the converted PDF; the SVG is what exists before logo_cache.py runs
+        return [os.path.normpath(os.path.join(PROJECT_ROOT, graphic)), logo]
+    bases = [graphic] + [os.path.join(prefix, graphic) for prefix in graphicspath]
+    candidates = []
+    for base in bases:
+        path = os.path.normpath(os.path.join(PROJECT_ROOT, base))
+        ext = os.path.splitext(base)[1]
+        if ext == '.png':
+            # tpl/new_commands.tex swaps in the vector version when there is one
+            candidates.extend([os.path.splitext(path)[0] + '.pdf', path])
+        elif ext:
+            candidates.append(path)
+        else:
+            candidates.extend(path + ext for ext in DEFAULT_EXTENSIONS)
+    return candidates
+
+
+def tex_files(root=PROJECT_ROOT):
+    """Every .tex file of the project, outside build output and caches"""
+    found = []
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d not in ('build', 'output', 'node_modules'))
+        found.extend(os.path.join(dirpath, name) for name in sorted(files) if name.endswith('.tex'))
+    return found
+
+
+def referenced_files(tex=None):
+    """
+    {absolute path: graphic} for every file an \\includegraphics may embed.
+
+    Unlike index_figures(), this looks at every .tex file, included by
+    main.tex or not, and keeps all the candidates of each graphic (x.pdf
+    and x.png for img/x.png). The SVG logos count as referenced too:
+    logo_cache.py converts all of them, for \\techlogo and for the diagrams.
+    """
+    referenced = {}
+    for path in tex or tex_files():
+        graphics, graphicspath = scan_tex(path)
+        for graphic in graphics:
+            for candidate in _candidates(graphic['graphic'], graphicspath, graphic.get('logo')):
+                referenced.setdefault(candidate, graphic)
+    for svg in logo_cache.find_logos():
+        referenced.setdefault(svg, {'graphic': project_path(svg), 'options': '',
+                                    'file': project_path(logo_cache.__file__), 'line': None, 'chapter': None})
+    return referenced
+
+
+def producer_map(jobs):
+    """Return {absolute output path: job} for every file a job produces"""
+    producers = {}
+    for job in jobs:
+        for output in job.get('produces') or []:
+            producers.setdefault(os.path.normpath(os.path.abspath(output)), job)
+    return producers
+
+
+def index_figures(jobs=None, main=MAIN_TEX):
+    """Resolve every graphic of the document to a file and its producer"""
+    if jobs is None:
+        jobs = build_figures.discover_jobs()
+    producers = producer_map(jobs)
+    graphics, graphicspath = scan_tex(main)
+
+    entries = []
+    for graphic in graphics:
+        candidates = _candidates(graphic['graphic'], graphicspath, graphic.get('logo'))
+        # pdflatex takes the first file that exists; before a build, the first one a job will write
+        path = (next((c for c in candidates if os.path.exists(c)), None)
+                or next((c for c in candidates if c in producers), None)
+                or candidates[0])
+        job = producers.get(path)
+        exists = os.path.exists(path)
+        if job:
+            status = 'produced'
+        else:
+            status = 'static' if exists else 'missing'
+        entries.append({**graphic, 'path': path, 'exists': exists, 'status': status, 'job': job})
+    return entries
+
+
+def select_chapters(entries, chapters):
+    """Keep entries whose chapter matches one of the names (path or file stem)"""
+    if not chapters:
+        return entries
+    wanted = set()
+    for name in chapters:
+        wanted.add(name)
+        wanted.add(_tex_file(name if '/' in name else f'sections/{name}'))
+    return [e for e in entries
+            if e['chapter'] in wanted or _tex_file(e['chapter']) in wanted]
+
+
+def used_jobs(entries):
+    """The figure jobs needed by the given entries, each once, in discovery order"""
+    jobs = []
+    for entry in entries:
+        if entry['job'] is not None and entry['job'] not in jobs:
+            jobs.append(entry['job'])
+    return jobs
+
+
+def print_report(entries):
+    chapter = None
+    for entry in entries:
+        if entry['chapter'] != chapter:
+            chapter = entry['chapter']
+            count = sum(1 for e in entries if e['chapter'] == chapter)
+            print(f"\n📄 {chapter} ({count} graphics)")
+        where = f"{entry['file']}:{entry['line']}"
+        if entry['status'] == 'produced':
+            icon = '✅' if entry['exists'] else '🔧'
+            print(f"   {icon} {project_path(entry['path'])} ← {entry['job']['name']}")
+        elif entry['status'] == 'static':
+            print(f"   📎 {project_path(entry['path'])} (no producer)")
+        else:
+            print(f"   ❌ {entry['graphic']} (missing, no producer) at {where}")
+
+    counts = {}
+    for entry in entries:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    unbuilt = sum(1 for e in entries if e['status'] == 'produced' and not e['exists'])
+    print("")
+    print("📊 Graphics: " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+          + (f" ({unbuilt} not built yet)" if unbuilt else ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Map \\includegraphics to figure producers')
+    parser.add_argument('--chapter', action='append', help='Only this chapter, e.g. chap_02 (repeatable)')
+    parser.add_argument('--build', action='store_true', help='Build the figures the selected chapters use')
+    parser.add_argument('--check', action='store_true', help='Exit with 1 when a graphic is missing')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Worker processes for --build')
+    parser.add_argument('--mermaid-renderer', choices=build_figures.MERMAID_RENDERERS, default='auto')
+    args = parser.parse_args(argv)
+
+    jobs = build_figures.discover_jobs(mermaid_renderer=args.mermaid_renderer)
+    entries = select_chapters(index_figures(jobs), args.chapter)
+    if not entries:
+        print("⚠️  No graphics found" + (f" for {', '.join(args.chapter)}" if args.chapter else ""))
+        return 1 if args.chapter else 0
+
+    if not args.build:
+        print_report(entries)
+        return 1 if args.check and any(e['status'] == 'missing' for e in entries) else 0
+
+    needed = used_jobs(entries)
+    report = build_report.start(' '.join(['figure_index.py', *(sys.argv[1:] if argv is None else argv)]))
+    print(f"🎯 Building {len(needed)} of {len(jobs)} figure jobs used by the document...")
+    started = time.perf_counter()
+    results = build_figures.build_figures(needed, args.jobs)
+    build_figures.print_summary(results)
+    missing = [e for e in entries if e['status'] == 'missing']
+    for entry in missing:
+        print(f"❌ Missing: {entry['graphic']} ({entry['file']}:{entry['line']})")
+    failed = any(r['status'] == 'failed' for r in results)
+    report.finish(not failed)
+    print(f"⏱️  Done in {time.perf_counter() - started:.2f}s")
+    return 1 if failed or (args.check and missing) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
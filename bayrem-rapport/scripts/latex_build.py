@@ -0,0 +1,488 @@
+"""
+LaTeX Build Driver
+Compiles main.tex with only as many passes as the document needs
+
+pdflatex runs with -output-directory=build, so auxiliary files survive from
+one build to the next. After each pass the driver hashes main.aux, the .aux
+of \\include'd files, main.toc, main.lof, main.lot, main.out, main.bbl and the
+minitoc files (main.mtc*). Once a pass leaves them all unchanged the document
+has converged and no further pass is run; a prose-only edit therefore costs a
+single pass.
+
+The bibliography tool only runs when its inputs changed since the last run:
+main.bcf and biblio.bib for biber, or the citation lines of main.aux and
+biblio.bib for bibtex (biblatex is loaded with backend=bibtex in isipfe.cls,
+and writes main.bcf only for biber).
+
+The finished PDF is copied to output/main.pdf. Nothing is interactive, so the
+driver can run in batch or CI.
+
+Draft builds compile only some chapters: main.tex \\include's each chapter, and
+`--chapter` adds \\includeonly on the command line. The draft runs in
+build/draft/, seeded with the last full build's auxiliary files, so the
+skipped chapters still provide their labels, page counters and table of
+contents entries. The result goes to output/main-draft.pdf.
+
+The fixed preamble (tpl/isipfe.cls with every package it loads, and
+tpl/new_commands.tex) is dumped once into build/fmt/main-preamble.fmt with
+mylatexformat; main.tex marks its end with \\endofdump. Passes then start
+from that format instead of re-reading the class and packages. The format is
+rebuilt only when the preamble text, one of the files it read, or the pdflatex
+version changes; if dumping fails the build falls back to the plain preamble.
+
+Before the first pass, print_size.py resamples rasters larger than their
+\\includegraphics width needs into build/print/ (300 dpi by default), which
+keeps oversize screenshots and diagrams out of the PDF.
+
+Usage:
+    python latex_build.py               # Incremental build
+    python latex_build.py --force       # Drop build/ state and start fresh
+    python latex_build.py --max-passes 6
+    python latex_build.py --chapter chap_03 --chapter chap_04
+    python latex_build.py --no-format   # Parse the preamble on every pass
+    python latex_build.py --print-dpi 0 # Embed images at full resolution
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+import build_figures
+import build_report
+import figure_index
+import print_size
+from figure_cache import PROJECT_ROOT, file_digest, project_path
+
+BUILD_DIR = os.path.join(PROJECT_ROOT, 'build')
+DRAFT_DIR = os.path.join(BUILD_DIR, 'draft')
+FORMAT_DIR = os.path.join(BUILD_DIR, 'fmt')
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'output')
+JOB_NAME = 'main'
+FORMAT_NAME = f'{JOB_NAME}-preamble'
+BIB_FILES = [os.path.join(PROJECT_ROOT, 'biblio.bib')]
+
+# Five passes are enough for any sane document; more means something oscillates
+MAX_PASSES = 5
+
+LATEX_COMMAND = ['pdflatex', '-interaction=nonstopmode', '-file-line-error']
+CONVERGENCE_PATTERNS = ['{job}.aux', '{job}.toc', '{job}.lof', '{job}.lot', '{job}.out',
+                        '{job}.bbl', '{job}.mtc*']
+# Besides the convergence files, what a draft copies from the full build
+SEED_PATTERNS = CONVERGENCE_PATTERNS + ['{job}.bcf', '{job}-blx.bib', '{job}.run.xml', 'latex-state.json']
+INCLUDE_PATTERN = re.compile(r'^[^%\n]*\\include\s*\{([^}]+)\}', re.MULTILINE)
+CITATION_PATTERN = re.compile(r'^\\(?:citation|bibdata|bibstyle)\{.*$', re.MULTILINE)
+RERUN_PATTERN = re.compile(r'Rerun to get|Please rerun LaTeX')
+ENDOFDUMP_PATTERN = re.compile(r'^[^%\n]*endofdump', re.MULTILINE)
+ERROR_PATTERN = re.compile(r'^(?:!|.*:\d+:) .*$', re.MULTILINE)
+
+
+def _state_path(build_dir):
+    return os.path.join(build_dir, 'latex-state.json')
+
+
+def load_state(build_dir=BUILD_DIR):
+    """Return what the previous build recorded (bibliography inputs), or {}"""
+    try:
+        with open(_state_path(build_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state, build_dir=BUILD_DIR):
+    tmp = f'{_state_path(build_dir)}.tmp-{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, _state_path(build_dir))
+
+
+def included_files(tex_file):
+    """Names passed to \\include in the main file, e.g. 'sections/chap_01'"""
+    with open(tex_file, encoding='utf-8') as f:
+        return [os.path.normpath(n.strip()).replace(os.sep, '/') for n in INCLUDE_PATTERN.findall(f.read())]
+
+
+def prepare_build_dir(tex_file, build_dir=BUILD_DIR):
+    """
+    Create the build directory and the subdirectories \\include needs.
+
+    pdflatex writes tpl/cover_page_black.aux under the output directory but
+    does not create tpl/ itself. Returns the .aux paths of the included files,
+    relative to the build directory.
+    """
+    os.makedirs(build_dir, exist_ok=True)
+    names = included_files(tex_file)
+    for name in names:
+        os.makedirs(os.path.join(build_dir, os.path.dirname(name)), exist_ok=True)
+    return [f'{name}.aux' for name in names]
+
+
+def snapshot(build_dir=BUILD_DIR, job=JOB_NAME, include_aux=()):
+    """Hash every file whose change means another LaTeX pass is needed"""
+    paths = [os.path.join(build_dir, aux) for aux in include_aux]
+    for pattern in CONVERGENCE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(build_dir, pattern.format(job=job))))
+    return {os.path.relpath(p, build_dir): file_digest(p) for p in paths if os.path.exists(p)}
+
+
+def _latex_env():
+    # Lets -fmt=main-preamble find the dumped format; the trailing separator keeps the defaults
+    return dict(os.environ, TEXFORMATS=FORMAT_DIR + os.pathsep + os.environ.get('TEXFORMATS', ''))
+
+
+def run_latex(tex_file, build_dir=BUILD_DIR, job=JOB_NAME, extra_args=(), preamble=''):
+    """
+    Run one pdflatex pass; returns the CompletedProcess.
+
+    `preamble` is TeX code run before the main file, e.g. '\\includeonly{...}'.
+    """
+    source = tex_file
+    if preamble:
+        source = preamble + '\\input{' + os.path.relpath(tex_file, PROJECT_ROOT).replace(os.sep, '/') + '}'
+    command = LATEX_COMMAND + [f'-output-directory={build_dir}', f'-jobname={job}', *extra_args, source]
+    return build_report.run(command, cwd=PROJECT_ROOT, env=_latex_env(), stdin=subprocess.DEVNULL,
+                            capture_output=True, text=True, errors='replace')
+
+
+def preamble_text(tex_file):
+    """The part of the main file that goes into the format, or None without \\endofdump"""
+    with open(tex_file, encoding='utf-8') as f:
+        text = f.read()
+    match = ENDOFDUMP_PATTERN.search(text)
+    return text[:match.end()] if match else None
+
+
+def _engine_version():
+    proc = subprocess.run([LATEX_COMMAND[0], '--version'], capture_output=True, text=True)
+    return proc.stdout.splitlines()[0] if proc.stdout else ''
+
+
+def _format_stamp_path():
+    return os.path.join(FORMAT_DIR, f'{FORMAT_NAME}.json')
+
+
+def format_is_current(tex_file):
+    """True when the dumped format matches the preamble, its inputs and the engine"""
+    try:
+        with open(_format_stamp_path()) as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if not os.path.exists(os.path.join(FORMAT_DIR, f'{FORMAT_NAME}.fmt')):
+        return False
+    if stamp.get('preamble') != preamble_text(tex_file) or stamp.get('engine') != _engine_version():
+        return False
+    for path, digest in stamp.get('inputs', {}).items():
+        if not os.path.exists(path) or file_digest(path) != digest:
+            return False
+    return True
+
+
+def _recorded_inputs(fls_path):
+    """Files the format run read, from pdflatex -recorder output"""
+    inputs = []
+    with open(fls_path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if not line.startswith('INPUT '):
+                continue
+            path = os.path.normpath(os.path.join(PROJECT_ROOT, line[6:].strip()))
+            if not path.endswith('.fmt') and path not in inputs and os.path.isfile(path):
+                inputs.append(path)
+    return inputs
+
+
+def dump_format(tex_file):
+    """Dump the preamble into build/fmt/main-preamble.fmt; returns True on success"""
+    shutil.rmtree(FORMAT_DIR, ignore_errors=True)
+    os.makedirs(FORMAT_DIR)
+    command = [LATEX_COMMAND[0], '-ini', '-recorder', '-interaction=nonstopmode',
+               f'-output-directory={FORMAT_DIR}', f'-jobname={FORMAT_NAME}',
+               f'&{LATEX_COMMAND[0]}', 'mylatexformat.ltx', os.path.relpath(tex_file, PROJECT_ROOT)]
+    build_report.run(command, cwd=PROJECT_ROOT, stdin=subprocess.DEVNULL,
+                     capture_output=True, text=True, errors='replace')
+    fls = os.path.join(FORMAT_DIR, f'{FORMAT_NAME}.fls')
+    if not (os.path.exists(os.path.join(FORMAT_DIR, f'{FORMAT_NAME}.fmt')) and os.path.exists(fls)):
+        return False
+    stamp = {
+        'preamble': preamble_text(tex_file),
+        'engine': _engine_version(),
+        # main.tex itself is covered by 'preamble'; edits below \endofdump must not invalidate the format
+        'inputs': {path: file_digest(path) for path in _recorded_inputs(fls)
+                   if path != os.path.abspath(tex_file)},
+    }
+    with open(_format_stamp_path(), 'w') as f:
+        json.dump(stamp, f, indent=2, sort_keys=True)
+    return True
+
+
+def ensure_format(tex_file, verbose=True):
+    """Return the pdflatex arguments that load the precompiled preamble, or [] to parse it"""
+    if preamble_text(tex_file) is None:
+        return []
+    if not format_is_current(tex_file):
+        if verbose:
+            print("⚙️  Precompiling the preamble format...")
+        with build_report.stage('preamble format', 'format'):
+            dumped = dump_format(tex_file)
+        if not dumped:
+            print(f"⚠️  Could not dump the preamble format (is mylatexformat installed?), "
+                  f"see {project_path(FORMAT_DIR)}/{FORMAT_NAME}.log")
+            return []
+    return [f'-fmt={FORMAT_NAME}']
+
+
+def bibliography_backend(build_dir=BUILD_DIR, job=JOB_NAME):
+    """Return 'biber', 'bibtex' or None depending on what the last pass asked for"""
+    if os.path.exists(os.path.join(build_dir, f'{job}.bcf')):
+        return 'biber'
+    try:
+        with open(os.path.join(build_dir, f'{job}.aux'), encoding='utf-8', errors='replace') as f:
+            if '\\bibdata{' in f.read():
+                return 'bibtex'
+    except OSError:
+        pass
+    return None
+
+
+def bibliography_inputs(backend, build_dir=BUILD_DIR, job=JOB_NAME):
+    """Digest of everything the bibliography tool reads"""
+    digests = {project_path(p): file_digest(p) for p in BIB_FILES if os.path.exists(p)}
+    if backend == 'biber':
+        digests['bcf'] = file_digest(os.path.join(build_dir, f'{job}.bcf'))
+    else:
+        with open(os.path.join(build_dir, f'{job}.aux'), encoding='utf-8', errors='replace') as f:
+            digests['citations'] = '\n'.join(CITATION_PATTERN.findall(f.read()))
+    return digests
+
+
+def run_bibliography(backend, build_dir=BUILD_DIR, job=JOB_NAME):
+    """Run biber/bibtex in the build directory, finding biblio.bib in the project"""
+    if shutil.which(backend) is None:
+        return None
+    env = dict(os.environ, BIBINPUTS=PROJECT_ROOT + os.pathsep + os.environ.get('BIBINPUTS', ''))
+    return build_report.run([backend, job], cwd=build_dir, env=env, stdin=subprocess.DEVNULL,
+                            capture_output=True, text=True, errors='replace')
+
+
+def _log_text(build_dir, job):
+    try:
+        with open(os.path.join(build_dir, f'{job}.log'), encoding='utf-8', errors='replace') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def prepare_images(print_dpi=print_size.PRINT_DPI, verbose=True):
+    """Resample oversize rasters for print, or drop the copies when print_dpi is 0"""
+    if not print_dpi:
+        print_size.clear()
+        return []
+    with build_report.stage('print-size images', 'figures') as entry:
+        images = print_size.prepare(print_dpi, verbose)
+        entry['images'] = len(images)
+    return images
+
+
+def build(tex_file=None, build_dir=BUILD_DIR, job=JOB_NAME, max_passes=MAX_PASSES,
+          extra_args=(), verbose=True, preamble='', use_format=True, print_dpi=print_size.PRINT_DPI):
+    """
+    Compile until the auxiliary files stop changing.
+
+    Returns {'ok', 'passes', 'bibliography', 'pdf', 'errors'}; 'bibliography'
+    is the tool that ran ('biber'/'bibtex') or None.
+    """
+    tex_file = tex_file or os.path.join(PROJECT_ROOT, f'{JOB_NAME}.tex')
+    include_aux = prepare_build_dir(tex_file, build_dir)
+    prepare_images(print_dpi, verbose)
+    if use_format:
+        extra_args = [*ensure_format(tex_file, verbose), *extra_args]
+    state = load_state(build_dir)
+    result = {'ok': False, 'passes': 0, 'bibliography': None, 'errors': [],
+              'pdf': os.path.join(build_dir, f'{job}.pdf')}
+
+    before = snapshot(build_dir, job, include_aux)
+    while result['passes'] < max_passes:
+        result['passes'] += 1
+        if verbose:
+            print(f"📝 LaTeX pass {result['passes']}...")
+        with build_report.stage(f"pdflatex pass {result['passes']} ({project_path(build_dir)})", 'latex'):
+            run_latex(tex_file, build_dir, job, extra_args, preamble)
+
+        backend = bibliography_backend(build_dir, job)
+        if backend:
+            inputs = bibliography_inputs(backend, build_dir, job)
+            bbl = os.path.join(build_dir, f'{job}.bbl')
+            if inputs != state.get('bibliography') or not os.path.exists(bbl):
+                if verbose:
+                    print(f"📚 Running {backend}...")
+                with build_report.stage(backend, 'bibliography'):
+                    proc = run_bibliography(backend, build_dir, job)
+                if proc is None:
+                    print(f"⚠️  {backend} not found on PATH, bibliography not updated")
+                elif proc.returncode != 0:
+                    print(f"⚠️  {backend} exited with {proc.returncode}, see {project_path(build_dir)}/{job}.blg")
+                else:
+                    state['bibliography'] = inputs
+                    result['bibliography'] = backend
+
+        after = snapshot(build_dir, job, include_aux)
+        if after == before and not RERUN_PATTERN.search(_log_text(build_dir, job)):
+            break
+        before = after
+    else:
+        print(f"⚠️  Auxiliary files still changing after {max_passes} passes")
+
+    save_state(state, build_dir)
+    result['errors'] = ERROR_PATTERN.findall(_log_text(build_dir, job))
+    result['ok'] = os.path.exists(result['pdf'])
+    return result
+
+
+def resolve_chapters(names, tex_file):
+    """Map 'chap_03' or 'sections/chap_03.tex' to the \\include name; raises ValueError"""
+    included = included_files(tex_file)
+    chapters = []
+    for name in names:
+        stem = os.path.splitext(name.replace(os.sep, '/'))[0]
+        matches = [i for i in included if i == stem or os.path.basename(i) == stem]
+        if not matches:
+            raise ValueError(f"{name} is not \\include'd by {project_path(tex_file)} "
+                             f"(choose from: {', '.join(os.path.basename(i) for i in included)})")
+        chapters.extend(m for m in matches if m not in chapters)
+    return chapters
+
+
+def seed_draft(chapters, tex_file, build_dir=BUILD_DIR, draft_dir=DRAFT_DIR, job=JOB_NAME):
+    """
+    Copy the full build's auxiliary files into the draft directory.
+
+    The .aux of a skipped chapter always comes from the full build, since the
+    draft never rewrites it. Other files are copied when the full build has a
+    newer version, so repeated drafts keep their own progress.
+    """
+    include_aux = prepare_build_dir(tex_file, draft_dir)
+    skipped = {f'{name}.aux' for name in included_files(tex_file) if name not in chapters}
+    paths = [os.path.join(build_dir, aux) for aux in include_aux]
+    for pattern in SEED_PATTERNS:
+        paths.extend(glob.glob(os.path.join(build_dir, pattern.format(job=job))))
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        rel_path = os.path.relpath(path, build_dir).replace(os.sep, '/')
+        target = os.path.join(draft_dir, rel_path)
+        if (rel_path in skipped or not os.path.exists(target)
+                or os.path.getmtime(path) > os.path.getmtime(target)):
+            shutil.copy2(path, target)
+
+
+def build_draft(chapters, tex_file=None, max_passes=MAX_PASSES, verbose=True, use_format=True,
+                print_dpi=print_size.PRINT_DPI):
+    """
+    Compile only the given \\include names (see resolve_chapters).
+
+    Runs a full build first when there is none to borrow numbering from.
+    """
+    tex_file = tex_file or os.path.join(PROJECT_ROOT, f'{JOB_NAME}.tex')
+    if not os.path.exists(os.path.join(BUILD_DIR, f'{JOB_NAME}.aux')):
+        print("ℹ️  No full build yet, running one first for page numbers and references...")
+        full = build(tex_file, max_passes=max_passes, verbose=verbose, use_format=use_format,
+                     print_dpi=print_dpi)
+        if not full['ok']:
+            return full
+        publish(full['pdf'])
+    seed_draft(chapters, tex_file)
+    preamble = '\\includeonly{' + ','.join(chapters) + '}'
+    return build(tex_file, DRAFT_DIR, max_passes=max_passes, verbose=verbose, preamble=preamble,
+                 use_format=use_format, print_dpi=print_dpi)
+
+
+def publish(pdf, output_dir=OUTPUT_DIR, name=None):
+    """Copy the built PDF into output/ atomically; returns the new path"""
+    os.makedirs(output_dir, exist_ok=True)
+    target = os.path.join(output_dir, name or os.path.basename(pdf))
+    with build_report.stage(f'copy to {project_path(target)}', 'organise'):
+        tmp = f'{target}.tmp-{os.getpid()}'
+        shutil.copyfile(pdf, tmp)
+        os.replace(tmp, target)
+    return target
+
+
+def build_used_figures(chapters=None):
+    """Build the figures the document (or the given chapters) uses; returns their results"""
+    entries = figure_index.index_figures()
+    if chapters:
+        entries = figure_index.select_chapters(entries, chapters)
+    jobs = figure_index.used_jobs(entries)
+    print(f"🎨 Building {len(jobs)} figure job(s) used by the document...")
+    return build_figures.build_figures(jobs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the report with as few LaTeX passes as possible')
+    parser.add_argument('--max-passes', type=int, default=MAX_PASSES, help='Upper bound on LaTeX passes')
+    parser.add_argument('--force', action='store_true', help='Delete build/ first for a from-scratch build')
+    parser.add_argument('--chapter', action='append',
+                        help='Draft build of only this chapter, e.g. chap_03 (repeatable)')
+    parser.add_argument('--no-format', action='store_true', help='Do not use the precompiled preamble')
+    parser.add_argument('--figures', action='store_true', help='Build the figures the document uses first')
+    parser.add_argument('--print-dpi', type=int, default=print_size.PRINT_DPI,
+                        help='Resample images to this resolution at their printed width (0: full resolution)')
+    args = parser.parse_args(argv)
+
+    tex_file = os.path.join(PROJECT_ROOT, f'{JOB_NAME}.tex')
+    if not os.path.exists(tex_file):
+        print(f"❌ Error: {project_path(tex_file)} not found")
+        return 1
+    if shutil.which(LATEX_COMMAND[0]) is None:
+        print(f"❌ Error: {LATEX_COMMAND[0]} not found on PATH")
+        return 1
+    if args.force:
+        shutil.rmtree(BUILD_DIR, ignore_errors=True)
+
+    chapters = None
+    if args.chapter:
+        try:
+            chapters = resolve_chapters(args.chapter, tex_file)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return 1
+
+    report = build_report.start(' '.join(['latex_build.py', *(sys.argv[1:] if argv is None else argv)]))
+    if args.figures:
+        build_used_figures(chapters)
+
+    if chapters:
+        print(f"🚀 Starting draft compilation of {', '.join(chapters)}...")
+        result = build_draft(chapters, tex_file, args.max_passes, use_format=not args.no_format,
+                             print_dpi=args.print_dpi)
+        build_dir, name = DRAFT_DIR, f'{JOB_NAME}-draft.pdf'
+    else:
+        print("🚀 Starting LaTeX compilation...")
+        result = build(tex_file, max_passes=args.max_passes, use_format=not args.no_format,
+                       print_dpi=args.print_dpi)
+        build_dir, name = BUILD_DIR, None
+    for error in result['errors'][:10]:
+        print(f"   {error}")
+    log = os.path.join(build_dir, f'{JOB_NAME}.log')
+    if not result['ok']:
+        report.finish(False, log=log)
+        print("❌ Compilation failed! PDF not generated.")
+        print(f"Check the log file for errors: {project_path(log)}")
+        return 1
+
+    target = publish(result['pdf'], name=name)
+    report.finish(True, pdf=target, log=log)
+    bibliography = f", {result['bibliography']} run" if result['bibliography'] else ""
+    print(f"✅ Compilation successful in {result['passes']} pass(es){bibliography}")
+    print(f"📄 PDF: {project_path(target)}")
+    print(f"⏱️  Timings: {project_path(build_report.REPORT_PATH)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
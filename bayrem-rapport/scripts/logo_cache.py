@@ -0,0 +1,264 @@
+"""
+Logo Cache
+Converts the technology logos once, for LaTeX and for the diagrams
+
+assets/logos/*.svg (Angular, Spring, FastAPI, Docker, Kubernetes, ...) cannot
+be embedded by pdflatex, and matplotlib and Mermaid want a raster at a given
+size. This converts each SVG once into build/logos/:
+- <name>.pdf, which \\techlogo{docker} in tpl/new_commands.tex embeds
+- <name>-<size>.png for every requested size, the longer side being <size>
+  pixels and the aspect ratio that of the SVG viewBox
+
+Every conversion goes through the figure cache, keyed by the SVG content,
+the format, the size and the converter, so a logo is only converted again
+when its SVG changes; the others are restored from .cache/objects/.
+Conversions run on a process pool, and cache hits are resolved before any
+worker starts.
+
+The first converter found is used: cairosvg (pip install cairosvg),
+rsvg-convert (librsvg) or Inkscape.
+
+Diagrams ask for a ready-made file instead of converting the SVG themselves:
+    import logo_cache
+    path = logo_cache.logo('docker', 128)     # build/logos/docker-logo-128.png
+    image = logo_cache.logo_image('spring', 64)  # Array for matplotlib
+
+Usage:
+    python logo_cache.py                 # PDF and PNGs at 64, 128 and 256 px
+    python logo_cache.py --size 512      # PNGs at 512 px instead
+    python logo_cache.py --list          # Show the logos and their files
+    python logo_cache.py --clear         # Delete build/logos/
+"""
+
+import argparse
+import glob
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from figure_cache import PROJECT_ROOT, figure_key, project_path, restore, run_cached
+
+LOGO_DIR = os.path.join(PROJECT_ROOT, 'assets', 'logos')
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'build', 'logos')
+DEFAULT_SIZES = (64, 128, 256)
+CONVERTERS = ('cairosvg', 'rsvg-convert', 'inkscape')
+
+LENGTH_PATTERN = re.compile(r'^\s*([0-9.]+)\s*(px|pt)?\s*$')
+
+
+def converter():
+    """Name of the first available SVG converter, or None"""
+    for name in CONVERTERS:
+        if name == 'cairosvg':
+            try:
+                import cairosvg  # noqa: F401
+            except (ImportError, OSError):
+                continue
+            return name
+        if shutil.which(name):
+            return name
+    return None
+
+
+def find_logos():
+    """Every SVG logo, sorted"""
+    return sorted(glob.glob(os.path.join(LOGO_DIR, '*.svg')))
+
+
+def logo_source(name):
+    """The SVG for 'docker', 'docker-logo' or a path to an .svg file"""
+    if name.endswith('.svg') and os.path.exists(name):
+        return os.path.abspath(name)
+    for candidate in (f'{name}.svg', f'{name}-logo.svg'):
+        path = os.path.join(LOGO_DIR, candidate)
+        if os.path.exists(path):
+            return path
+    known = ', '.join(os.path.basename(path)[:-len('-logo.svg')] for path in find_logos())
+    raise FileNotFoundError(f"No logo '{name}' in {project_path(LOGO_DIR)} (known: {known})")
+
+
+def svg_size(svg):
+    """(width, height) of an SVG in user units, from its viewBox or width/height"""
+    root = ET.parse(svg).getroot()
+    view_box = (root.get('viewBox') or '').replace(',', ' ').split()
+    if len(view_box) == 4 and float(view_box[2]) > 0 and float(view_box[3]) > 0:
+        return float(view_box[2]), float(view_box[3])
+    lengths = [LENGTH_PATTERN.match(root.get(attr) or '') for attr in ('width', 'height')]
+    if all(lengths):
+        return float(lengths[0].group(1)), float(lengths[1].group(1))
+    return 1.0, 1.0
+
+
+def pixel_size(svg, size):
+    """(width, height) in pixels with the longer side `size`"""
+    width, height = svg_size(svg)
+    if width >= height:
+        return size, max(1, round(size * height / width))
+    return max(1, round(size * width / height)), size
+
+
+def output_path(svg, size=None):
+    """build/logos/<name>.pdf, or build/logos/<name>-<size>.png"""
+    name = os.path.splitext(os.path.basename(svg))[0]
+    return os.path.join(OUTPUT_DIR, f'{name}.pdf' if size is None else f'{name}-{size}.png')
+
+
+def convert(svg, target, size=None, tool=None):
+    """Convert `svg` to a PDF, or to a PNG `size` pixels on its longer side"""
+    tool = tool or converter()
+    if tool is None:
+        raise RuntimeError(f"No SVG converter found ({', '.join(CONVERTERS)})")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fmt = 'pdf' if size is None else 'png'
+    dims = pixel_size(svg, size) if size else None
+
+    if tool == 'cairosvg':
+        import cairosvg
+        if dims:
+            cairosvg.svg2png(url=svg, write_to=target, output_width=dims[0], output_height=dims[1])
+        else:
+            cairosvg.svg2pdf(url=svg, write_to=target)
+        return True
+    if tool == 'rsvg-convert':
+        command = ['rsvg-convert', '-f', fmt, '-o', target]
+        if dims:
+            command += ['-w', str(dims[0]), '-h', str(dims[1])]
+    else:
+        command = ['inkscape', f'--export-type={fmt}', f'--export-filename={target}']
+        if dims:
+            command += [f'--export-width={dims[0]}', f'--export-height={dims[1]}']
+    proc = subprocess.run(command + [svg], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError((proc.stderr or proc.stdout).strip()[-2000:])
+    return True
+
+
+def _task(svg, size, tool):
+    params = {'format': 'pdf' if size is None else 'png', 'converter': tool}
+    if size is not None:
+        params['size'] = size
+    return {'svg': svg, 'size': size, 'tool': tool, 'target': output_path(svg, size),
+            'sources': [os.path.abspath(__file__), svg], 'params': params}
+
+
+def run_task(task):
+    """Convert one logo through the figure cache (worker process)"""
+    started = time.perf_counter()
+    result = {'name': project_path(task['target']), 'status': 'built', 'error': None}
+    try:
+        result['status'] = run_cached(task['sources'], [task['target']],
+                                      lambda: convert(task['svg'], task['target'], task['size'], task['tool']),
+                                      task['params'])
+    except Exception as e:
+        result.update(status='failed', error=f'{type(e).__name__}: {e}')
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def logo(name, size=None):
+    """
+    Path of a ready-made logo: the PDF, or a PNG `size` pixels on its longer side.
+
+    Restores it from the cache, or converts it, when it is missing or stale.
+    Without a converter an existing file is returned as is.
+    """
+    svg = logo_source(name)
+    tool = converter()
+    target = output_path(svg, size)
+    if tool is None:
+        if os.path.exists(target):
+            return target
+        raise RuntimeError(f"{project_path(target)} is missing and no SVG converter was found "
+                           f"({', '.join(CONVERTERS)})")
+    result = run_task(_task(svg, size, tool))
+    if result['status'] == 'failed':
+        raise RuntimeError(f"Could not convert {project_path(svg)}: {result['error']}")
+    return target
+
+
+def logo_image(name, size):
+    """A logo as an RGBA array for matplotlib (imshow, OffsetImage)"""
+    import matplotlib.image as mpimg
+    return mpimg.imread(logo(name, size))
+
+
+def prepare(sizes=DEFAULT_SIZES, max_workers=None, verbose=True):
+    """Bring the PDF and the PNGs at `sizes` of every logo up to date; returns the results"""
+    tool = converter()
+    if tool is None:
+        return [{'name': project_path(svg), 'status': 'skipped', 'seconds': 0.0,
+                 'error': f"no SVG converter found ({', '.join(CONVERTERS)})"} for svg in find_logos()]
+    tasks = [_task(svg, size, tool) for svg in find_logos() for size in (None,) + tuple(sizes)]
+
+    results = []
+    pending = []
+    for task in tasks:
+        started = time.perf_counter()
+        if restore(figure_key(task['sources'], task['params'])) is not None:
+            results.append({'name': project_path(task['target']), 'status': 'cached', 'error': None,
+                            'seconds': time.perf_counter() - started})
+        else:
+            pending.append(task)
+    if pending:
+        workers = min(max_workers or os.cpu_count() or 1, len(pending))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in as_completed([pool.submit(run_task, task) for task in pending]):
+                result = future.result()
+                if verbose and result['status'] == 'failed':
+                    print(f"❌ {result['name']}: {result['error']}")
+                results.append(result)
+
+    results.sort(key=lambda r: r['name'])
+    if verbose:
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        print(f"🏷️  {len(find_logos())} logos with {tool}: "
+              + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    return results
+
+
+def clear():
+    """Delete every converted logo"""
+    shutil.rmtree(OUTPUT_DIR, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert the SVG logos to PDF and PNG once')
+    parser.add_argument('--size', type=int, action='append',
+                        help=f"PNG size in pixels, longer side (repeatable, default: {', '.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--list', action='store_true', help='Show the logos and their converted files')
+    parser.add_argument('--clear', action='store_true', help='Delete the converted logos')
+    args = parser.parse_args(argv)
+
+    if args.clear:
+        clear()
+        print(f"🗑️  Removed {project_path(OUTPUT_DIR)}")
+        return 0
+    if args.list:
+        for svg in find_logos():
+            name = os.path.splitext(os.path.basename(svg))[0]
+            width, height = svg_size(svg)
+            ready = sorted(os.path.basename(path) for path in glob.glob(os.path.join(OUTPUT_DIR, f'{name}*'))
+                           if re.fullmatch(rf'{re.escape(name)}(-\d+)?\.(pdf|png)', os.path.basename(path)))
+            print(f"   {name} ({width:g}x{height:g}): {', '.join(ready) or 'not converted'}")
+        return 0
+
+    started = time.perf_counter()
+    tool = converter()
+    if tool is None:
+        print(f"❌ No SVG converter found, install one of: {', '.join(CONVERTERS)}")
+        return 1
+    results = prepare(args.size or DEFAULT_SIZES, args.jobs)
+    print(f"⏱️  Done in {time.perf_counter() - started:.2f}s")
+    return 1 if any(r['status'] == 'failed' for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
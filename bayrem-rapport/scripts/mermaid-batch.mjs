@@ -0,0 +1,57 @@
+// Batch Mermaid renderer: one headless browser for many diagrams
+//
+// Called by mermaid_batch.py as:
+//     node mermaid-batch.mjs <path to @mermaid-js/mermaid-cli>
+// Reads a JSON array of jobs on stdin:
+//     [{"input": "a.mmd", "outputs": ["a.png", "a.svg"], "width": 1600,
+//       "height": 1200, "scale": 2, "backgroundColor": "white",
+//       "config": "mermaid-config.json"}]
+// and prints one JSON line per job: {"input", "ok", "error", "ms"}.
+
+import { mkdirSync, readFileSync, writeFileSync } from 'node:fs';
+import { createRequire } from 'node:module';
+import { dirname, extname, join } from 'node:path';
+import { pathToFileURL } from 'node:url';
+
+const cliRoot = process.argv[2];
+const requireFromCli = createRequire(join(cliRoot, 'package.json'));
+const { renderMermaid } = await import(pathToFileURL(join(cliRoot, 'src', 'index.js')));
+const puppeteer = (await import(pathToFileURL(requireFromCli.resolve('puppeteer')))).default;
+
+const jobs = JSON.parse(readFileSync(0, 'utf-8'));
+const configs = new Map();
+
+function loadConfig(path) {
+  if (!path) return {};
+  if (!configs.has(path)) configs.set(path, JSON.parse(readFileSync(path, 'utf-8')));
+  return configs.get(path);
+}
+
+const browser = await puppeteer.launch({ headless: 'new' });
+try {
+  for (const job of jobs) {
+    const started = Date.now();
+    try {
+      const definition = readFileSync(job.input, 'utf-8');
+      const options = {
+        viewport: { width: job.width, height: job.height, deviceScaleFactor: job.scale },
+        backgroundColor: job.backgroundColor,
+        mermaidConfig: loadConfig(job.config),
+      };
+      const rendered = new Map();
+      for (const output of job.outputs) {
+        const format = extname(output).slice(1).toLowerCase();
+        if (!rendered.has(format)) {
+          rendered.set(format, (await renderMermaid(browser, definition, format, options)).data);
+        }
+        mkdirSync(dirname(output), { recursive: true });
+        writeFileSync(output, rendered.get(format));
+      }
+      console.log(JSON.stringify({ input: job.input, ok: true, error: null, ms: Date.now() - started }));
+    } catch (error) {
+      console.log(JSON.stringify({ input: job.input, ok: false, error: String(error), ms: Date.now() - started }));
+    }
+  }
+} finally {
+  await browser.close();
+}
@@ -0,0 +1,199 @@
+"""
+Batch Mermaid Renderer
+Renders many .mmd files in one long-lived headless browser session
+
+Every mmdc call starts its own Node + Chromium process, which costs a few
+seconds per diagram before any layout work. This module hands the whole list
+to mermaid-batch.mjs, which launches the browser once and renders every
+diagram in it, writing each PNG/SVG/PDF to its own target. Diagrams that
+fail inside the batch are retried one by one with plain mmdc.
+
+Usage:
+    python mermaid_batch.py a.mmd:a.png b.mmd:b.svg
+    python mermaid_batch.py --width 1200 --height 900 --no-config arch.mmd:arch.png
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from functools import lru_cache
+
+from figure_cache import MERMAID_CONFIG, PROJECT_ROOT, detach, figure_key, project_path, restore, store
+from figure_export import drop_stale_vectors
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BATCH_SCRIPT = os.path.join(SCRIPT_DIR, 'mermaid-batch.mjs')
+
+# Matches the settings used by generate_all_mermaid.sh
+DEFAULT_PARAMS = {'width': 1600, 'height': 1200, 'scale': 2, 'backgroundColor': 'white'}
+
+
+def mermaid_job(source, outputs, params=None, config=MERMAID_CONFIG):
+    """Describe one diagram: a .mmd source rendered to one or more files"""
+    return {
+        'input': os.path.abspath(source),
+        'outputs': [os.path.abspath(p) for p in outputs],
+        'params': {**DEFAULT_PARAMS, **(params or {})},
+        'config': os.path.abspath(config) if config else None,
+    }
+
+
+@lru_cache(maxsize=None)
+def find_mermaid_cli():
+    """Return the installed @mermaid-js/mermaid-cli package directory, or None"""
+    roots = [os.path.join(PROJECT_ROOT, 'node_modules')]
+    if shutil.which('npm'):
+        try:
+            proc = subprocess.run(['npm', 'root', '-g'], capture_output=True, text=True, timeout=30)
+            roots.append(proc.stdout.strip())
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+    for root in roots:
+        package = os.path.join(root, '@mermaid-js', 'mermaid-cli')
+        if os.path.exists(os.path.join(package, 'src', 'index.js')):
+            return package
+    return None
+
+
+def available():
+    """True when diagrams can be rendered at all (batch helper or mmdc)"""
+    return bool((shutil.which('node') and find_mermaid_cli()) or shutil.which('mmdc'))
+
+
+def _render_in_browser(jobs):
+    """Render jobs in one browser session; returns {index: (error, seconds)}"""
+    cli = find_mermaid_cli()
+    if not (cli and shutil.which('node')):
+        return {}
+    payload = []
+    for job in jobs:
+        payload.append({'input': job['input'], 'outputs': job['outputs'],
+                        'config': job['config'], **job['params']})
+    try:
+        proc = subprocess.run(['node', BATCH_SCRIPT, cli], input=json.dumps(payload),
+                              capture_output=True, text=True)
+    except OSError:
+        return {}
+
+    results = {}
+    lines = [line for line in proc.stdout.splitlines() if line.startswith('{')]
+    for index, line in enumerate(lines[:len(jobs)]):
+        reply = json.loads(line)
+        results[index] = (None if reply['ok'] else reply['error'], reply['ms'] / 1000)
+    return results
+
+
+def render_single(job):
+    """Render one job with its own mmdc process; returns an error or None"""
+    if not shutil.which('mmdc'):
+        return 'mmdc not found on PATH'
+    rendered = {}
+    for output in job['outputs']:
+        extension = os.path.splitext(output)[1].lower()
+        if extension in rendered:
+            shutil.copyfile(rendered[extension], output)
+            continue
+        command = ['mmdc', '-i', job['input'], '-o', output]
+        for name, value in job['params'].items():
+            command += [f'--{name}', str(value)]
+        if job['config']:
+            command += ['--configFile', job['config']]
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        proc = subprocess.run(command, capture_output=True, text=True)
+        if proc.returncode != 0:
+            return (proc.stderr or proc.stdout).strip()[-2000:] or f'mmdc exited with {proc.returncode}'
+        rendered[extension] = output
+    return None
+
+
+def render_batch(jobs):
+    """
+    Render every job, paying the browser startup once per call.
+
+    Returns one {'input', 'error', 'seconds', 'fallback'} dict per job, in
+    order; 'error' is None on success.
+    """
+    # The batch helper and mmdc write through hard links otherwise
+    detach([output for job in jobs for output in job['outputs']])
+    batch = _render_in_browser(jobs)
+    results = []
+    for index, job in enumerate(jobs):
+        error, seconds = batch.get(index, ('not rendered by the batch helper', 0.0))
+        fallback = error is not None
+        if fallback:
+            started = time.perf_counter()
+            error = render_single(job)
+            seconds = time.perf_counter() - started
+        results.append({'input': job['input'], 'error': error, 'seconds': seconds, 'fallback': fallback})
+    return results
+
+
+def cache_sources(job):
+    """Files whose content decides what a job renders"""
+    return [job['input'], job['config']] if job['config'] else [job['input']]
+
+
+def render_cached(jobs):
+    """Restore unchanged diagrams from the figure cache and batch-render the rest"""
+    results = [None] * len(jobs)
+    pending = []
+    for index, job in enumerate(jobs):
+        if restore(figure_key(cache_sources(job), job['params'])) is not None:
+            results[index] = {'input': job['input'], 'status': 'cached', 'error': None,
+                              'seconds': 0.0, 'fallback': False}
+        else:
+            pending.append(index)
+
+    rendered = render_batch([jobs[i] for i in pending])
+    for index, result in zip(pending, rendered):
+        job = jobs[index]
+        if result['error'] is None:
+            store(figure_key(cache_sources(job), job['params']), job['outputs'])
+        result['status'] = 'failed' if result['error'] else 'built'
+        results[index] = result
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render Mermaid diagrams in one browser session')
+    parser.add_argument('pairs', nargs='+', metavar='INPUT.mmd:OUTPUT', help='Diagram and its output file')
+    parser.add_argument('--width', type=int, default=DEFAULT_PARAMS['width'])
+    parser.add_argument('--height', type=int, default=DEFAULT_PARAMS['height'])
+    parser.add_argument('--scale', type=int, default=DEFAULT_PARAMS['scale'])
+    parser.add_argument('--backgroundColor', default=DEFAULT_PARAMS['backgroundColor'])
+    parser.add_argument('--config', default=MERMAID_CONFIG, help='Mermaid config file')
+    parser.add_argument('--no-config', action='store_true', help='Render without a config file')
+    args = parser.parse_args(argv)
+
+    if not available():
+        print("⚠️ Mermaid CLI not found. Install with: npm install -g @mermaid-js/mermaid-cli")
+        return 1
+
+    params = {'width': args.width, 'height': args.height, 'scale': args.scale,
+              'backgroundColor': args.backgroundColor}
+    config = None if args.no_config else args.config
+    jobs = []
+    for pair in args.pairs:
+        source, sep, output = pair.rpartition(':')
+        if not sep:
+            parser.error(f'Expected INPUT.mmd:OUTPUT, got {pair}')
+        jobs.append(mermaid_job(source, [output], params, config))
+
+    results = render_cached(jobs)
+    for job, result in zip(jobs, results):
+        if result['status'] == 'failed':
+            print(f"❌ Failed: {project_path(job['input'])}")
+            print(f"   {result['error']}")
+        else:
+            drop_stale_vectors(job['outputs'])
+            icon = '♻️ ' if result['status'] == 'cached' else '✅'
+            print(f"{icon} {result['status'].capitalize()}: {project_path(job['outputs'][0])}")
+    return 1 if any(r['status'] == 'failed' for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,784 @@
+"""
+Native Mermaid Renderer
+Renders the Mermaid subset used by the report with matplotlib, no Node needed
+
+Supported syntax:
+- graph / flowchart with TD, TB, BT, LR and RL directions
+- subgraphs (nested, with their own `direction`)
+- node shapes: [rect], (round), ([stadium]), [(cylinder)], ((circle)), {rhombus}
+- edges: -->, ---, -.->, ==>, <-->, labels as -->|text| or -- text -->
+- classDef / class / style / :::class, honouring fill, stroke, stroke-width,
+  color and font-weight
+- xychart-beta with bar and line series
+
+Layout is a layered (Sugiyama-style) engine applied per subgraph: items are
+ranked by longest path, edges spanning several ranks (including the ones
+reversed to break cycles) get a dummy node per rank, layers are ordered by
+barycenter sweeps and packed with the nodeSpacing/rankSpacing and theme
+variables from scripts/mermaid-config.json. Edges are drawn as polylines
+through their dummies, leaving a subgraph through its border.
+Other diagram types (classDiagram, erDiagram...) raise UnsupportedDiagram so
+callers can fall back to mmdc.
+
+Usage:
+    python mermaid_native.py diagram.mmd diagram.png [diagram.svg]
+"""
+
+import json
+import math
+import os
+import re
+import sys
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.font_manager import fontManager
+from matplotlib.patches import Circle, FancyArrowPatch, FancyBboxPatch, Polygon
+from matplotlib.path import Path
+
+from figure_cache import MERMAID_CONFIG
+from figure_export import save_figure
+from text_metrics import text_width
+
+# CSS pixels per inch; layout happens in CSS pixels like Mermaid itself
+PX_PER_INCH = 96
+PT_PER_PX = 72 / 96
+
+DEFAULT_THEME = {
+    'background': '#ffffff',
+    'primaryColor': '#ffffff',
+    'primaryTextColor': '#000000',
+    'primaryBorderColor': '#424242',
+    'lineColor': '#424242',
+    'secondaryColor': '#f8f9fa',
+    'tertiaryColor': '#e3f2fd',
+    'fontFamily': 'Arial, sans-serif',
+    'fontSize': '14px',
+    'nodeSpacing': 50,
+    'rankSpacing': 50,
+}
+
+SERIES_COLORS = ['#1976D2', '#F57C00', '#388E3C', '#7C3AED', '#C62828', '#00838F']
+
+# Glyphs matplotlib's default fonts cannot draw (emoji, dingbats, joiners)
+EMOJI_PATTERN = re.compile('[\U0001F000-\U0001FAFF☀-➿⬀-⯿️‍]')
+
+NODE_PATTERN = re.compile(r'\s*([A-Za-z0-9_]+)')
+LINK_PATTERN = re.compile(
+    r'\s*(<)?(?:(?:--|==)\s+([^|>]*?)\s+)?(-{2,}|={2,}|-\.+-)(>)?\s*(?:\|([^|]*)\|)?'
+)
+SHAPES = [
+    ('[(', ')]', 'cylinder'),
+    ('([', '])', 'stadium'),
+    ('((', '))', 'circle'),
+    ('[', ']', 'rect'),
+    ('(', ')', 'round'),
+    ('{', '}', 'rhombus'),
+    ('>', ']', 'rect'),
+]
+SUBGRAPH_PATTERN = re.compile(r'subgraph\s+(?:([A-Za-z0-9_]+)\s*)?(?:\[\s*(.*?)\s*\]|"(.*?)")?\s*$')
+
+
+class UnsupportedDiagram(ValueError):
+    """Raised for Mermaid syntax outside the subset this renderer handles"""
+
+
+def load_theme(config=MERMAID_CONFIG):
+    """Merge theme variables and flowchart spacing from a Mermaid config file"""
+    theme = dict(DEFAULT_THEME)
+    if config and os.path.exists(config):
+        with open(config, encoding='utf-8') as f:
+            data = json.load(f)
+        theme.update(data.get('themeVariables', {}))
+        flowchart = data.get('flowchart', {})
+        for key in ('nodeSpacing', 'rankSpacing'):
+            if key in flowchart:
+                theme[key] = flowchart[key]
+    theme['fontPx'] = float(str(theme['fontSize']).replace('px', ''))
+    families = [name.strip().strip('"\'') for name in theme['fontFamily'].split(',')]
+    installed = {font.name for font in fontManager.ttflist}
+    theme['fontFamilies'] = [f for f in families if f in installed] + ['DejaVu Sans']
+    return theme
+
+
+def clean_label(text):
+    """Turn a Mermaid label into plain multi-line text"""
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        text = text[1:-1]
+    text = re.sub(r'<br\s*/?>', '\n', text).replace('\\n', '\n')
+    text = re.sub(r'<[^>]+>', '', text)
+    text = EMOJI_PATTERN.sub('', text)
+    return '\n'.join(line.strip() for line in text.split('\n')).strip()
+
+
+def parse_style(spec):
+    """Parse 'fill:#fff,stroke:#000,stroke-width:2px' into a dict"""
+    style = {}
+    for part in spec.split(','):
+        name, sep, value = part.partition(':')
+        if sep:
+            style[name.strip()] = value.strip()
+    return style
+
+
+def _strip_source(text):
+    """Drop front matter and %% comments; returns (lines, title)"""
+    title = None
+    lines = text.splitlines()
+    if lines and lines[0].strip() == '---':
+        end = next((i for i in range(1, len(lines)) if lines[i].strip() == '---'), 0)
+        for line in lines[1:end]:
+            if line.strip().startswith('title:'):
+                title = clean_label(line.split(':', 1)[1])
+        lines = lines[end + 1:]
+    statements = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('%%'):
+            continue
+        statements.extend(s.strip() for s in line.split(';') if s.strip())
+    return statements, title
+
+
+def parse(text):
+    """Parse Mermaid source into a flowchart or xychart description"""
+    statements, title = _strip_source(text)
+    if not statements:
+        raise UnsupportedDiagram('empty diagram')
+    header = statements[0].split()
+    if header[0] == 'xychart-beta':
+        return _parse_xychart(statements, title)
+    if header[0] not in ('graph', 'flowchart'):
+        raise UnsupportedDiagram(f'diagram type {header[0]!r} is not supported natively')
+    direction = header[1].upper() if len(header) > 1 else 'TB'
+    return _parse_flowchart(statements[1:], 'TB' if direction == 'TD' else direction, title)
+
+
+def _parse_flowchart(statements, direction, title):
+    diagram = {
+        'type': 'flowchart', 'title': title, 'nodes': {}, 'edges': [],
+        'clusters': {None: {'id': None, 'title': title, 'parent': None, 'direction': direction}},
+        'class_defs': {}, 'order': [],
+    }
+    stack = [None]
+
+    def mention(node_id, label=None, shape=None):
+        nodes = diagram['nodes']
+        if node_id in diagram['clusters']:
+            return
+        if node_id not in nodes:
+            nodes[node_id] = {'id': node_id, 'label': node_id, 'shape': 'rect',
+                              'classes': [], 'style': {}, 'cluster': None}
+            diagram['order'].append(node_id)
+        node = nodes[node_id]
+        if label is not None:
+            node['label'], node['shape'] = clean_label(label), shape
+        if node['cluster'] is None and stack[-1] is not None:
+            node['cluster'] = stack[-1]
+
+    for statement in statements:
+        keyword = statement.split()[0]
+        if keyword == 'subgraph':
+            match = SUBGRAPH_PATTERN.match(statement)
+            if not match:
+                raise UnsupportedDiagram(f'cannot parse: {statement}')
+            cluster_id = match.group(1) or clean_label(match.group(3) or match.group(2) or '')
+            cluster_title = clean_label(match.group(2) or match.group(3) or cluster_id)
+            diagram['clusters'][cluster_id] = {'id': cluster_id, 'title': cluster_title,
+                                               'parent': stack[-1], 'direction': None}
+            diagram['order'].append(cluster_id)
+            stack.append(cluster_id)
+        elif keyword == 'end':
+            if len(stack) > 1:
+                stack.pop()
+        elif keyword == 'direction':
+            direction = statement.split()[1].upper()
+            diagram['clusters'][stack[-1]]['direction'] = 'TB' if direction == 'TD' else direction
+        elif keyword == 'classDef':
+            _, name, spec = statement.split(None, 2)
+            diagram['class_defs'][name] = parse_style(spec)
+        elif keyword == 'class':
+            _, ids, name = statement.split(None, 2)
+            for node_id in ids.split(','):
+                target = diagram['nodes'].get(node_id.strip()) or diagram['clusters'].get(node_id.strip())
+                if target is not None:
+                    target.setdefault('classes', []).append(name.strip())
+        elif keyword == 'style':
+            _, node_id, spec = statement.split(None, 2)
+            target = diagram['nodes'].get(node_id) or diagram['clusters'].get(node_id)
+            if target is not None:
+                target.setdefault('style', {}).update(parse_style(spec))
+        elif keyword in ('linkStyle', 'click'):
+            continue
+        else:
+            _parse_chain(statement, diagram, mention)
+    return diagram
+
+
+def _parse_node_ref(text, pos):
+    """Parse `id`, `id[label]`, `id:::cls`...; returns (id, label, shape, classes, pos)"""
+    match = NODE_PATTERN.match(text, pos)
+    if not match:
+        raise UnsupportedDiagram(f'expected a node at: {text[pos:]}')
+    node_id, pos = match.group(1), match.end()
+    label = shape = None
+    for opener, closer, name in SHAPES:
+        if text.startswith(opener, pos):
+            start = pos + len(opener)
+            if text.startswith('"', start):
+                quote_end = text.find('"', start + 1)
+                end = text.find(closer, quote_end + 1)
+            else:
+                end = text.find(closer, start)
+            if end < 0:
+                raise UnsupportedDiagram(f'unclosed node shape in: {text}')
+            label, shape, pos = text[start:end], name, end + len(closer)
+            break
+    classes = []
+    while text.startswith(':::', pos):
+        match = NODE_PATTERN.match(text, pos + 3)
+        classes.append(match.group(1))
+        pos = match.end()
+    return node_id, label, shape, classes, pos
+
+
+def _parse_chain(statement, diagram, mention):
+    """Parse `A --> B -->|x| C` style statements and bare node declarations"""
+    node_id, label, shape, classes, pos = _parse_node_ref(statement, 0)
+    mention(node_id, label, shape)
+    if classes and node_id in diagram['nodes']:
+        diagram['nodes'][node_id]['classes'].extend(classes)
+    while pos < len(statement):
+        link = LINK_PATTERN.match(statement, pos)
+        if not link or link.end() == pos:
+            raise UnsupportedDiagram(f'cannot parse: {statement}')
+        target, label, shape, classes, pos = _parse_node_ref(statement, link.end())
+        mention(target, label, shape)
+        if classes and target in diagram['nodes']:
+            diagram['nodes'][target]['classes'].extend(classes)
+        body = link.group(3)
+        diagram['edges'].append({
+            'src': node_id, 'dst': target,
+            'label': clean_label(link.group(5) or link.group(2) or ''),
+            'arrow_start': bool(link.group(1)), 'arrow_end': bool(link.group(4)),
+            'line': 'dotted' if '.' in body else 'thick' if body.startswith('=') else 'solid',
+        })
+        node_id = target
+
+
+def _parse_values(text):
+    """Parse a Mermaid list like ["a", "b"] or [1, 2.5]"""
+    items = re.findall(r'"([^"]*)"|([^,\[\]\s][^,\[\]]*)', text)
+    return [quoted or bare.strip() for quoted, bare in items]
+
+
+def _parse_xychart(statements, title):
+    chart = {'type': 'xychart', 'title': title, 'horizontal': 'horizontal' in statements[0],
+             'x_labels': None, 'x_title': '', 'y_title': '', 'y_range': None, 'series': []}
+    for statement in statements[1:]:
+        keyword, _, rest = statement.partition(' ')
+        rest = rest.strip()
+        if keyword == 'title':
+            chart['title'] = clean_label(rest)
+        elif keyword in ('x-axis', 'y-axis'):
+            axis = keyword[0]
+            match = re.match(r'(?:"([^"]*)"|(\w+))?\s*(.*)$', rest)
+            chart[f'{axis}_title'] = match.group(1) or match.group(2) or ''
+            remainder = match.group(3)
+            if remainder.startswith('['):
+                chart[f'{axis}_labels'] = _parse_values(remainder)
+            elif '-->' in remainder:
+                low, high = remainder.split('-->')
+                chart[f'{axis}_range'] = (float(low), float(high))
+        elif keyword in ('bar', 'line'):
+            match = re.match(r'(?:"([^"]*)")?\s*(\[.*\])$', rest)
+            if not match:
+                raise UnsupportedDiagram(f'cannot parse: {statement}')
+            values = [float(v) for v in _parse_values(match.group(2))]
+            chart['series'].append({'kind': keyword, 'name': match.group(1), 'values': values})
+        else:
+            raise UnsupportedDiagram(f'unsupported xychart statement: {statement}')
+    return chart
+
+
+# ---------------------------------------------------------------- layout ---
+
+def measure_text(text, theme, bold=False):
+    """Return (width, height) of a possibly multi-line label in pixels"""
+    lines = text.split('\n') if text else ['']
+    weight = 'bold' if bold else 'normal'
+    width = max(text_width(line, theme['fontPx'], theme['fontFamilies'], weight) if line else 0.0 for line in lines)
+    return width, len(lines) * theme['fontPx'] * 1.3
+
+
+def _node_style(diagram, item):
+    style = {}
+    for name in item.get('classes', []):
+        style.update(diagram['class_defs'].get(name, {}))
+    style.update(item.get('style', {}))
+    return style
+
+
+def _size_nodes(diagram, theme):
+    for node in diagram['nodes'].values():
+        style = _node_style(diagram, node)
+        width, height = measure_text(node['label'], theme, style.get('font-weight') == 'bold')
+        width, height = width + 30, height + 20
+        if node['shape'] == 'circle':
+            width = height = max(width, height)
+        elif node['shape'] == 'rhombus':
+            width, height = width * 1.5, height * 1.5
+        node['w'], node['h'] = width, height
+
+
+def _parent(diagram, item_id):
+    if item_id in diagram['nodes']:
+        return diagram['nodes'][item_id]['cluster']
+    return diagram['clusters'][item_id]['parent']
+
+
+def _rank(count, edges):
+    """Longest-path ranks after dropping the edges that close cycles"""
+    adjacency = [[] for _ in range(count)]
+    for a, b in edges:
+        adjacency[a].append(b)
+    state = [0] * count
+    dag = [[] for _ in range(count)]
+    for root in range(count):
+        if state[root]:
+            continue
+        stack = [(root, iter(adjacency[root]))]
+        state[root] = 1
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                state[node] = 2
+                stack.pop()
+            elif state[child] == 0:
+                dag[node].append(child)
+                state[child] = 1
+                stack.append((child, iter(adjacency[child])))
+            elif state[child] == 2:
+                dag[node].append(child)
+
+    indegree = [0] * count
+    for children in dag:
+        for child in children:
+            indegree[child] += 1
+    ranks = [0] * count
+    queue = [i for i in range(count) if indegree[i] == 0]
+    while queue:
+        node = queue.pop(0)
+        for child in dag[node]:
+            ranks[child] = max(ranks[child], ranks[node] + 1)
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                queue.append(child)
+    return ranks
+
+
+def _order(layers, edges, sweeps=4):
+    """Reorder each layer by the barycenter of its neighbours"""
+    neighbours_up = {}
+    neighbours_down = {}
+    for a, b in edges:
+        neighbours_down.setdefault(a, []).append(b)
+        neighbours_up.setdefault(b, []).append(a)
+    for sweep in range(sweeps):
+        downward = sweep % 2 == 0
+        sequence = range(1, len(layers)) if downward else range(len(layers) - 2, -1, -1)
+        neighbours = neighbours_up if downward else neighbours_down
+        for r in sequence:
+            position = {item: i for layer in layers for i, item in enumerate(layer)}
+            current = {item: i for i, item in enumerate(layers[r])}
+
+            def barycenter(item):
+                linked = [position[n] for n in neighbours.get(item, [])]
+                return sum(linked) / len(linked) if linked else current[item]
+            layers[r].sort(key=barycenter)
+    return layers
+
+
+def _owner(diagram, item_id, cluster_id):
+    """The child of `cluster_id` holding `item_id`, or None when it lies outside"""
+    while item_id is not None and _parent(diagram, item_id) != cluster_id:
+        item_id = _parent(diagram, item_id)
+    return item_id
+
+
+def _layout_cluster(diagram, cluster_id, direction, theme):
+    """
+    Lay out one cluster's children; sets their relative centres and its size.
+
+    Edges spanning several ranks get a dummy node on every rank in between,
+    so they run through free lanes instead of across the nodes; this holds
+    for the edges dropped to break cycles too, which are routed back along
+    their own lane. An edge to a node outside the cluster runs on to the
+    border the flow points at (or comes in from the opposite one). The
+    waypoints are stored in diagram['routes'][edge number][cluster_id].
+    """
+    cluster = diagram['clusters'][cluster_id]
+    inherited = direction
+    direction = cluster['direction'] or direction
+    cluster['flow'] = direction
+    items = [i for i in diagram['order'] if _parent(diagram, i) == cluster_id]
+    for item in items:
+        if item in diagram['clusters']:
+            _layout_cluster(diagram, item, direction, theme)
+    boxes = [diagram['nodes'].get(i) or diagram['clusters'][i] for i in items]
+    index = {item: i for i, item in enumerate(items)}
+    # Border ports only line up with the parent's ranks when both flow alike
+    ports = cluster_id is not None and direction == inherited
+
+    links = []
+    edges = []
+    for number, edge in enumerate(diagram['edges']):
+        a, b = _owner(diagram, edge['src'], cluster_id), _owner(diagram, edge['dst'], cluster_id)
+        if a in index and b in index:
+            if a != b:
+                links.append((number, index[a], index[b]))
+                if (index[a], index[b]) not in edges:
+                    edges.append((index[a], index[b]))
+        elif ports and (a in index or b in index):
+            links.append((number, index.get(a), index.get(b)))
+
+    ranks = _rank(len(items), edges)
+    last = max(ranks, default=-1)
+    nodes = list(boxes)
+    chains = []
+    order_edges = list(edges)
+    for number, a, b in links:
+        start = ranks[a] if a is not None else -1
+        stop = ranks[b] if b is not None else last + 1
+        step = 1 if stop >= start else -1
+        dummies = []
+        for rank in range(start + step, stop, step):
+            nodes.append({'w': 0.0, 'h': 0.0})
+            ranks.append(rank)
+            dummies.append(len(nodes) - 1)
+        chain = [i for i in [a] + dummies + [b] if i is not None]
+        for u, v in zip(chain, chain[1:]):
+            order_edges.append((u, v) if ranks[u] < ranks[v] else (v, u))
+        chains.append((number, a, b, dummies, step))
+
+    flipped = direction in ('BT', 'RL')
+    if flipped:
+        ranks = [last - r for r in ranks]
+    layers = [[] for _ in range(max(ranks, default=-1) + 1)]
+    for i, r in enumerate(ranks):
+        layers[r].append(i)
+    _order(layers, order_edges)
+
+    horizontal = direction in ('LR', 'RL')
+    main = 'w' if horizontal else 'h'
+    cross = 'h' if horizontal else 'w'
+    gap, rank_gap = theme['nodeSpacing'], theme['rankSpacing']
+    lengths = [sum(nodes[i][cross] for i in layer) + gap * (len(layer) - 1) for layer in layers]
+    thickness = [max(nodes[i][main] for i in layer) for layer in layers]
+    span = max(lengths, default=0)
+
+    offset_main = 0.0
+    for layer, length, thick in zip(layers, lengths, thickness):
+        offset_cross = (span - length) / 2
+        for i in layer:
+            box = nodes[i]
+            centre_main = offset_main + thick / 2
+            centre_cross = offset_cross + box[cross] / 2
+            box['rx'], box['ry'] = (centre_main, centre_cross) if horizontal else (centre_cross, centre_main)
+            box['band'] = thick / 2
+            offset_cross += box[cross] + gap
+        offset_main += thick + rank_gap
+    extent_main = max(offset_main - rank_gap, 0)
+    content_w, content_h = (extent_main, span) if horizontal else (span, extent_main)
+
+    padding = 20 if cluster_id is not None or cluster['title'] else 0
+    title_h = theme['fontPx'] * 2 if cluster['title'] else 0
+    if cluster_id is not None:
+        content_w = max(content_w, measure_text(cluster['title'], theme, True)[0] + 20)
+    cluster['w'] = content_w + 2 * padding
+    cluster['h'] = content_h + 2 * padding + title_h
+    for box in nodes:
+        box['rx'] += padding
+        box['ry'] += padding + title_h
+
+    def point(main_value, cross_value):
+        return (main_value, cross_value) if horizontal else (cross_value, main_value)
+
+    def lane(i):
+        return nodes[i]['ry'] if horizontal else nodes[i]['rx']
+
+    size = cluster[main]
+    for number, a, b, dummies, step in chains:
+        # Each dummy holds its lane across the whole rank band, so the edge
+        # only turns in the gaps between ranks
+        sign = step * (-1 if flipped else 1)
+        points = []
+        for i in dummies:
+            centre_main = nodes[i]['rx'] if horizontal else nodes[i]['ry']
+            points += [point(centre_main - sign * nodes[i]['band'], lane(i)),
+                       point(centre_main + sign * nodes[i]['band'], lane(i))]
+        if a is None:
+            points.insert(0, point(size if sign < 0 else 0.0, lane(dummies[0] if dummies else b)))
+        if b is None:
+            points.append(point(size if sign > 0 else 0.0, lane(dummies[-1] if dummies else a)))
+        diagram['routes'].setdefault(number, {})[cluster_id] = points
+
+
+def _place(diagram, cluster_id, left, top):
+    """Convert relative centres into absolute top-left coordinates"""
+    for item in diagram['order']:
+        if _parent(diagram, item) != cluster_id:
+            continue
+        box = diagram['nodes'].get(item) or diagram['clusters'][item]
+        box['x'], box['y'] = left + box['rx'] - box['w'] / 2, top + box['ry'] - box['h'] / 2
+        if item in diagram['clusters']:
+            _place(diagram, item, box['x'], box['y'])
+
+
+def layout(diagram, theme):
+    """Compute absolute boxes for every node and subgraph in a flowchart"""
+    _size_nodes(diagram, theme)
+    diagram['routes'] = {}
+    root = diagram['clusters'][None]
+    _layout_cluster(diagram, None, root['direction'], theme)
+    root['x'] = root['y'] = 0.0
+    _place(diagram, None, 0.0, 0.0)
+    return root['w'], root['h']
+
+
+# ------------------------------------------------------------- rendering ---
+
+def _port(box, toward, horizontal):
+    """Middle of the side of a box facing `toward` along the flow, else _clip()"""
+    cx, cy = box['x'] + box['w'] / 2, box['y'] + box['h'] / 2
+    if horizontal and abs(toward[0] - cx) > box['w'] / 2:
+        return (box['x'] + box['w'] if toward[0] > cx else box['x']), cy
+    if not horizontal and abs(toward[1] - cy) > box['h'] / 2:
+        return cx, (box['y'] + box['h'] if toward[1] > cy else box['y'])
+    return _clip(box, toward)
+
+
+def _ancestors(diagram, item_id):
+    """Clusters holding an item, innermost first, ending with the root (None)"""
+    chain = [_parent(diagram, item_id)]
+    while chain[-1] is not None:
+        chain.append(diagram['clusters'][chain[-1]]['parent'])
+    return chain
+
+
+def edge_route(diagram, number, boxes):
+    """
+    Points of edge `number` from its source box to its target box.
+
+    Joins the waypoints each cluster stored for it, from the source's
+    cluster up to the lowest cluster holding both ends and down again.
+    """
+    edge = diagram['edges'][number]
+    up, down = _ancestors(diagram, edge['src']), _ancestors(diagram, edge['dst'])
+    common = next(c for c in up if c in down)
+    path = up[:up.index(common) + 1] + down[:down.index(common)][::-1]
+    stored = diagram['routes'].get(number, {})
+    waypoints = []
+    for cluster_id in path:
+        cluster = diagram['clusters'][cluster_id]
+        waypoints += [(cluster['x'] + x, cluster['y'] + y) for x, y in stored.get(cluster_id, [])]
+
+    src, dst = boxes[edge['src']], boxes[edge['dst']]
+    horizontal = diagram['clusters'][common]['flow'] in ('LR', 'RL')
+    start = _port(src, waypoints[0] if waypoints else (dst['x'] + dst['w'] / 2, dst['y'] + dst['h'] / 2), horizontal)
+    end = _port(dst, waypoints[-1] if waypoints else (src['x'] + src['w'] / 2, src['y'] + src['h'] / 2), horizontal)
+    return [start] + waypoints + [end]
+
+
+def _clip(box, toward):
+    """Point where the segment from a box centre to `toward` leaves the box"""
+    cx, cy = box['x'] + box['w'] / 2, box['y'] + box['h'] / 2
+    dx, dy = toward[0] - cx, toward[1] - cy
+    scales = []
+    if dx:
+        scales.append(box['w'] / 2 / abs(dx))
+    if dy:
+        scales.append(box['h'] / 2 / abs(dy))
+    scale = min(scales + [1.0])
+    return cx + dx * scale, cy + dy * scale
+
+
+def _color(value, default):
+    """Map a CSS colour from a style to something matplotlib accepts"""
+    if value is None:
+        return default
+    return 'none' if value in ('transparent', 'none') else value
+
+
+def _px(value, default):
+    try:
+        return float(str(value).replace('px', ''))
+    except (TypeError, ValueError):
+        return default
+
+
+def _text(ax, x, y, text, theme, color, bold=False, zorder=110):
+    ax.text(x, y, text, ha='center', va='center', color=color, linespacing=1.3, zorder=zorder,
+            fontsize=theme['fontPx'] * PT_PER_PX, family=theme['fontFamilies'],
+            weight='bold' if bold else 'normal')
+
+
+def _draw_flowchart(ax, diagram, theme):
+    depth = {}
+
+    def cluster_depth(cluster_id):
+        if cluster_id not in depth:
+            parent = diagram['clusters'][cluster_id]['parent']
+            depth[cluster_id] = 0 if parent is None else cluster_depth(parent) + 1
+        return depth[cluster_id]
+
+    clusters = [c for c in diagram['clusters'].values() if c['id'] is not None]
+    for cluster in sorted(clusters, key=lambda c: cluster_depth(c['id'])):
+        style = _node_style(diagram, cluster)
+        fill = _color(style.get('fill'), theme['tertiaryColor'])
+        ax.add_patch(FancyBboxPatch(
+            (cluster['x'], cluster['y']), cluster['w'], cluster['h'],
+            boxstyle='round,pad=0,rounding_size=4', facecolor=fill,
+            edgecolor=_color(style.get('stroke'), theme['primaryBorderColor']),
+            linewidth=_px(style.get('stroke-width'), 1) * PT_PER_PX, zorder=1 + cluster_depth(cluster['id'])))
+        # Above the edges, on the cluster's fill, so an edge entering the cluster passes behind it
+        ax.text(cluster['x'] + cluster['w'] / 2, cluster['y'] + 20 + theme['fontPx'] * 0.6, cluster['title'],
+                ha='center', va='center', linespacing=1.3, zorder=70,
+                color=_color(style.get('color'), theme['primaryTextColor']),
+                fontsize=theme['fontPx'] * PT_PER_PX, family=theme['fontFamilies'],
+                weight='bold' if style.get('font-weight') == 'bold' else 'normal',
+                bbox=dict(boxstyle='square,pad=0.1', facecolor=fill if fill != 'none' else theme['background'],
+                          edgecolor='none'))
+
+    boxes = {**{c['id']: c for c in clusters}, **diagram['nodes']}
+    for number, edge in enumerate(diagram['edges']):
+        if edge['src'] == edge['dst']:
+            continue
+        points = edge_route(diagram, number, boxes)
+        arrow = ('<|-|>' if edge['arrow_start'] and edge['arrow_end'] else
+                 '-|>' if edge['arrow_end'] else '<|-' if edge['arrow_start'] else '-')
+        ax.add_patch(FancyArrowPatch(
+            path=Path(points), arrowstyle=arrow, mutation_scale=12, color=theme['lineColor'],
+            linewidth=(3 if edge['line'] == 'thick' else 1.5) * PT_PER_PX,
+            linestyle=':' if edge['line'] == 'dotted' else '-', zorder=50))
+        if edge['label']:
+            # On the longest leg, which crosses a gap between ranks; drawn above
+            # the nodes so no box can hide it
+            a, b = max(zip(points, points[1:]), key=lambda leg: math.dist(*leg))
+            ax.text((a[0] + b[0]) / 2, (a[1] + b[1]) / 2, edge['label'],
+                    ha='center', va='center', fontsize=theme['fontPx'] * PT_PER_PX * 0.9,
+                    family=theme['fontFamilies'], color=theme['primaryTextColor'], zorder=120,
+                    bbox=dict(boxstyle='square,pad=0.2', facecolor=theme['background'], edgecolor='none'))
+
+    for node in diagram['nodes'].values():
+        style = _node_style(diagram, node)
+        common = dict(facecolor=_color(style.get('fill'), theme['primaryColor']),
+                      edgecolor=_color(style.get('stroke'), theme['primaryBorderColor']),
+                      linewidth=_px(style.get('stroke-width'), 1) * PT_PER_PX, zorder=100)
+        x, y, w, h = node['x'], node['y'], node['w'], node['h']
+        if node['shape'] == 'circle':
+            patch = Circle((x + w / 2, y + h / 2), w / 2, **common)
+        elif node['shape'] == 'rhombus':
+            patch = Polygon([(x + w / 2, y), (x + w, y + h / 2), (x + w / 2, y + h), (x, y + h / 2)], **common)
+        else:
+            rounding = {'rect': 0, 'round': 6, 'cylinder': 12, 'stadium': h / 2}[node['shape']]
+            patch = FancyBboxPatch((x, y), w, h, boxstyle=f'round,pad=0,rounding_size={rounding}', **common)
+        ax.add_patch(patch)
+        _text(ax, x + w / 2, y + h / 2, node['label'], theme,
+              _color(style.get('color'), theme['primaryTextColor']), bold=style.get('font-weight') == 'bold')
+
+
+def _render_flowchart(diagram, theme, scale):
+    width, height = layout(diagram, theme)
+    margin = 8
+    fig = Figure(figsize=((width + 2 * margin) / PX_PER_INCH, (height + 2 * margin) / PX_PER_INCH),
+                 dpi=PX_PER_INCH * scale)
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_xlim(-margin, width + margin)
+    ax.set_ylim(height + margin, -margin)
+    ax.axis('off')
+    _draw_flowchart(ax, diagram, theme)
+    return fig
+
+
+def _render_xychart(chart, theme, scale, width=700, height=500):
+    fig = Figure(figsize=(width / PX_PER_INCH, height / PX_PER_INCH), dpi=PX_PER_INCH * scale)
+    ax = fig.add_subplot(1, 1, 1)
+    size = theme['fontPx'] * PT_PER_PX
+    length = max((len(s['values']) for s in chart['series']), default=0)
+    labels = chart['x_labels'] or [str(i + 1) for i in range(length)]
+    positions = list(range(len(labels)))
+    bars = [s for s in chart['series'] if s['kind'] == 'bar']
+    bar_width = 0.8 / max(len(bars), 1)
+
+    for i, series in enumerate(chart['series']):
+        color = SERIES_COLORS[i % len(SERIES_COLORS)]
+        if series['kind'] == 'bar':
+            shift = (bars.index(series) - (len(bars) - 1) / 2) * bar_width
+            xs = [p + shift for p in positions[:len(series['values'])]]
+            draw = ax.barh if chart['horizontal'] else ax.bar
+            draw(xs, series['values'], bar_width, color=color, label=series['name'])
+        else:
+            xs, ys = positions[:len(series['values'])], series['values']
+            if chart['horizontal']:
+                xs, ys = ys, xs
+            ax.plot(xs, ys, color=color, linewidth=2, marker='o', markersize=4, label=series['name'])
+
+    value_axis, label_axis = (ax.xaxis, ax.yaxis) if chart['horizontal'] else (ax.yaxis, ax.xaxis)
+    (ax.set_yticks if chart['horizontal'] else ax.set_xticks)(positions)
+    (ax.set_yticklabels if chart['horizontal'] else ax.set_xticklabels)(labels, fontsize=size * 0.9)
+    if chart['y_range']:
+        (ax.set_xlim if chart['horizontal'] else ax.set_ylim)(*chart['y_range'])
+    value_axis.set_label_text(chart['y_title'], fontsize=size)
+    label_axis.set_label_text(chart['x_title'], fontsize=size)
+    if chart['title']:
+        ax.set_title(chart['title'], fontsize=size * 1.3, weight='bold', color=theme['primaryTextColor'])
+    if any(s['name'] for s in chart['series']):
+        ax.legend(fontsize=size * 0.85, frameon=False)
+    for spine in ('top', 'right'):
+        ax.spines[spine].set_visible(False)
+    ax.tick_params(colors=theme['primaryTextColor'])
+    fig.tight_layout()
+    return fig
+
+
+def render(text, outputs, params=None, config=MERMAID_CONFIG):
+    """Render Mermaid source to every output path (format from the extension)"""
+    params = params or {}
+    theme = load_theme(config)
+    scale = float(params.get('scale', 1))
+    diagram = parse(text)
+    if diagram['type'] == 'xychart':
+        fig = _render_xychart(diagram, theme, scale)
+    else:
+        fig = _render_flowchart(diagram, theme, scale)
+    FigureCanvasAgg(fig)
+    background = params.get('backgroundColor', theme['background'])
+    return save_figure(fig, outputs, facecolor=background, edgecolor='none')
+
+
+def render_file(source, outputs, params=None, config=MERMAID_CONFIG):
+    """Render a .mmd file natively; raises UnsupportedDiagram outside the subset"""
+    with open(source, encoding='utf-8') as f:
+        return render(f.read(), outputs, params, config)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        print("Usage: python mermaid_native.py diagram.mmd output.png [output.svg ...]")
+        return 2
+    try:
+        render_file(argv[0], argv[1:], {'scale': 2})
+    except UnsupportedDiagram as e:
+        print(f"❌ {argv[0]}: {e}")
+        return 1
+    for output in argv[1:]:
+        print(f"✅ Generated: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+PNG Optimizer
+Re-encodes the report's PNG files losslessly in fewer bytes
+
+The diagrams are flat-colour line art (a few fills like #E8F4FD, #F8F9FA and
+#1976D2 plus their anti-aliased edges), but matplotlib, mmdc and PlantUML
+save them as truecolour, often RGBA, PNGs. For every PNG under img/ and
+figures/ this:
+- maps an image with at most 256 colours to an exact palette (the colours it
+  uses, nothing approximated; PNG then stores 1, 2, 4 or 8 bits per pixel and
+  a tRNS chunk for translucent colours)
+- otherwise drops the alpha channel when every pixel is opaque
+- encodes at zlib level 9 with each useful strategy and keeps the smallest
+The palette image is compared with the original pixel by pixel before it is
+used, and a file is only replaced when it got smaller, through a temporary
+file and os.replace(). Identical files (hard links from figure_export.py,
+copies like architecture-huge/-xlarge) are optimized once and linked again.
+
+Files are spread over a process pool. Digests of files already known to be
+optimal are kept in .cache/png-optimized.json, so a second run only hashes
+the files. Cache entries that stored the old bytes are pointed at the new
+ones (figure_cache.replace_outputs), so restoring a figure does not undo
+the work.
+
+Usage:
+    python png_optimize.py                  # img/ and figures/
+    python png_optimize.py img/scrum.PNG    # Some files or directories
+    python png_optimize.py --dry-run        # Only report the savings
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from figure_cache import CACHE_DIR, PROJECT_ROOT, file_digest, project_path, replace_outputs
+from figure_export import link_or_copy
+
+DEFAULT_DIRS = [os.path.join(PROJECT_ROOT, 'img'), os.path.join(PROJECT_ROOT, 'figures')]
+STATE_PATH = os.path.join(CACHE_DIR, 'png-optimized.json')
+
+# Z_HUFFMAN_ONLY and Z_FIXED never won on these diagrams, and Z_FILTERED only
+# on palettes, where encoding is cheap; level 9 costs seconds on a 10000px wide
+# truecolour figure
+PALETTE_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED, zlib.Z_RLE)
+TRUECOLOR_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_RLE)
+MAX_PALETTE = 256
+# 16-bit and CMYK files would lose precision in the RGBA comparison
+MODES = ('1', 'L', 'LA', 'P', 'PA', 'RGB', 'RGBA')
+
+
+def find_pngs(paths=None):
+    """Every .png file under the given files or directories, sorted"""
+    found = set()
+    for path in paths or DEFAULT_DIRS:
+        if os.path.isfile(path):
+            found.add(os.path.abspath(path))
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ('node_modules', '__pycache__')]
+            found.update(os.path.join(root, name) for name in files if name.lower().endswith('.png'))
+    return sorted(found)
+
+
+def exact_palette(image):
+    """`image` as a 'P' image with exactly its colours, or None when it has more than 256"""
+    import numpy as np
+    from PIL import Image
+
+    rgba = image.convert('RGBA')
+    colors = rgba.getcolors(MAX_PALETTE)
+    if colors is None:
+        return None
+    palette = np.array([color for _, color in colors], dtype=np.uint8)
+    # Translucent colours first keeps the tRNS chunk short
+    palette = palette[np.argsort(palette[:, 3] == 255, kind='stable')]
+    keys = palette.view('<u4').ravel()
+    order = np.argsort(keys)
+    pixels = np.asarray(rgba).view('<u4')[..., 0]
+    indices = order[np.searchsorted(keys[order], pixels)].astype(np.uint8)
+
+    result = Image.frombytes('P', image.size, indices.tobytes())
+    result.putpalette(palette[:, :3].tobytes())
+    alpha = palette[:, 3]
+    if (alpha < 255).any():
+        result.info['transparency'] = bytes(alpha[:int((alpha < 255).sum())])
+    if not np.array_equal(np.asarray(result.convert('RGBA')), np.asarray(rgba)):
+        raise ValueError('palette does not reproduce the image')
+    return result
+
+
+def _truecolor(image):
+    """`image` without an alpha channel when it is fully opaque"""
+    if image.mode in ('RGBA', 'LA') and image.getchannel('A').getextrema()[0] == 255:
+        return image.convert(image.mode[:-1])
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        return image.convert('RGBA')
+    return image
+
+
+def _encode(image, strategy, dpi):
+    buffer = io.BytesIO()
+    options = {'compress_level': 9, 'compress_type': strategy}
+    if dpi:
+        options['dpi'] = dpi
+    if 'transparency' in image.info:
+        options['transparency'] = image.info['transparency']
+    image.save(buffer, 'PNG', **options)
+    return buffer.getvalue()
+
+
+def optimize_file(path, dry_run=False):
+    """
+    Re-encode one PNG if that makes it smaller without changing a pixel.
+
+    Returns {'path', 'before', 'after', 'mode', 'status'} where status is
+    'optimized', 'optimal' (already as small) or 'failed'.
+    """
+    from PIL import Image
+
+    result = {'path': path, 'before': os.path.getsize(path), 'after': None, 'mode': None, 'status': 'optimal'}
+    try:
+        with Image.open(path) as image:
+            image.load()
+            if image.mode not in MODES:
+                return result
+            dpi = image.info.get('dpi')
+            candidate = exact_palette(image) or _truecolor(image)
+            strategies = PALETTE_STRATEGIES if candidate.mode == 'P' else TRUECOLOR_STRATEGIES
+            best = min((_encode(candidate, strategy, dpi) for strategy in strategies), key=len)
+            if len(best) >= result['before']:
+                return result
+    except Exception as e:
+        return {**result, 'status': 'failed', 'error': f'{type(e).__name__}: {e}'}
+
+    result.update(after=len(best), mode=candidate.mode, status='optimized')
+    if not dry_run:
+        # A new file, never written through a hard link
+        tmp = f'{path}.tmp-{os.getpid()}'
+        with open(tmp, 'wb') as f:
+            f.write(best)
+        os.replace(tmp, path)
+    return result
+
+
+def _load_state():
+    try:
+        with open(STATE_PATH) as f:
+            return set(json.load(f)['optimal'])
+    except (OSError, ValueError, KeyError):
+        return set()
+
+
+def _save_state(optimal):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    tmp = f'{STATE_PATH}.tmp-{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump({'optimal': sorted(optimal)}, f, indent=0)
+    os.replace(tmp, STATE_PATH)
+
+
+def optimize_pngs(paths=None, max_workers=None, dry_run=False, verbose=True):
+    """Optimize every PNG under `paths` (default: img/ and figures/) in parallel; returns the results"""
+    optimal = _load_state()
+    groups = {}
+    for path in find_pngs(paths):
+        groups.setdefault(file_digest(path), []).append(path)
+    pending = [(digest, links) for digest, links in groups.items() if digest not in optimal]
+
+    results = []
+    if pending:
+        workers = min(max_workers or os.cpu_count() or 1, len(pending))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(optimize_file, links[0], dry_run) for _, links in pending]
+            for (digest, links), future in zip(pending, futures):
+                result = future.result()
+                result.update(digest=digest, links=links[1:])
+                results.append(result)
+
+    replaced = {}
+    for result in results:
+        first = result['path']
+        if result['status'] == 'failed':
+            print(f"⚠️  {project_path(first)}: {result['error']}")
+            continue
+        if dry_run:
+            continue
+        if result['status'] == 'optimized':
+            for path in [first] + result['links']:
+                replaced[path] = result['digest']
+            for path in result['links']:
+                link_or_copy(first, path)
+        optimal.add(file_digest(first))
+    if not dry_run:
+        replace_outputs(replaced)
+        _save_state(optimal)
+
+    if verbose:
+        done = [r for r in results if r['status'] == 'optimized']
+        for result in done:
+            print(f"🗜️  {project_path(result['path'])}: {result['before'] / 1024:.0f} KB → "
+                  f"{result['after'] / 1024:.0f} KB ({result['mode']})"
+                  + (f", {len(result['links'])} identical" if result['links'] else ""))
+        files = sum(len(links) for links in groups.values())
+        saved = sum((r['before'] - r['after']) * (1 + len(r['links'])) for r in done)
+        skipped = files - sum(len(links) for _, links in pending)
+        print(f"📦 {sum(1 + len(r['links']) for r in done)} of {files} PNG file(s) "
+              f"{'can be ' if dry_run else ''}optimized, {saved / 1024:.0f} KB saved"
+              + (f" ({skipped} already optimal)" if skipped else ""))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Losslessly shrink the PNG figures')
+    parser.add_argument('paths', nargs='*', help='Files or directories (default: img/ and figures/)')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--dry-run', action='store_true', help='Report the savings without writing')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    results = optimize_pngs(args.paths, args.jobs, args.dry_run)
+    print(f"⏱️  Done in {time.perf_counter() - started:.2f}s")
+    return 1 if any(r['status'] == 'failed' for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+Print-Size Images
+Resamples raster figures to the pixels the page actually needs
+
+Figures are drawn at 300 dpi on large canvases and screenshots are taken at
+screen size, but the report places them at a fixed width (width=16cm,
+0.9\\textwidth, ...). pdflatex embeds the whole raster anyway, which bloats
+output/main.pdf and makes every pass re-read and recompress it.
+
+For every \\includegraphics found by figure_index.py, this reads the width,
+converts it to inches and, when the PNG or JPEG has more pixels than
+`width * dpi`, writes a Lanczos-resampled copy to build/print/<same path>.
+tpl/new_commands.tex makes \\includegraphics{img/x.png} embed
+build/print/img/x.png whenever it exists (after preferring a vector
+img/x.pdf). A graphic used several times gets the largest width; one without
+a readable width is left alone. Copies go through the figure cache keyed by
+the source content, width and dpi, so unchanged images cost a lookup.
+
+pdflatex copies PNG data into the PDF as is, so bytes matter more than
+pixels. A resampled PNG is saved in true colour and re-encoded by
+png_optimize.optimize_file(), which only switches to a palette when the
+copy has at most 256 colours (so no pixel changes), and a copy that ends up
+no smaller than its source (typically a screenshot) is dropped in favour of
+the original.
+
+\\textwidth is 16.6cm (tpl/isipfe.cls); \\linewidth and \\columnwidth are
+taken as \\textwidth, which can only err on the large side.
+
+Usage:
+    python print_size.py             # Resample for 300 dpi
+    python print_size.py --dpi 200   # Smaller PDF, e.g. for review copies
+    python print_size.py --list      # Show what would be resampled
+    python print_size.py --clear     # Embed the full resolution again
+"""
+
+import argparse
+import math
+import os
+import re
+import shutil
+import sys
+import time
+
+import figure_index
+import png_optimize
+from figure_cache import PROJECT_ROOT, project_path, run_cached
+
+PRINT_DIR = os.path.join(PROJECT_ROOT, 'build', 'print')
+PRINT_DPI = 300
+RASTER_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Only resample when it removes a real share of the pixels
+MIN_REDUCTION = 0.9
+
+TEXT_WIDTH_CM = 16.6
+CM_PER_UNIT = {'cm': 1.0, 'mm': 0.1, 'in': 2.54, 'pt': 2.54 / 72.27, 'bp': 2.54 / 72,
+               '\\textwidth': TEXT_WIDTH_CM, '\\linewidth': TEXT_WIDTH_CM,
+               '\\columnwidth': TEXT_WIDTH_CM}
+WIDTH_PATTERN = re.compile(r'(?:^|,)\s*width\s*=\s*([0-9.]*)\s*(cm|mm|in|pt|bp|\\[a-z]+)\s*(?:,|$)')
+
+
+def width_inches(options):
+    """The width= of an \\includegraphics option list in inches, or None"""
+    match = WIDTH_PATTERN.search(options or '')
+    if not match or match.group(2) not in CM_PER_UNIT:
+        return None
+    factor = float(match.group(1)) if match.group(1) else 1.0
+    return factor * CM_PER_UNIT[match.group(2)] / 2.54
+
+
+def print_path(path):
+    """Where the print copy of a project file goes"""
+    return os.path.join(PRINT_DIR, project_path(path))
+
+
+def plan(dpi=PRINT_DPI, entries=None):
+    """
+    The rasters worth resampling.
+
+    Returns a list of {'path', 'target', 'size', 'pixels'} dicts, where
+    `pixels` is the width to resample to.
+    """
+    from PIL import Image
+
+    if entries is None:
+        entries = figure_index.index_figures(jobs=[])
+    uses = {}
+    for entry in entries:
+        path = entry['path']
+        if entry['exists'] and os.path.splitext(path)[1].lower() in RASTER_EXTENSIONS:
+            uses.setdefault(path, []).append(width_inches(entry.get('options')))
+
+    images = []
+    for path, widths in uses.items():
+        # One use at natural size keeps the full raster
+        if None in widths:
+            continue
+        width = max(widths)
+        with Image.open(path) as image:
+            size = image.size
+        pixels = math.ceil(width * dpi)
+        if pixels < size[0] * MIN_REDUCTION:
+            images.append({'path': path, 'target': print_path(path), 'size': size, 'pixels': pixels})
+    return images
+
+
+def resample(source, target, pixels, dpi):
+    """Write `source` scaled to `pixels` wide to `target`"""
+    from PIL import Image
+
+    with Image.open(source) as image:
+        fmt = image.format
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode == 'PA' else 'RGB')
+        height = max(1, round(image.height * pixels / image.width))
+        small = image.resize((pixels, height), Image.LANCZOS)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f'{target}.tmp-{os.getpid()}'
+    if fmt == 'JPEG':
+        small.convert('RGB').save(tmp, 'JPEG', quality=92, dpi=(dpi, dpi))
+    else:
+        # Lossless from here on: an exact palette or true colour, never quantized
+        small.save(tmp, 'PNG', dpi=(dpi, dpi))
+        png_optimize.optimize_file(tmp)
+    os.replace(tmp, target)
+
+
+def _prune(keep):
+    """Remove print copies no graphic needs any more, so pdflatex stops picking them up"""
+    keep = {os.path.normpath(path) for path in keep}
+    for root, _, files in os.walk(PRINT_DIR):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if path not in keep:
+                os.remove(path)
+
+
+def prepare(dpi=PRINT_DPI, verbose=True):
+    """
+    Bring build/print/ up to date.
+
+    Returns the planned images, each with a 'status': 'built' or 'cached'
+    when its print copy is used, 'kept' when the original is smaller, or
+    'failed'.
+    """
+    images = plan(dpi)
+    for image in images:
+        image['status'] = run_cached(
+            [__file__, image['path']], [image['target']],
+            lambda image=image: resample(image['path'], image['target'], image['pixels'], dpi),
+            {'print_width': image['pixels'], 'dpi': dpi})
+        if image['status'] != 'failed' and os.path.getsize(image['target']) >= os.path.getsize(image['path']):
+            image['status'] = 'kept'
+    used = [image for image in images if image['status'] in ('built', 'cached')]
+    _prune(image['target'] for image in used)
+    if verbose and images:
+        before = sum(os.path.getsize(image['path']) for image in used)
+        after = sum(os.path.getsize(image['target']) for image in used)
+        kept = len(images) - len(used)
+        print(f"🖨️  {len(used)} image(s) sized for print at {dpi} dpi: {before / 1024:.0f} KB → {after / 1024:.0f} KB"
+              + (f" ({kept} kept at full size, not smaller)" if kept else ""))
+    return images
+
+
+def clear():
+    """Drop every print copy, so the document embeds the original files"""
+    shutil.rmtree(PRINT_DIR, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Resample figures to their printed size')
+    parser.add_argument('--dpi', type=int, default=PRINT_DPI, help='Target resolution on the page')
+    parser.add_argument('--list', action='store_true', help='Only show what would be resampled')
+    parser.add_argument('--clear', action='store_true', help='Delete the print copies')
+    args = parser.parse_args(argv)
+
+    if args.clear:
+        clear()
+        print(f"🗑️  Removed {project_path(PRINT_DIR)}, the full-size images are used again")
+        return 0
+    if args.list:
+        for image in plan(args.dpi):
+            width, height = image['size']
+            print(f"   {project_path(image['path'])}: {width}x{height} → {image['pixels']} px wide")
+        return 0
+
+    started = time.perf_counter()
+    images = prepare(args.dpi)
+    if not images:
+        print(f"✅ Every raster already fits {args.dpi} dpi at its printed size")
+    print(f"⏱️  Done in {time.perf_counter() - started:.2f}s")
+    return 1 if any(image['status'] == 'failed' for image in images) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Stick Figures
+Draws UML actors as one cached compound Path
+
+The stick figure (head, body, arms and legs) is built once per set of
+proportions as a single Path in unit coordinates. draw_stick_figures()
+stamps it at every position, size and colour through one PathCollection, so
+a diagram adds one artist for all its actors instead of a circle and four
+lines each. The unit path also works as a scatter marker:
+    ax.scatter(xs, ys, marker=stick_figure_path(), s=900, facecolors='none', edgecolors='k')
+
+Proportions are fractions of `size`, relative to the anchor point:
+    head_y, head_r   head centre and radius
+    neck_y, hip_y    top and bottom of the body
+    arm_y, arm_w     height and half width of the arms
+    foot_dx, foot_y  where the legs end
+
+Usage:
+    from stick_figure import draw_stick_figures
+    draw_stick_figures(ax, [(1, 8), (1, 4)], size=0.3, linewidth=2)
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from matplotlib.collections import PathCollection
+from matplotlib.path import Path
+
+# create_actor_assets.py's figure, centred on the anchor
+DEFAULT_PROPORTIONS = {'head_y': 0.5, 'head_r': 0.2, 'neck_y': 0.3, 'hip_y': -0.3,
+                       'arm_y': 0.1, 'arm_w': 0.3, 'foot_dx': 0.2, 'foot_y': -0.7}
+
+
+@lru_cache(maxsize=None)
+def _unit_path(head_y, head_r, neck_y, hip_y, arm_y, arm_w, foot_dx, foot_y):
+    head = Path.circle((0, head_y), head_r)
+    strokes = [[(0, neck_y), (0, hip_y)],
+               [(-arm_w, arm_y), (arm_w, arm_y)],
+               [(-foot_dx, foot_y), (0, hip_y), (foot_dx, foot_y)]]
+    vertices = [head.vertices] + [np.array(stroke, float) for stroke in strokes]
+    codes = [head.codes] + [[Path.MOVETO] + [Path.LINETO] * (len(stroke) - 1) for stroke in strokes]
+    return Path(np.concatenate(vertices), np.concatenate(codes).astype(Path.code_type), readonly=True)
+
+
+def stick_figure_path(**proportions):
+    """The stick figure at size 1 around (0, 0), built once per proportions"""
+    return _unit_path(**{**DEFAULT_PROPORTIONS, **proportions})
+
+
+def stick_figure_collection(positions, size=1.0, color='black', linewidth=2, proportions=None, **kwargs):
+    """
+    One PathCollection with a stick figure at every position.
+
+    `size`, `color` and `linewidth` are one value for all figures or one per
+    figure; other keyword arguments go to PathCollection.
+    """
+    unit = stick_figure_path(**(proportions or {}))
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    sizes = np.broadcast_to(np.asarray(size, dtype=float), (len(positions),))
+    vertices = unit.vertices[None, :, :] * sizes[:, None, None] + positions[:, None, :]
+    paths = [Path(v, unit.codes, readonly=True) for v in vertices]
+    kwargs.setdefault('capstyle', 'projecting')
+    kwargs.setdefault('joinstyle', 'round')
+    return PathCollection(paths, facecolors='none', edgecolors=color, linewidths=linewidth, **kwargs)
+
+
+def draw_stick_figures(ax, positions, size=1.0, color='black', linewidth=2, proportions=None, **kwargs):
+    """Add stick figures at every position to `ax` as one artist and return it"""
+    collection = stick_figure_collection(positions, size, color, linewidth, proportions, **kwargs)
+    ax.add_collection(collection)
+    return collection
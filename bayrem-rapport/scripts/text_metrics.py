@@ -0,0 +1,154 @@
+"""
+Text Metrics
+Measures label widths once and remembers them
+
+Layout code needs the size of every label before anything is drawn. Asking a
+renderer (get_window_extent) forces a draw for each string; this module loads
+the font with FreeType instead and lays the string out unhinted at a fixed
+size. Unhinted widths scale linearly, so one measurement per string and font
+serves every font size.
+
+Widths are kept per font file (resolved once per family, weight and style)
+in memory and in .cache/text-metrics/, so a repeated lookup is two dict
+reads and later runs start warm. The disk cache is keyed by the font file and
+the matplotlib version and written by flush(): renderers call it after each
+figure (process pool workers skip atexit hooks), and it also runs at exit.
+
+Usage:
+    from text_metrics import text_width, text_size
+    text_width('Receive Notifications', 9)               # points
+    text_size('Two\\nlines', 10, weight='bold')           # (width, height) in points
+
+    python text_metrics.py --stats
+    python text_metrics.py --clear
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+import matplotlib
+from matplotlib.font_manager import FontProperties, findfont, get_font
+
+from figure_cache import CACHE_DIR
+
+try:
+    from matplotlib.ft2font import LoadFlags
+    NO_HINTING = LoadFlags.NO_HINTING
+except ImportError:  # matplotlib < 3.10
+    from matplotlib.ft2font import LOAD_NO_HINTING as NO_HINTING
+
+METRICS_DIR = os.path.join(CACHE_DIR, 'text-metrics')
+
+# Strings are laid out at this size; widths are stored per point of font size
+REFERENCE_SIZE = 100
+LINE_SPACING = 1.2
+
+_fonts = {}
+_tables = {}
+_dirty = set()
+
+
+def font_file(family=None, weight='normal', style='normal'):
+    """Font file matplotlib would use, resolved once per (family, weight, style)"""
+    key = (tuple(family) if isinstance(family, (list, tuple)) else family, weight, style)
+    path = _fonts.get(key)
+    if path is None:
+        path = _fonts[key] = findfont(FontProperties(family=family, weight=weight, style=style))
+    return path
+
+
+def _table_path(font):
+    stat = os.stat(font)
+    identity = f'{os.path.abspath(font)}:{stat.st_size}:{stat.st_mtime_ns}:{matplotlib.__version__}'
+    digest = hashlib.sha256(identity.encode()).hexdigest()[:16]
+    return os.path.join(METRICS_DIR, f'{os.path.basename(font)}-{digest}.json')
+
+
+def _table(font):
+    table = _tables.get(font)
+    if table is None:
+        try:
+            with open(_table_path(font), encoding='utf-8') as f:
+                table = json.load(f)
+        except (OSError, ValueError):
+            table = {}
+        _tables[font] = table
+    return table
+
+
+def _measure(font, text):
+    ft_font = get_font(font)
+    ft_font.set_size(REFERENCE_SIZE, 72)
+    ft_font.set_text(text, 0, flags=NO_HINTING)
+    width, _ = ft_font.get_width_height()
+    return width / 64 / REFERENCE_SIZE
+
+
+def text_width(text, size, family=None, weight='normal', style='normal'):
+    """Width of a single-line string in points"""
+    font = font_file(family, weight, style)
+    table = _table(font)
+    width = table.get(text)
+    if width is None:
+        width = table[text] = _measure(font, text)
+        _dirty.add(font)
+    return width * size
+
+
+def text_size(text, size, family=None, weight='normal', style='normal', line_spacing=LINE_SPACING):
+    """(width, height) in points of a possibly multi-line string"""
+    lines = text.split('\n')
+    width = max(text_width(line, size, family, weight, style) if line else 0.0 for line in lines)
+    return width, len(lines) * size * line_spacing
+
+
+@atexit.register
+def flush():
+    """Write the widths measured by this process to the disk cache"""
+    for font in list(_dirty):
+        path = _table_path(font)
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        # Merge with entries other processes stored meanwhile
+        try:
+            with open(path, encoding='utf-8') as f:
+                table = {**json.load(f), **_tables[font]}
+        except (OSError, ValueError):
+            table = _tables[font]
+        tmp = f'{path}.tmp-{os.getpid()}'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(table, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, path)
+        except OSError:
+            pass
+        _dirty.discard(font)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect the cached text metrics')
+    parser.add_argument('--stats', action='store_true', help='Show cached fonts and strings')
+    parser.add_argument('--clear', action='store_true', help='Delete the cached metrics')
+    args = parser.parse_args(argv)
+
+    if args.clear:
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        print(f"🗑️  Cleared {METRICS_DIR}")
+        return 0
+
+    names = sorted(os.listdir(METRICS_DIR)) if os.path.isdir(METRICS_DIR) else []
+    if not names:
+        print("📦 No text metrics cached yet")
+        return 0
+    for name in names:
+        with open(os.path.join(METRICS_DIR, name), encoding='utf-8') as f:
+            print(f"📦 {name}: {len(json.load(f))} strings")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
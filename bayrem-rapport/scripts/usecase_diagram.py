@@ -0,0 +1,397 @@
+"""
+Use Case Diagram Renderer
+Draws the report's use case diagrams from a JSON description
+
+Each figures/figure-2.x-*/usecase.json describes one diagram as data: the
+system boundary, the actors with their bus connections, the functional groups
+with their use cases, and the <<includes>> relations. Adding a diagram means
+adding a usecase.json, build_figures.py picks it up like any other job.
+
+Every shape goes into one PatchCollection, every connector (bus trunks,
+branches, include arrows) into one LineCollection and every connection point
+into one scatter, so the number of artists does not grow with the diagram;
+only the labels are separate Text artists.
+
+Spec keys (coordinates in diagram units, boxes are [x, y, width, height]):
+    title, outputs (relative to the spec), formats, figsize, limits [xmax, ymax], dpi
+    system     {label, box}
+    actors     [{name, box, bus {to_x, ...}, links {targets, route, linestyle, ...}}]
+    groups     [{title, box, anchor, cases [[label, x, y, width?], ...]}]
+    includes   [{from, to, path?, linewidth, label_at, rotation}]
+With "layout": {"columns": n}, groups only list their use case labels and
+usecase_layout.py computes every box, position and size.
+Link targets are group titles (their anchor point) or use case labels; the
+route is a connectors.py style (straight by default, elbow, curved, auto).
+"formats" (e.g. ["png", "pdf", "svg"]) adds vector siblings of the PNG
+outputs, see figure_export.py.
+
+Usage:
+    python usecase_diagram.py ../figures/figure-2.1-customer-usecase/usecase.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PatchCollection
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from matplotlib.patches import Ellipse, FancyBboxPatch
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+import usecase_layout
+from connectors import connector_paths
+from figure_cache import CACHE_DIR, file_digest, project_path, run_cached
+from figure_export import format_params, save_figure, with_formats
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# build_figures.py reads this tuple (without importing matplotlib) for its cache keys
+RENDERER_MODULES = ('usecase_diagram.py', 'usecase_layout.py', 'usecase_routing.py', 'connectors.py',
+                    'text_metrics.py', 'figure_export.py')
+
+PRIMARY = '#1976D2'
+ACTOR_FILL = '#E8F4FD'
+SYSTEM_FILL = '#F8F9FA'
+GROUP_FILL = '#FAFAFA'
+GROUP_EDGE = '#E0E0E0'
+GROUP_TITLE = '#555'
+USE_CASE_EDGE = '#424242'
+
+DEFAULT_USE_CASE_SIZE = (2.8, 0.6)
+DEFAULT_DPI = 300
+
+# --preview: whole canvas at screen resolution, chrome layers from the cache
+PREVIEW_DPI = 100
+LAYERS_DIR = os.path.join(CACHE_DIR, 'layers')
+MAX_CACHED_LAYERS = 32
+
+# Open '->' arrowhead of the include relations, in diagram units
+ARROW_LENGTH = 0.18
+ARROW_HALF_WIDTH = 0.09
+
+
+def load_spec(path):
+    with open(path, encoding='utf-8') as f:
+        spec = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    outputs = [os.path.normpath(os.path.join(base, p)) for p in spec.get('outputs', [])]
+    spec['outputs'] = with_formats(outputs, spec.get('formats'))
+    if spec.get('layout') is not None:
+        usecase_layout.apply_layout(spec)
+    return spec
+
+
+def cache_sources(spec_path):
+    """Files a diagram's cache key depends on: its spec and the renderer modules"""
+    return [spec_path] + [os.path.join(SCRIPT_DIR, name) for name in RENDERER_MODULES]
+
+
+def _box_center(box):
+    x, y, width, height = box
+    return x + width / 2, y + height / 2
+
+
+def _anchors(spec):
+    """Map group titles and use case labels to the point connectors attach to"""
+    anchors = {}
+    for group in spec['groups']:
+        for label, x, y, *_ in group['cases']:
+            anchors[label] = (x, y)
+    for group in spec['groups']:
+        if 'anchor' in group:
+            anchors[group['title']] = tuple(group['anchor'])
+        else:
+            points = np.array([case[1:3] for case in group['cases']])
+            anchors[group['title']] = tuple(points.mean(axis=0))
+    return anchors
+
+
+def _arrow_segments(start, end):
+    """Shaft and the two strokes of an open arrowhead pointing at `end`"""
+    start, end = np.asarray(start, float), np.asarray(end, float)
+    direction = end - start
+    direction /= np.hypot(*direction)
+    normal = np.array([-direction[1], direction[0]])
+    back = end - direction * ARROW_LENGTH
+    return [[start, end],
+            [back + normal * ARROW_HALF_WIDTH, end],
+            [back - normal * ARROW_HALF_WIDTH, end]]
+
+
+def build_shapes(spec):
+    """Every box and ellipse of the diagram, back to front"""
+    system = spec['system']
+    shapes = [FancyBboxPatch(system['box'][:2], *system['box'][2:], boxstyle="round,pad=0.2",
+                             facecolor=SYSTEM_FILL, edgecolor=PRIMARY, linewidth=3)]
+    for actor in spec['actors']:
+        shapes.append(FancyBboxPatch(actor['box'][:2], *actor['box'][2:], boxstyle="round,pad=0.1",
+                                     facecolor=ACTOR_FILL, edgecolor=PRIMARY, linewidth=3))
+    for group in spec['groups']:
+        shapes.append(FancyBboxPatch(group['box'][:2], *group['box'][2:], boxstyle="round,pad=0.15",
+                                     facecolor=GROUP_FILL, edgecolor=GROUP_EDGE, linewidth=1))
+    width, height = spec.get('use_case_size', DEFAULT_USE_CASE_SIZE)
+    for group in spec['groups']:
+        for _, x, y, *case_width in group['cases']:
+            shapes.append(Ellipse((x, y), case_width[0] if case_width else width, height, facecolor='white',
+                                  edgecolor=USE_CASE_EDGE, linewidth=1.5))
+    return shapes
+
+
+def build_connectors(spec):
+    """
+    Line segments and connection points of the diagram.
+
+    Returns (lines, points): lines has 'segments', 'colors', 'linewidths' and
+    'linestyles' lists for one LineCollection, points has 'offsets', 'sizes'
+    and 'colors' for one scatter.
+    """
+    anchors = _anchors(spec)
+    lines = {'segments': [], 'colors': [], 'linewidths': [], 'linestyles': []}
+    points = {'offsets': [], 'sizes': [], 'colors': []}
+
+    def add_line(segment, color, linewidth, linestyle='solid'):
+        lines['segments'].append(segment)
+        lines['colors'].append(color)
+        lines['linewidths'].append(linewidth)
+        lines['linestyles'].append(linestyle)
+
+    for actor in spec['actors']:
+        x, y, width, height = actor['box']
+        bus_y = y + height / 2
+        bus = actor.get('bus')
+        start = (x + width, bus_y)
+        if bus and 'paths' in bus:
+            for path in bus['paths']:
+                add_line(path, to_rgba('k', bus.get('alpha', 1)), bus.get('linewidth', 2))
+        elif bus:
+            add_line([start, (bus['to_x'], bus_y)], to_rgba('k', bus.get('alpha', 1)), bus.get('linewidth', 2))
+            start = (bus['to_x'], bus_y)
+        links = actor.get('links', {})
+        color = to_rgba('k', links.get('alpha', 1))
+        targets = links.get('targets', [])
+        for target in targets:
+            if target not in anchors:
+                raise ValueError(f"{actor['name']}: unknown link target '{target}'")
+        if 'paths' in links:
+            # Routed by usecase_routing.route_buses()
+            paths, ends = links['paths'], links['ends']
+        else:
+            ends = [anchors[target] for target in targets]
+            paths = connector_paths([start] * len(ends), ends, links.get('route', 'straight'), links.get('curve', 0.3))
+        for path, end in zip(paths, ends):
+            add_line(path, color, links.get('linewidth', 1.5), links.get('linestyle', 'dashed'))
+            points['offsets'].append(end)
+            points['sizes'].append(links.get('marker_size', 4) ** 2)
+            points['colors'].append(color)
+
+    for relation in spec.get('includes', []):
+        for name in (relation['from'], relation['to']):
+            if name not in anchors:
+                raise ValueError(f"includes: unknown use case '{name}'")
+        if 'path' in relation:
+            # Routed by usecase_routing.route_includes(): the path, then the head on its last leg
+            path = relation['path']
+            add_line(path, to_rgba(PRIMARY), relation.get('linewidth', 1.5))
+            segments = _arrow_segments(path[-2], path[-1])[1:]
+        else:
+            segments = _arrow_segments(anchors[relation['from']], anchors[relation['to']])
+        for segment in segments:
+            add_line(segment, to_rgba(PRIMARY), relation.get('linewidth', 1.5))
+    return lines, points
+
+
+def build_figure(spec, subplotpars=None):
+    """
+    Draw a diagram spec onto a new Figure.
+
+    Returns (fig, layers): 'boxes' and 'titles' are the chrome that rarely
+    changes between revisions (system boundary, actor and group frames, their
+    titles), 'content' the use cases, connectors and their labels. Given
+    `subplotpars` from an earlier tight_layout(), the layout is not measured
+    again.
+    """
+    fig = Figure(figsize=tuple(spec.get('figsize', (16, 10))))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    shapes = build_shapes(spec)
+    frames = 1 + len(spec['actors']) + len(spec['groups'])
+    boxes = ax.add_collection(PatchCollection(shapes[:frames], match_original=True, zorder=1))
+    content = [ax.add_collection(PatchCollection(shapes[frames:], match_original=True, zorder=1))]
+
+    lines, points = build_connectors(spec)
+    content.append(ax.add_collection(LineCollection(lines['segments'], colors=lines['colors'],
+                                                    linewidths=lines['linewidths'],
+                                                    linestyles=lines['linestyles'], zorder=2)))
+    if points['offsets']:
+        content.append(ax.scatter(*np.transpose(points['offsets']), s=points['sizes'], c=points['colors'],
+                                  linewidths=0, zorder=2))
+
+    titles = []
+    system = spec['system']
+    x, y, width, height = system['box']
+    titles.append(ax.text(x + width / 2, y + height - 0.5, system['label'], ha='center', va='center',
+                          fontsize=14, weight='bold', color=PRIMARY))
+    for actor in spec['actors']:
+        titles.append(ax.text(*_box_center(actor['box']), actor['name'], ha='center', va='center',
+                              fontsize=12, weight='bold'))
+    for group in spec['groups']:
+        x, y, width, height = group['box']
+        titles.append(ax.text(x + width / 2, y + height - 0.3, group['title'], ha='center', va='center',
+                              fontsize=10, weight='bold', color=GROUP_TITLE, style='italic'))
+        for label, cx, cy, *_ in group['cases']:
+            content.append(ax.text(cx, cy, label, ha='center', va='center', fontsize=9))
+    for relation in spec.get('includes', []):
+        if 'label_at' in relation:
+            content.append(ax.text(*relation['label_at'], '<<includes>>', fontsize=8, color=PRIMARY,
+                                   rotation=relation.get('rotation', 0)))
+
+    xmax, ymax = spec['limits']
+    ax.set_xlim(0, xmax)
+    ax.set_ylim(0, ymax)
+    ax.set_aspect('equal')
+    ax.axis('off')
+    titles.append(ax.set_title(spec['title'], fontsize=16, weight='bold', pad=20))
+    if subplotpars:
+        fig.subplots_adjust(**subplotpars)
+    else:
+        fig.tight_layout()
+    return fig, {'boxes': [boxes], 'content': content, 'titles': titles}
+
+
+def render(spec, outputs=None):
+    """Draw a diagram spec and save it to every output path"""
+    outputs = outputs or spec['outputs']
+    for a, b in usecase_layout.find_overlaps(usecase_layout.layout_boxes(spec)):
+        print(f"⚠️  {spec['title'].splitlines()[0]}: '{a}' overlaps '{b}'")
+    fig, _ = build_figure(spec)
+    return save_figure(fig, outputs, dpi=spec.get('dpi', DEFAULT_DPI), bbox_inches='tight',
+                       facecolor='white', edgecolor='none')
+
+
+def chrome_key(spec, dpi):
+    """Digest of everything the chrome layers and the layout depend on"""
+    chrome = {
+        'title': spec['title'],
+        'figsize': spec.get('figsize'),
+        'limits': spec['limits'],
+        'system': spec['system'],
+        'actors': [[actor['name'], actor['box']] for actor in spec['actors']],
+        'groups': [[group['title'], group['box']] for group in spec['groups']],
+        'dpi': dpi,
+    }
+    digest = hashlib.sha256(json.dumps(chrome, sort_keys=True).encode())
+    for name in RENDERER_MODULES:
+        digest.update(file_digest(os.path.join(SCRIPT_DIR, name)).encode())
+    return digest.hexdigest()
+
+
+def _draw_layer(fig, layers, name):
+    """RGBA pixels of one layer; the white figure background belongs to the boxes"""
+    for layer, artists in layers.items():
+        for artist in artists:
+            artist.set_visible(layer == name)
+    fig.patch.set_visible(name == 'boxes')
+    fig.canvas.draw()
+    return Image.fromarray(np.array(fig.canvas.buffer_rgba()))
+
+
+def _store_layers(path, boxes, titles, subplotpars):
+    os.makedirs(LAYERS_DIR, exist_ok=True)
+    tmp = f'{path}.tmp-{os.getpid()}'
+    # One image holding both layers side by side, the layout in a text chunk
+    sheet = Image.new('RGBA', (boxes.width * 2, boxes.height))
+    sheet.paste(boxes, (0, 0))
+    sheet.paste(titles, (boxes.width, 0))
+    info = PngInfo()
+    info.add_text('subplotpars', json.dumps(subplotpars))
+    sheet.save(tmp, format='png', compress_level=1, pnginfo=info)
+    os.replace(tmp, path)
+    entries = sorted((entry for entry in os.scandir(LAYERS_DIR) if entry.name.endswith('.png')),
+                     key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[MAX_CACHED_LAYERS:]:
+        os.unlink(entry.path)
+
+
+def _load_layers(path):
+    try:
+        with Image.open(path) as sheet:
+            sheet.load()
+        subplotpars = json.loads(sheet.text['subplotpars'])
+    except (OSError, ValueError, KeyError):
+        return None
+    width = sheet.width // 2
+    return sheet.crop((0, 0, width, sheet.height)), sheet.crop((width, 0, 2 * width, sheet.height)), subplotpars
+
+
+def preview(spec, output, dpi=PREVIEW_DPI):
+    """
+    Quick PNG of the whole canvas for iterative edits.
+
+    The boxes and titles are drawn once per chrome and kept in .cache/layers/
+    with the tight layout; each preview draws only the content and stacks it
+    between them (boxes below, titles above), the order a full render draws
+    them in. Content stays inside the diagram limits, so it does not move the
+    layout.
+    """
+    path = os.path.join(LAYERS_DIR, f'{chrome_key(spec, dpi)}.png')
+    chrome = _load_layers(path)
+    if chrome is None:
+        fig, layers = build_figure(spec)
+        fig.set_dpi(dpi)
+        boxes, titles = _draw_layer(fig, layers, 'boxes'), _draw_layer(fig, layers, 'titles')
+        subplotpars = {name: getattr(fig.subplotpars, name) for name in ('left', 'right', 'bottom', 'top')}
+        _store_layers(path, boxes, titles, subplotpars)
+    else:
+        boxes, titles, subplotpars = chrome
+        fig, layers = build_figure(spec, subplotpars)
+        fig.set_dpi(dpi)
+    image = Image.alpha_composite(Image.alpha_composite(boxes, _draw_layer(fig, layers, 'content')), titles)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    image.convert('RGB').save(output, format='png', compress_level=1)
+    return output
+
+
+def preview_file(spec_path, output, dpi=PREVIEW_DPI):
+    return preview(load_spec(spec_path), output, dpi)
+
+
+def render_file(spec_path, outputs=None):
+    return render(load_spec(spec_path), outputs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render use case diagrams from usecase.json specs')
+    parser.add_argument('specs', nargs='+', help='usecase.json files')
+    parser.add_argument('--preview', metavar='PNG', help='Only write a quick preview of one spec to PNG')
+    parser.add_argument('--dpi', type=int, default=PREVIEW_DPI, help='Preview resolution')
+    args = parser.parse_args(argv)
+
+    if args.preview:
+        if len(args.specs) != 1:
+            parser.error('--preview takes exactly one spec')
+        print(f"👀 Preview: {preview_file(args.specs[0], args.preview, args.dpi)}")
+        return 0
+
+    failed = False
+    for spec_path in args.specs:
+        spec = load_spec(spec_path)
+        outputs = spec['outputs']
+        status = run_cached(cache_sources(spec_path), outputs, lambda: render(spec),
+                            format_params(spec.get('formats')))
+        if status == 'built':
+            for output in outputs:
+                print(f"✅ Generated: {project_path(output)}")
+        elif status == 'failed':
+            print(f"❌ {project_path(spec_path)}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
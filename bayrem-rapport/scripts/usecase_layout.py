@@ -0,0 +1,281 @@
+"""
+Use Case Layout
+Places groups, use cases and actors of a usecase.json automatically
+
+A spec with a "layout" entry only lists the content: each group's title and
+its use case labels, the actors and their links. This module fills in every
+coordinate the renderer needs:
+- use case ellipses are sized from the width of their label (text_metrics.py)
+- groups stack their use cases and are packed into a grid of `columns`
+  (rows are as tall as their tallest group, columns as wide as their widest)
+- the system boundary wraps the grid, actors are spread along its left side
+- limits and figure size follow from the result
+With "order": "barycenter" (or "median") groups, actors and use cases are
+first reordered to reduce link crossings (each candidate order is laid out
+and its drawn crossings counted), and "routing": "bus" draws links as an
+orthogonal serial bus; both are done by usecase_routing.py.
+
+The system boundary grows to fit the actors when they need more room than
+the groups, so neither can overlap by construction; find_overlaps() double
+checks it (and hand-placed specs) with a sweep line over the bounding boxes
+that looks up the boxes sharing a y range in segment trees, O(n log n +
+overlaps).
+
+Usage:
+    python usecase_layout.py ../figures/figure-2.1-customer-usecase/usecase.json
+"""
+
+import copy
+import heapq
+import json
+import math
+import sys
+import time
+
+import usecase_diagram
+import usecase_routing
+from text_metrics import text_width
+
+# Diagram units are about 54pt at the figure size computed below
+POINTS_PER_UNIT = 54
+INCHES_PER_UNIT = POINTS_PER_UNIT / 72
+
+CASE_FONT_SIZE = 9
+GROUP_FONT_SIZE = 10
+CASE_HEIGHT = 0.6
+CASE_GAP = 0.25
+# An ellipse fits a label of width w when it is about sqrt(2) * w wide
+CASE_WIDTH_FACTOR = math.sqrt(2)
+MIN_CASE_WIDTH = 1.6
+GROUP_PAD = 0.35
+GROUP_TITLE_BAND = 0.6
+GROUP_GAP = 0.8
+# With "routing": "bus" a column gutter also holds an <<includes>> lane and its label
+BUS_GUTTER_EXTRA = 0.5
+SYSTEM_PAD = 0.8
+SYSTEM_TITLE_BAND = 1.0
+ACTOR_SIZE = (2.5, 1.2)
+ACTOR_GAP = 1.5
+# Free space between two stacked actors
+ACTOR_SPACING = 0.4
+MARGIN = 1.0
+
+# Padding of the FancyBboxPatch boxes drawn around groups and actors
+GROUP_BOX_PAD = 0.15
+ACTOR_BOX_PAD = 0.1
+# Boxes that only touch do not overlap
+EPSILON = 1e-6
+
+def case_width(label):
+    width = text_width(label, CASE_FONT_SIZE) / POINTS_PER_UNIT * CASE_WIDTH_FACTOR
+    return max(MIN_CASE_WIDTH, round(width + 0.3, 2))
+
+
+def _group_size(group):
+    widths = [case_width(label) for label in group['cases']]
+    title = text_width(group['title'], GROUP_FONT_SIZE, weight='bold', style='italic') / POINTS_PER_UNIT
+    count = len(group['cases'])
+    width = max(max(widths, default=0), title + 0.4) + 2 * GROUP_PAD
+    height = GROUP_TITLE_BAND + count * CASE_HEIGHT + max(count - 1, 0) * CASE_GAP + GROUP_PAD
+    return widths, width, height
+
+
+def _crossings_in_order(spec):
+    """count_crossings() of a copy of the spec laid out in its current order"""
+    trial = copy.deepcopy(spec)
+    trial['layout'] = {**trial['layout'], 'order': None}
+    return usecase_routing.count_crossings(apply_layout(trial))
+
+
+def apply_layout(spec):
+    """Fill in boxes, positions, limits and figsize of a layout spec (in place)"""
+    groups = spec['groups']
+    columns = min(spec['layout'].get('columns') or math.ceil(math.sqrt(len(groups))), len(groups))
+    if spec['layout'].get('order'):
+        usecase_routing.best_order(spec, _crossings_in_order, spec['layout']['order'], columns)
+    sizes = [_group_size(group) for group in groups]
+    rows = [list(range(start, min(start + columns, len(groups)))) for start in range(0, len(groups), columns)]
+    column_widths = [max(sizes[i][1] for row in rows for i in row[c:c + 1]) for c in range(columns)]
+    row_heights = [max(sizes[i][2] for i in row) for row in rows]
+
+    bus = spec['layout'].get('routing') == 'bus'
+    column_gap = GROUP_GAP + (BUS_GUTTER_EXTRA if bus else 0)
+    # The bus channels above the first row run below the system title, not through it
+    title_band = SYSTEM_TITLE_BAND + (usecase_routing.channel_band(len(spec['actors'])) if bus else 0)
+    system_width = sum(column_widths) + (columns - 1) * column_gap + 2 * SYSTEM_PAD
+    system_height = sum(row_heights) + (len(rows) - 1) * GROUP_GAP + SYSTEM_PAD + title_band
+    # Actors are spread over the height at system_height / (n + 1) intervals
+    actor_pitch = ACTOR_SIZE[1] + 2 * ACTOR_BOX_PAD + ACTOR_SPACING
+    system_height = max(system_height, (len(spec['actors']) + 1) * actor_pitch)
+    system_x = MARGIN + ACTOR_SIZE[0] + ACTOR_GAP
+    system_y = MARGIN
+    spec['system']['box'] = [system_x, system_y, round(system_width, 3), round(system_height, 3)]
+
+    top = system_y + system_height - title_band
+    for row, row_height in zip(rows, row_heights):
+        left = system_x + SYSTEM_PAD
+        for column, index in enumerate(row):
+            widths, width, height = sizes[index]
+            group = groups[index]
+            x = left + (column_widths[column] - width) / 2
+            y = top - height
+            center = x + width / 2
+            group['box'] = [round(x, 3), round(y, 3), round(width, 3), round(height, 3)]
+            case_y = y + height - GROUP_TITLE_BAND - CASE_HEIGHT / 2
+            cases = []
+            for label, case_w in zip(group['cases'], widths):
+                cases.append([label, round(center, 3), round(case_y, 3), case_w])
+                case_y -= CASE_HEIGHT + CASE_GAP
+            group['cases'] = cases
+            group.setdefault('anchor', [round(center, 3), round(y + height / 2, 3)])
+            left += column_widths[column] + column_gap
+        top -= row_height + GROUP_GAP
+
+    actors = spec['actors']
+    for k, actor in enumerate(actors):
+        center_y = system_y + system_height * (len(actors) - k) / (len(actors) + 1)
+        actor['box'] = [MARGIN, round(center_y - ACTOR_SIZE[1] / 2, 3), *ACTOR_SIZE]
+        actor.setdefault('bus', {}).setdefault('to_x', system_x)
+
+    if bus:
+        # Also routes the includes and places their labels
+        usecase_routing.route_buses(spec)
+
+    positions = {case[0]: case[1:3] for group in groups for case in group['cases']}
+    for relation in spec.get('includes', []):
+        if 'label_at' not in relation and relation['from'] in positions and relation['to'] in positions:
+            (x1, y1), (x2, y2) = positions[relation['from']], positions[relation['to']]
+            relation['label_at'] = [round((x1 + x2) / 2 + 0.15, 3), round((y1 + y2) / 2 + 0.15, 3)]
+
+    xmax = system_x + system_width + MARGIN
+    ymax = system_y + system_height + MARGIN
+    spec['limits'] = [round(xmax, 3), round(ymax, 3)]
+    spec.setdefault('figsize', [round(xmax * INCHES_PER_UNIT, 2), round(ymax * INCHES_PER_UNIT + 1, 2)])
+    spec.setdefault('use_case_size', [MIN_CASE_WIDTH, CASE_HEIGHT])
+
+    overlaps = find_overlaps(layout_boxes(spec))
+    if overlaps:
+        raise ValueError('layout produced overlaps: ' + ', '.join(f'{a} / {b}' for a, b in overlaps))
+    return spec
+
+
+def layout_boxes(spec):
+    """(name, x0, y0, x1, y1) for every actor and group box and use case ellipse"""
+    default_width, height = spec.get('use_case_size', usecase_diagram.DEFAULT_USE_CASE_SIZE)
+    boxes = []
+    for actor in spec['actors']:
+        x, y, width, h = actor['box']
+        pad = ACTOR_BOX_PAD
+        boxes.append((f"actor '{actor['name']}'", x - pad, y - pad, x + width + pad, y + h + pad))
+    for group in spec['groups']:
+        x, y, width, h = group['box']
+        pad = GROUP_BOX_PAD
+        boxes.append((f"group '{group['title']}'", x - pad, y - pad, x + width + pad, y + h + pad))
+    for group in spec['groups']:
+        for case in group['cases']:
+            label, x, y = case[:3]
+            width = case[3] if len(case) > 3 else default_width
+            boxes.append((label, x - width / 2, y - height / 2, x + width / 2, y + height / 2))
+    return boxes
+
+
+def find_overlaps(boxes):
+    """
+    Pairs of overlapping boxes, ignoring a box nested inside another (a use
+    case inside its group).
+
+    Sweeps over x: boxes enter sorted by left edge and leave through a heap
+    keyed by right edge. The boxes the sweep line crosses are indexed by y in
+    two segment trees over the sorted y coordinates. One holds each box on
+    the O(log n) nodes that cover its y range, so the boxes containing a
+    given y lie on one root-to-leaf path. The other holds each box at its
+    bottom edge and counts boxes per node, so the boxes starting inside a y
+    range are found by descending into non-empty nodes only. A new box
+    overlaps the active boxes that contain its bottom edge or start below its
+    top edge, which makes the sweep O(n log n + overlaps) whatever the shape
+    of the layout.
+    """
+    def inside(a, b):
+        return (b[1] <= a[1] + EPSILON and b[2] <= a[2] + EPSILON
+                and a[3] <= b[3] + EPSILON and a[4] <= b[4] + EPSILON)
+
+    ys = sorted({y for box in boxes for y in (box[2], box[4])})
+    slot = {y: i for i, y in enumerate(ys)}
+    size = 1
+    while size < len(ys):
+        size *= 2
+    covering = [set() for _ in range(2 * size)]
+    starting = [set() for _ in range(2 * size)]
+    counts = [0] * (2 * size)
+
+    def cover(index, add):
+        # Slot i is the y range [ys[i], ys[i + 1]); a box covers its slots [y0, y1)
+        low, high = slot[boxes[index][2]] + size, slot[boxes[index][4]] + size
+        while low < high:
+            if low & 1:
+                (covering[low].add if add else covering[low].discard)(index)
+                low += 1
+            if high & 1:
+                high -= 1
+                (covering[high].add if add else covering[high].discard)(index)
+            low, high = low // 2, high // 2
+        node = slot[boxes[index][2]] + size
+        (starting[node].add if add else starting[node].discard)(index)
+        while node:
+            counts[node] += 1 if add else -1
+            node //= 2
+
+    def candidates(box):
+        node = slot[box[2]] + size
+        while node:
+            yield from covering[node]
+            node //= 2
+        # Boxes starting strictly between this box's bottom and top edges
+        low, high = slot[box[2]] + 1, slot[box[4]]
+        stack = [(1, 0, size)]
+        while stack:
+            node, first, last = stack.pop()
+            if counts[node] == 0 or last <= low or high <= first:
+                continue
+            if node >= size:
+                yield from starting[node]
+                continue
+            middle = (first + last) // 2
+            stack += [(2 * node, first, middle), (2 * node + 1, middle, last)]
+
+    overlaps = []
+    active = []
+    for index in sorted(range(len(boxes)), key=lambda i: boxes[i][1]):
+        box = boxes[index]
+        while active and active[0][0] <= box[1] + EPSILON:
+            cover(heapq.heappop(active)[1], False)
+        for other in sorted(set(candidates(box))):
+            other = boxes[other]
+            if (other[2] < box[4] - EPSILON and box[2] < other[4] - EPSILON
+                    and not inside(box, other) and not inside(other, box)):
+                overlaps.append((other[0], box[0]))
+        heapq.heappush(active, (box[3], index))
+        cover(index, True)
+    return overlaps
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("Usage: python usecase_layout.py usecase.json")
+        return 2
+    with open(argv[0], encoding='utf-8') as f:
+        spec = json.load(f)
+    started = time.perf_counter()
+    if spec.get('layout') is not None:
+        apply_layout(spec)
+    overlaps = find_overlaps(layout_boxes(spec))
+    cases = sum(len(group['cases']) for group in spec['groups'])
+    print(f"📐 {len(spec['groups'])} groups, {cases} use cases in {(time.perf_counter() - started) * 1000:.1f}ms")
+    for a, b in overlaps:
+        print(f"⚠️  Overlap: {a} / {b}")
+    return 1 if overlaps else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
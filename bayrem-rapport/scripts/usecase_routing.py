@@ -0,0 +1,515 @@
+"""
+Use Case Routing
+Orders actors, groups and use cases to reduce crossings, then routes links
+as an orthogonal serial bus
+
+Both steps work on layout specs (see usecase_layout.py):
+- order_nodes() runs barycenter (or median) sweeps: each group moves to the
+  average rank of the actors that link to it, then each actor to the average
+  position of its groups, and use cases inside a group follow the actors
+  that link to them. Nodes without links keep their place. Groups joined by
+  an <<includes>> relation move as one block and are kept in one row of the
+  grid, next to each other.
+- best_order() does not trust a single sweep: it lays out the spec order and
+  several sweep results, keeps the one count_crossings() scores lowest and
+  improves it by swapping groups, actors or use cases while that helps.
+- route_buses() gives every actor a vertical trunk lane between the actors
+  and the system boundary. Links leave the trunk along the gutter above the
+  target's row, then drop onto the group box, or run down the gutter left of
+  the group into a use case. <<includes>> arrows run along the column gutter
+  right of their use case (and the gutter above a row when the groups are
+  further apart), so they never cut through other use cases.
+
+count_crossings() measures the drawn result: pairs of connector segments
+that cross, and connectors that run through a use case they do not end at.
+It compares every pair of segments, which is instant at the size of these
+diagrams (a few dozen links).
+
+Usage:
+    python usecase_routing.py ../figures/figure-2.1-customer-usecase/usecase.json
+"""
+
+import json
+import statistics
+import sys
+
+import usecase_diagram
+import usecase_layout
+
+TOP_CHANNEL_OFFSET = 0.3
+LANE_SPACING = 0.2
+CHANNEL_SPACING = 0.15
+DROP_SPACING = 0.12
+GUTTER_OFFSET = 0.25
+# <<includes>> arrows: distance from the group box, and label placement
+INCLUDE_OFFSET = 0.15
+INCLUDE_LABEL_OFFSET = 0.06
+INCLUDE_LABEL_WIDTH = 0.9
+EPSILON = 1e-9
+
+ORDER_METHODS = ('barycenter', 'median')
+# Layouts best_order() may score per diagram (about 10ms each)
+ORDER_TRIALS = 80
+
+
+def _case_owner(spec):
+    """Group title of every use case label"""
+    return {case if isinstance(case, str) else case[0]: group['title']
+            for group in spec['groups'] for case in group['cases']}
+
+
+def _edges(spec):
+    """(actor name, group title, use case label or None) for every link"""
+    owner = _case_owner(spec)
+    titles = {group['title'] for group in spec['groups']}
+    edges = []
+    for actor in spec['actors']:
+        for target in actor.get('links', {}).get('targets', []):
+            if target in titles:
+                edges.append((actor['name'], target, None))
+            elif target in owner:
+                edges.append((actor['name'], owner[target], target))
+            else:
+                raise ValueError(f"{actor['name']}: unknown link target '{target}'")
+    return edges
+
+
+def _aggregate(values, method):
+    return statistics.median(values) if method == 'median' else sum(values) / len(values)
+
+
+def _include_blocks(spec):
+    """Group titles joined by <<includes>> relations, as lists in spec order (union-find)"""
+    owner = _case_owner(spec)
+    parent = {group['title']: group['title'] for group in spec['groups']}
+
+    def find(title):
+        while parent[title] != title:
+            parent[title] = parent[parent[title]]
+            title = parent[title]
+        return title
+
+    for relation in spec.get('includes', []):
+        if relation['from'] in owner and relation['to'] in owner:
+            parent[find(owner[relation['from']])] = find(owner[relation['to']])
+    blocks = {}
+    for group in spec['groups']:
+        blocks.setdefault(find(group['title']), []).append(group['title'])
+    return list(blocks.values())
+
+
+def _pack_rows(blocks, columns):
+    """
+    Flatten ordered blocks so that none is split over two rows of `columns`.
+
+    A block that does not fit in what is left of a row lets the next block
+    that does fit go first; blocks wider than a row are left as they are.
+    """
+    order, left = [], columns
+    pending = list(blocks)
+    while pending:
+        block = pending[0]
+        if columns and left < len(block) <= columns:
+            filler = next((b for b in pending[1:] if len(b) <= left), None)
+            if filler is not None:
+                pending.remove(filler)
+                order.extend(filler)
+                left = (left - len(filler)) % columns or columns
+                continue
+        pending.pop(0)
+        order.extend(block)
+        if columns:
+            left = (left - len(block)) % columns or columns
+    return order
+
+
+def order_nodes(spec, method='barycenter', sweeps=2, columns=None):
+    """
+    Reorder spec['groups'], spec['actors'] and each group's cases (in place).
+
+    With `columns` (the width of the layout grid), groups joined by an
+    <<includes>> relation also end up in the same row.
+    """
+    if method not in ORDER_METHODS:
+        raise ValueError(f"unknown order method '{method}', expected one of {', '.join(ORDER_METHODS)}")
+    edges = _edges(spec)
+    actors, groups = spec['actors'], spec['groups']
+    blocks = _include_blocks(spec)
+
+    def neutral(index, count, scale):
+        # Unlinked nodes keep their relative position on the other layer's scale
+        return index / max(count - 1, 1) * max(scale - 1, 0)
+
+    def sort_groups():
+        rank = {actor['name']: i for i, actor in enumerate(actors)}
+        ranks = {}
+        for actor, group, _ in edges:
+            ranks.setdefault(group, []).append(rank[actor])
+        keys = {group['title']: _aggregate(ranks[group['title']], method) if group['title'] in ranks
+                else neutral(i, len(groups), len(actors)) for i, group in enumerate(groups)}
+        # A block sits at the average key of its groups, which keep their order inside it
+        ordered = sorted((sorted(block, key=keys.get) for block in blocks),
+                         key=lambda block: sum(keys[title] for title in block) / len(block))
+        position = {title: i for i, title in enumerate(_pack_rows(ordered, columns))}
+        groups.sort(key=lambda group: position[group['title']])
+        return rank, keys
+
+    for _ in range(sweeps):
+        sort_groups()
+        position = {group['title']: i for i, group in enumerate(groups)}
+        targets = {}
+        for actor, group, _ in edges:
+            targets.setdefault(actor, []).append(position[group])
+        keys = {actor['name']: _aggregate(targets[actor['name']], method) if actor['name'] in targets
+                else neutral(i, len(actors), len(groups)) for i, actor in enumerate(actors)}
+        actors.sort(key=lambda actor: keys[actor['name']])
+    rank, group_keys = sort_groups()
+
+    case_ranks = {}
+    for actor, _, case in edges:
+        if case is not None:
+            case_ranks.setdefault(case, []).append(rank[actor])
+    for group in groups:
+        group['cases'].sort(key=lambda case: _aggregate(case_ranks[case], method) if case in case_ranks
+                            else group_keys[group['title']])
+    return spec
+
+
+def _snapshot(spec):
+    """The order of groups, actors and each group's cases, as plain lists"""
+    return (tuple(group['title'] for group in spec['groups']),
+            tuple(actor['name'] for actor in spec['actors']),
+            tuple(tuple(case if isinstance(case, str) else case[0] for case in group['cases'])
+                  for group in spec['groups']))
+
+
+def _restore(spec, order):
+    """Put groups, actors and cases back in a _snapshot() order (in place)"""
+    titles, names, cases = order
+    groups = {group['title']: group for group in spec['groups']}
+    spec['groups'][:] = [groups[title] for title in titles]
+    position = {name: i for i, name in enumerate(names)}
+    spec['actors'].sort(key=lambda actor: position[actor['name']])
+    for group, labels in zip(spec['groups'], cases):
+        rank = {label: i for i, label in enumerate(labels)}
+        group['cases'].sort(key=lambda case: rank[case if isinstance(case, str) else case[0]])
+
+
+def _keeps_blocks(titles, blocks, columns):
+    """True when every <<includes>> block sits in one row, its groups side by side"""
+    index = {title: i for i, title in enumerate(titles)}
+    for block in blocks:
+        places = sorted(index[title] for title in block)
+        if places[-1] - places[0] != len(places) - 1:
+            return False
+        if columns and len(block) <= columns and places[0] // columns != places[-1] // columns:
+            return False
+    return True
+
+
+def _moves(order, blocks, columns):
+    """Orders one swap away: two groups, two neighbouring actors or two neighbouring cases"""
+    titles, names, cases = order
+    for i in range(len(titles)):
+        for j in range(i + 1, len(titles)):
+            swapped = list(titles)
+            swapped[i], swapped[j] = swapped[j], swapped[i]
+            if _keeps_blocks(swapped, blocks, columns):
+                # Cases travel with their group
+                moved = list(cases)
+                moved[i], moved[j] = moved[j], moved[i]
+                yield tuple(swapped), names, tuple(moved)
+    for i in range(len(names) - 1):
+        yield titles, names[:i] + (names[i + 1], names[i]) + names[i + 2:], cases
+    for g, labels in enumerate(cases):
+        for i in range(len(labels) - 1):
+            swapped = labels[:i] + (labels[i + 1], labels[i]) + labels[i + 2:]
+            yield titles, names, cases[:g] + (swapped,) + cases[g + 1:]
+
+
+def best_order(spec, score, method='barycenter', columns=None, trials=ORDER_TRIALS):
+    """
+    Reorder the spec (in place) to the candidate order with the lowest score.
+
+    `score(spec)` lays out a copy of the spec in its current order and
+    returns count_crossings() of the result. Candidates are the spec order
+    and order_nodes() after 1 to 3 sweeps of both methods; the best one is
+    then improved by single swaps (see _moves) while that lowers the score,
+    within `trials` layouts in all. Ties keep the earlier candidate, so the
+    spec order wins when ordering does not help.
+    """
+    if method not in ORDER_METHODS:
+        raise ValueError(f"unknown order method '{method}', expected one of {', '.join(ORDER_METHODS)}")
+    blocks = _include_blocks(spec)
+    start = _snapshot(spec)
+    candidates = [start] if _keeps_blocks(start[0], blocks, columns) else []
+    for name in (method,) + tuple(m for m in ORDER_METHODS if m != method):
+        for sweeps in (1, 2, 3):
+            _restore(spec, start)
+            order_nodes(spec, name, sweeps, columns)
+            candidates.append(_snapshot(spec))
+
+    scores = {}
+
+    def evaluate(order):
+        if order not in scores:
+            _restore(spec, order)
+            crossings, obstructions = score(spec)
+            # A link through a use case is worse than any number of crossings
+            scores[order] = (obstructions, crossings)
+        return scores[order]
+
+    best = min(dict.fromkeys(candidates), key=evaluate)
+    improved = True
+    while improved and len(scores) < trials:
+        improved = False
+        for order in _moves(best, blocks, columns):
+            if len(scores) >= trials:
+                break
+            if order not in scores and evaluate(order) < scores[best]:
+                best, improved = order, True
+                break
+    _restore(spec, best)
+    return scores[best]
+
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def _segments_cross(p1, p2, q1, q2):
+    """True when two segments cross at a point inside both (touching ends do not count)"""
+    d1, d2 = _cross(q1, q2, p1), _cross(q1, q2, p2)
+    d3, d4 = _cross(p1, p2, q1), _cross(p1, p2, q2)
+    return d1 * d2 < -EPSILON and d3 * d4 < -EPSILON
+
+
+def _segment_hits_box(p1, p2, box):
+    """True when a segment runs through the inside of an (x0, y0, x1, y1) box (Liang-Barsky)"""
+    x0, y0, x1, y1 = box
+    t0, t1 = 0.0, 1.0
+    dx, dy = p2[0] - p1[0], p2[1] - p1[1]
+    for p, q in ((-dx, p1[0] - x0), (dx, x1 - p1[0]), (-dy, p1[1] - y0), (dy, y1 - p1[1])):
+        if abs(p) < EPSILON:
+            if q <= EPSILON:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                t0 = max(t0, t)
+            else:
+                t1 = min(t1, t)
+    return t1 - t0 > EPSILON
+
+
+def count_crossings(spec):
+    """
+    (crossings, obstructions) of the connectors as they are drawn.
+
+    crossings counts pairs of segments from different connectors that cross;
+    obstructions counts connectors running through a use case that is not
+    one of their ends. Arrowheads and the segments of one connector are not
+    compared with each other.
+    """
+    lines, _ = usecase_diagram.build_connectors(spec)
+    default_width, height = spec.get('use_case_size', usecase_diagram.DEFAULT_USE_CASE_SIZE)
+    cases = []
+    for group in spec['groups']:
+        for label, x, y, *case_width in group['cases']:
+            width = case_width[0] if case_width else default_width
+            # Inset, so a connector ending on the ellipse does not count as running through it
+            cases.append((x - width / 2 + 0.05, y - height / 2 + 0.05, x + width / 2 - 0.05, y + height / 2 - 0.05))
+
+    polylines = [[tuple(map(float, point)) for point in path] for path in lines['segments'] if len(path) >= 2]
+    segments = [(i, path[k], path[k + 1]) for i, path in enumerate(polylines) for k in range(len(path) - 1)]
+    crossings = 0
+    for a in range(len(segments)):
+        i, p1, p2 = segments[a]
+        for j, q1, q2 in segments[a + 1:]:
+            if i != j and _segments_cross(p1, p2, q1, q2):
+                crossings += 1
+
+    obstructions = 0
+    for path in polylines:
+        ends = (path[0], path[-1])
+        for box in cases:
+            if any(box[0] <= x <= box[2] and box[1] <= y <= box[3] for x, y in ends):
+                continue
+            if any(_segment_hits_box(path[k], path[k + 1], box) for k in range(len(path) - 1)):
+                obstructions += 1
+    return crossings, obstructions
+
+
+def channel_band(actor_count):
+    """Height usecase_layout keeps free below the system title for the first row's bus channels"""
+    return (actor_count + 1) * CHANNEL_SPACING + usecase_layout.GROUP_BOX_PAD
+
+
+def _grid(spec):
+    """
+    Rows and columns of the laid-out groups.
+
+    Returns (row_of, column_of, channel, gutter, room): the row and column
+    index of each group title, the y of the gap above each row (keyed by row
+    index, plus len(rows) for the gap below the last row), the x of the free
+    gutter right of each column and the height of the narrowest free gap
+    between two rows.
+    """
+    groups = spec['groups']
+    pad = usecase_layout.GROUP_BOX_PAD
+    bottoms = {}
+    for g in groups:
+        top = round(g['box'][1] + g['box'][3], 6)
+        bottoms[top] = min(bottoms.get(top, top), g['box'][1])
+    tops = sorted(bottoms, reverse=True)
+    system_x, system_y, system_width, system_height = spec['system']['box']
+    # In the middle of the band apply_layout reserved between the system title and the first row
+    title_bottom = system_y + system_height - usecase_layout.SYSTEM_TITLE_BAND
+    channel = {0: (tops[0] + pad + title_bottom) / 2} if tops else {}
+    for r, (above, top) in enumerate(zip(tops, tops[1:]), start=1):
+        channel[r] = (top + bottoms[above]) / 2
+    if tops:
+        channel[len(tops)] = bottoms[tops[-1]] - pad - TOP_CHANNEL_OFFSET
+    room = min((bottoms[above] - top for above, top in zip(tops, tops[1:])),
+               default=2 * TOP_CHANNEL_OFFSET + 2 * pad) - 2 * pad
+
+    # Groups are centred in their column, so a column is one centre x
+    centers = sorted({round(g['box'][0] + g['box'][2] / 2, 6) for g in groups})
+    rights = {}
+    for g in groups:
+        center = round(g['box'][0] + g['box'][2] / 2, 6)
+        rights[center] = max(rights.get(center, center), g['box'][0] + g['box'][2])
+    row_of = {g['title']: tops.index(round(g['box'][1] + g['box'][3], 6)) for g in groups}
+    column_of = {g['title']: centers.index(round(g['box'][0] + g['box'][2] / 2, 6)) for g in groups}
+    gutter = [rights[center] + pad + INCLUDE_OFFSET for center in centers]
+    return row_of, column_of, channel, gutter, room
+
+
+def route_includes(spec, grid=None, channel_offset=CHANNEL_SPACING):
+    """
+    Add an orthogonal 'path' (and label position) to every <<includes>>
+    relation (in place); `channel_offset` keeps them below the bus channels.
+    """
+    row_of, column_of, channel, gutter, _ = grid or _grid(spec)
+    default_width = spec.get('use_case_size', usecase_diagram.DEFAULT_USE_CASE_SIZE)[0]
+    cases = {}
+    for group in spec['groups']:
+        for label, cx, cy, *case_width in group['cases']:
+            cases[label] = (group['title'], cx, cy, case_width[0] if case_width else default_width)
+
+    lanes = {}
+
+    def lane(column):
+        # Includes sharing a gutter get lanes side by side
+        used = lanes[column] = lanes.get(column, -1) + 1
+        return gutter[column] + used * CHANNEL_SPACING
+
+    for relation in spec.get('includes', []):
+        if relation['from'] not in cases or relation['to'] not in cases:
+            continue
+        src_group, sx, sy, sw = cases[relation['from']]
+        dst_group, dx, dy, dw = cases[relation['to']]
+        src_col, dst_col = column_of[src_group], column_of[dst_group]
+        if dst_col == src_col + 1:
+            # Down the gutter between the two columns, into the left of the target
+            x = lane(src_col)
+            path = [(sx + sw / 2, sy), (x, sy), (x, dy), (dx - dw / 2, dy)]
+        elif dst_col == src_col - 1:
+            x = lane(dst_col)
+            path = [(sx - sw / 2, sy), (x, sy), (x, dy), (dx + dw / 2, dy)]
+        elif dst_col == src_col:
+            x = lane(src_col)
+            path = [(sx + sw / 2, sy), (x, sy), (x, dy), (dx + dw / 2, dy)]
+        else:
+            # Along the gap below the lower of the two rows, then up the target's column gutter
+            channel_y = channel[max(row_of[src_group], row_of[dst_group]) + 1] - channel_offset
+            src_x, dst_x = lane(src_col), lane(dst_col)
+            path = [(sx + sw / 2, sy), (src_x, sy), (src_x, channel_y),
+                    (dst_x, channel_y), (dst_x, dy), (dx + dw / 2, dy)]
+        # Drop the zero-length legs of a target at the same height
+        path = [point for k, point in enumerate(path) if k == 0 or point != path[k - 1]]
+        relation['path'] = [(round(x, 3), round(y, 3)) for x, y in path]
+        if 'label_at' not in relation:
+            # Beside the longest leg: reading upwards along a vertical one, above a horizontal one
+            (x1, y1), (x2, y2) = max(zip(path, path[1:]),
+                                     key=lambda leg: abs(leg[1][0] - leg[0][0]) + abs(leg[1][1] - leg[0][1]))
+            if abs(x2 - x1) < abs(y2 - y1):
+                relation['label_at'] = [round(x1 + INCLUDE_LABEL_OFFSET, 3), round(min(y1, y2) + 0.1, 3)]
+                relation['rotation'] = 90
+            else:
+                relation['label_at'] = [round((x1 + x2) / 2 - INCLUDE_LABEL_WIDTH / 2, 3),
+                                        round(y1 + INCLUDE_LABEL_OFFSET, 3)]
+                relation['rotation'] = 0
+    return spec
+
+
+def route_buses(spec):
+    """Add orthogonal 'paths' to every actor's bus and links, and route the includes (in place)"""
+    system_x, system_y, system_width, system_height = spec['system']['box']
+    default_width = spec.get('use_case_size', usecase_diagram.DEFAULT_USE_CASE_SIZE)[0]
+    actors = sorted(spec['actors'], key=lambda a: -a['box'][1])
+    count = len(actors)
+    actor_right = max(a['box'][0] + a['box'][2] for a in actors) if actors else system_x
+    lane_spacing = min(LANE_SPACING, (system_x - actor_right - 0.2) / max(count, 1))
+
+    grid = _grid(spec)
+    row_of, _, channel, _, room = grid
+    # One channel per actor plus the include channel, centred in the narrowest gap
+    channel_spacing = min(CHANNEL_SPACING, room / (count + 2))
+    groups = {g['title']: g for g in spec['groups']}
+    cases = {case[0]: (g, case) for g in spec['groups'] for case in g['cases']}
+
+    for k, actor in enumerate(actors):
+        x, y, width, height = actor['box']
+        actor_y = y + height / 2
+        lane_x = actor_right + 0.2 + k * lane_spacing
+        shift = (k - (count - 1) / 2)
+        paths, ends = [], []
+        for target in actor.get('links', {}).get('targets', []):
+            if target in groups:
+                group = groups[target]
+                gx, gy, gw, gh = group['box']
+                channel_y = channel[row_of[target]] + shift * channel_spacing
+                drop_x = gx + gw / 2 + shift * DROP_SPACING
+                end = (drop_x, gy + gh)
+                paths.append([(lane_x, channel_y), (drop_x, channel_y), end])
+            else:
+                group, (label, cx, cy, *case_width) = cases[target]
+                gx, gy, gw, gh = group['box']
+                channel_y = channel[row_of[group['title']]] + shift * channel_spacing
+                gutter_x = gx - GUTTER_OFFSET - k * channel_spacing
+                case_w = case_width[0] if case_width else default_width
+                end = (cx - case_w / 2, cy)
+                paths.append([(lane_x, channel_y), (gutter_x, channel_y), (gutter_x, cy), end])
+            ends.append(end)
+
+        ys = [actor_y] + [path[0][1] for path in paths]
+        bus = actor.setdefault('bus', {})
+        bus['paths'] = [[(x + width, actor_y), (lane_x, actor_y)], [(lane_x, min(ys)), (lane_x, max(ys))]]
+        actor['links']['paths'] = paths
+        actor['links']['ends'] = ends
+    route_includes(spec, grid, (count + 1) / 2 * channel_spacing)
+    return spec
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("Usage: python usecase_routing.py usecase.json")
+        return 2
+    with open(argv[0], encoding='utf-8') as f:
+        spec = json.load(f)
+    if spec.get('layout') is None:
+        print("⚠️  Not a layout spec, nothing to order")
+        return 1
+    before = usecase_layout.apply_layout(json.loads(json.dumps({**spec, 'layout': {**spec['layout'], 'order': None}})))
+    after = usecase_layout.apply_layout(spec)
+    (crossed, blocked), (crossed_after, blocked_after) = count_crossings(before), count_crossings(after)
+    print(f"🔀 Crossings: {crossed} in spec order, {crossed_after} after ordering")
+    print(f"   Links through use cases: {blocked} in spec order, {blocked_after} after ordering")
+    print("   Groups: " + ", ".join(group['title'] for group in after['groups']))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())